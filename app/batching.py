@@ -0,0 +1,183 @@
+"""Regroupement dynamique (micro-batching) des predictions unitaires.
+
+Les requetes /predict concurrentes sont mises en file pendant au plus
+`max_wait_ms` (ou jusqu'a `max_batch_size` lignes) puis scorees avec un
+seul appel matriciel ; chaque requete recoit sa propre ligne.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+
+class BatcherOverloaded(Exception):
+    """File d'attente pleine : la requete doit etre rejetee (503)"""
+
+
+class MicroBatcher:
+    """Coalesce les lignes soumises en lots pour `score_fn`.
+
+    `score_fn(rows)` recoit une liste de lignes et renvoie une probabilite
+    par ligne. Il est execute dans un thread dedie afin de ne pas bloquer la
+    boucle asyncio : les requetes arrivant pendant le scoring forment le
+    lot suivant.
+    """
+
+    def __init__(
+        self,
+        score_fn: Callable[[List[Sequence[float]]], Sequence[float]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+        max_queue_size: int = 10000
+    ):
+        self.score_fn = score_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self.max_queue_size = max_queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Lot retire de la file et pas encore resolu (repris par stop())
+        self._batch: list = []
+
+        # Statistiques
+        self.requests = 0
+        self.rejected = 0
+        self.batches = 0
+        self.rows = 0
+        self.max_batch_seen = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.score_total = 0.0
+        self._size_buckets = [2 ** i for i in range(int(np.log2(self.max_batch_size)) + 1)]
+        if self._size_buckets[-1] < self.max_batch_size:
+            self._size_buckets.append(self.max_batch_size)
+        self._size_counts = [0] * len(self._size_buckets)
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="microbatch")
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Arrete le worker sans laisser de requete en attente.
+
+        Le lot en cours et ce qui reste en file sont scores directement ;
+        si le scoring echoue, chaque requete recoit l'erreur.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        pending, self._batch = self._batch, []
+        if self._queue is not None:
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+        pending = [item for item in pending if not item[1].done()]
+        if pending:
+            await self._score(pending)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def submit(self, row: Sequence[float]) -> float:
+        """Soumet une ligne et attend sa probabilite"""
+        if not self.running:
+            raise RuntimeError("MicroBatcher non demarre")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((row, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise BatcherOverloaded("File de micro-batching pleine")
+        self.requests += 1
+        return await future
+
+    async def _collect(self) -> list:
+        self._batch = batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Vidage sans attente de ce qui est deja en file
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            remaining = deadline - time.perf_counter()
+            if len(batch) >= self.max_batch_size or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Les requetes annulees (client deconnecte) ne sont pas scorees
+            self._batch = batch = [item for item in batch if not item[1].done()]
+            if batch:
+                await self._score(batch)
+            self._batch = []
+
+    async def _score(self, batch: list):
+        """Score le lot dans le thread dedie et resout chaque future"""
+        dispatched = time.perf_counter()
+        rows = [item[0] for item in batch]
+        try:
+            probas = await asyncio.get_running_loop().run_in_executor(self._executor, self.score_fn, rows)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._record(batch, dispatched, time.perf_counter() - dispatched)
+        for (_, future, _), proba in zip(batch, probas):
+            if not future.done():
+                future.set_result(float(proba))
+
+    def _record(self, batch: list, dispatched: float, score_seconds: float):
+        size = len(batch)
+        self.batches += 1
+        self.rows += size
+        self.max_batch_seen = max(self.max_batch_seen, size)
+        self.score_total += score_seconds
+        for _, _, enqueued in batch:
+            wait = dispatched - enqueued
+            self.wait_total += wait
+            if wait > self.wait_max:
+                self.wait_max = wait
+        for i, bound in enumerate(self._size_buckets):
+            if size <= bound:
+                self._size_counts[i] += 1
+                break
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.running,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": round(self.rows / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size_seen": self.max_batch_seen,
+            "batch_size_histogram": {
+                f"le_{bound}": count for bound, count in zip(self._size_buckets, self._size_counts)
+            },
+            "mean_wait_ms": round(self.wait_total / self.rows * 1000, 4) if self.rows else 0.0,
+            "max_wait_ms_seen": round(self.wait_max * 1000, 4),
+            "mean_score_ms": round(self.score_total / self.batches * 1000, 4) if self.batches else 0.0
+        }
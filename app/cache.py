@@ -0,0 +1,383 @@
+"""Cache des predictions, versionne par modele.
+
+Les cles sont des tuples `(model_version, features)` construits a partir
+des features deja validees : pas de serialisation JSON ni de hash
+cryptographique sur le chemin de requete.
+"""
+import json
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+POLICIES = ("lru", "lfu")
+BACKENDS = ("memory", "sqlite")
+
+
+class _LRUStore:
+    """Eviction du moins recemment utilise (OrderedDict)"""
+
+    def __init__(self):
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self._data[key] = entry
+        self._data.move_to_end(key)
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def evict(self):
+        self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+
+class _LFUStore:
+    """Eviction du moins frequemment utilise, en O(1).
+
+    Les cles sont rangees par frequence d'acces ; a frequence egale, la plus
+    ancienne est evincee en premier.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._freq = {}
+        self._buckets = {}
+        self._min_freq = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def _unlink(self, key):
+        freq = self._freq.pop(key)
+        bucket = self._buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[freq]
+        return freq
+
+    def _link(self, key, freq):
+        self._freq[key] = freq
+        self._buckets.setdefault(freq, OrderedDict())[key] = None
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is not None:
+            freq = self._unlink(key)
+            self._link(key, freq + 1)
+            if freq == self._min_freq and freq not in self._buckets:
+                self._min_freq = freq + 1
+        return entry
+
+    def put(self, key, entry):
+        if key in self._data:
+            self._data[key] = entry
+            self.get(key)
+            return
+        self._data[key] = entry
+        self._link(key, 1)
+        self._min_freq = 1
+
+    def delete(self, key):
+        if key in self._data:
+            del self._data[key]
+            self._unlink(key)
+
+    def evict(self):
+        if self._min_freq not in self._buckets:
+            self._min_freq = min(self._buckets)
+        key, _ = self._buckets[self._min_freq].popitem(last=False)
+        if not self._buckets[self._min_freq]:
+            del self._buckets[self._min_freq]
+        del self._freq[key]
+        del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+        self._freq.clear()
+        self._buckets.clear()
+        self._min_freq = 0
+
+
+class PredictionCache:
+    """Cache borne (taille + TTL optionnel) avec compteurs.
+
+    maxsize=0 desactive le cache ; ttl=None (ou 0) garde les entrees
+    jusqu'a leur eviction.
+    """
+
+    # Acces en memoire sous verrou : appelable depuis la boucle d'evenements
+    blocking = False
+
+    def __init__(self, maxsize: int = 1000, ttl: Optional[float] = None, policy: str = "lru"):
+        if policy not in POLICIES:
+            raise ValueError(f"Politique inconnue : {policy} (attendu : {', '.join(POLICIES)})")
+        self.maxsize = max(0, int(maxsize))
+        self.ttl = float(ttl) if ttl else None
+        self.policy = policy
+        self._store = _LRUStore() if policy == "lru" else _LFUStore()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.clears = 0
+
+    def __len__(self):
+        return len(self._store)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._store.delete(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize == 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key not in self._store and len(self._store) >= self.maxsize:
+                self._store.evict()
+                self.evictions += 1
+            self._store.put(key, (value, expires_at))
+
+    def clear(self):
+        """Vide le cache (ex. lors d'un changement de modele)"""
+        with self._lock:
+            self._store.clear()
+            self.clears += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "policy": self.policy,
+                "size": len(self._store),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "clears": self.clears
+            }
+
+
+class SQLitePredictionCache:
+    """Cache partage entre les workers d'un meme hote (fichier SQLite).
+
+    Meme interface que PredictionCache ; les cles doivent etre de la forme
+    `(model_version, features)`. Place par defaut dans /dev/shm (memoire
+    partagee) : tous les workers uvicorn lisent et alimentent les memes
+    entrees, le taux de hit ne depend donc pas du nombre de workers.
+
+    La taille est controlee toutes les `check_every` insertions : le cache
+    peut depasser `maxsize` d'au plus ce nombre d'entrees avant eviction.
+    Les compteurs hits / misses sont propres a chaque processus.
+    """
+
+    # I/O fichier (jusqu'au timeout de verrou) : a appeler hors de la boucle
+    blocking = True
+
+    def __init__(
+        self,
+        path: str,
+        maxsize: int = 1000,
+        ttl: Optional[float] = None,
+        policy: str = "lru",
+        check_every: int = 64,
+        touch_interval: float = 1.0
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Politique inconnue : {policy} (attendu : {', '.join(POLICIES)})")
+        self.path = path
+        self.maxsize = max(0, int(maxsize))
+        self.ttl = float(ttl) if ttl else None
+        self.policy = policy
+        self.check_every = max(1, int(check_every))
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.clears = 0
+        self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Une connexion par thread et par processus (sure apres fork)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            " model_version TEXT NOT NULL,"
+            " features BLOB NOT NULL,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL,"
+            " last_access REAL NOT NULL,"
+            " hits INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (model_version, features)"
+            ") WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_lru ON predictions (last_access)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_lfu ON predictions (hits, last_access)")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _encode(key) -> tuple:
+        version, row = key
+        return str(version), struct.pack(f"<{len(row)}d", *row)
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        version, features = self._encode(key)
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, expires_at, last_access FROM predictions"
+            " WHERE model_version = ? AND features = ?",
+            (version, features)
+        ).fetchone()
+        now = time.time()
+        if row is None or (row[1] is not None and row[1] <= now):
+            with self._stats_lock:
+                self.misses += 1
+                if row is not None:
+                    self.expirations += 1
+            if row is not None:
+                conn.execute(
+                    "DELETE FROM predictions WHERE model_version = ? AND features = ?",
+                    (version, features)
+                )
+            return None
+
+        # Mise a jour de l'acces limitee pour eviter une ecriture par hit
+        if self.policy == "lfu" or now - row[2] >= self.touch_interval:
+            conn.execute(
+                "UPDATE predictions SET last_access = ?, hits = hits + 1"
+                " WHERE model_version = ? AND features = ?",
+                (now, version, features)
+            )
+        with self._stats_lock:
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize == 0:
+            return
+        version, features = self._encode(key)
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO predictions"
+            " (model_version, features, value, expires_at, last_access, hits)"
+            " VALUES (?, ?, ?, ?, ?, 0)",
+            (version, features, json.dumps(value), now + self.ttl if self.ttl else None, now)
+        )
+        with self._stats_lock:
+            self._puts += 1
+            check = self._puts % self.check_every == 0
+        if check:
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM predictions WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        excess = conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0] - self.maxsize
+        if excess <= 0:
+            return
+        order = "last_access" if self.policy == "lru" else "hits, last_access"
+        conn.execute(
+            "DELETE FROM predictions WHERE (model_version, features) IN ("
+            f" SELECT model_version, features FROM predictions ORDER BY {order} LIMIT ?)",
+            (excess,)
+        )
+        with self._stats_lock:
+            self.evictions += excess
+
+    def clear(self):
+        """Vide le cache partage (changement de modele)"""
+        self._connect().execute("DELETE FROM predictions")
+        with self._stats_lock:
+            self.clears += 1
+
+    def stats(self) -> dict:
+        size = len(self)
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "sqlite",
+                "path": self.path,
+                "policy": self.policy,
+                "size": size,
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "clears": self.clears,
+                "pid": os.getpid()
+            }
+
+
+def _default_sqlite_path() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "bank-churn-prediction-cache.sqlite")
+
+
+def build_cache_from_env():
+    """Cache configure par PREDICTION_CACHE_BACKEND / _SIZE / _TTL / _POLICY / _PATH"""
+    backend = os.getenv("PREDICTION_CACHE_BACKEND", "memory").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de cache inconnu : {backend} (attendu : {', '.join(BACKENDS)})")
+    options = {
+        "maxsize": int(os.getenv("PREDICTION_CACHE_SIZE", "1000")),
+        "ttl": float(os.getenv("PREDICTION_CACHE_TTL", "0")),
+        "policy": os.getenv("PREDICTION_CACHE_POLICY", "lru").lower()
+    }
+    if backend == "sqlite":
+        return SQLitePredictionCache(os.getenv("PREDICTION_CACHE_PATH", _default_sqlite_path()), **options)
+    return PredictionCache(**options)
@@ -0,0 +1,260 @@
+"""Capture du trafic de production pour la detection de drift.
+
+`record()` ne fait qu'ajouter un tuple a une deque (quelques centaines
+de ns) ; un thread d'ecriture vide la file par lots et ajoute des
+enregistrements binaires de taille fixe (timestamp, 10 features float32,
+probabilite) a des segments tournants. L'espace disque est borne par
+`max_segment_bytes * max_segments`, quel que soit le nombre de workers :
+les plus anciens segments du repertoire sont supprimes, sauf le segment
+courant d'un autre worker encore vivant (avec plus de workers que
+`max_segments`, chacun garde donc au moins son segment courant).
+
+Les segments sont nommes `capture-<debut ns>-<pid>.bin` : l'ordre
+alphabetique est l'ordre chronologique et chaque worker ecrit les siens.
+"""
+import glob
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.scoring import FEATURE_NAMES
+
+logger = logging.getLogger("bank-churn-api")
+
+RECORD_DTYPE = np.dtype(
+    [("timestamp", "<f8")]
+    + [(name, "<f4") for name in FEATURE_NAMES]
+    + [("churn_probability", "<f4")]
+)
+
+
+class TrafficCapture:
+    """File en memoire + ecrivain de fond vers des segments binaires tournants"""
+
+    def __init__(
+        self,
+        directory: str,
+        max_segment_bytes: int = 16 * 1024 * 1024,
+        max_segments: int = 8,
+        batch_size: int = 1024,
+        flush_interval: float = 1.0,
+        max_queue: int = 100000
+    ):
+        self.directory = directory
+        self.max_segment_bytes = max(RECORD_DTYPE.itemsize, int(max_segment_bytes))
+        self.max_segments = max(1, int(max_segments))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._segment: Optional[str] = None
+        self._segment_bytes = 0
+        self._write_lock = threading.Lock()
+
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+        self.rotations = 0
+        self.write_errors = 0
+
+    # Chemin de requete -------------------------------------------------
+    def record(self, row: Sequence[float], proba: float):
+        """Met en file une observation ; ne bloque jamais (perte si file pleine)"""
+        queue = self._queue
+        if len(queue) >= self.max_queue:
+            self.dropped += 1
+            return
+        queue.append((time.time(), row, proba))
+        self.captured += 1
+        if len(queue) == self.batch_size:
+            self._wakeup.set()
+
+    def record_many(self, rows: Sequence[Sequence[float]], probas: Sequence[float]):
+        for row, proba in zip(rows, probas):
+            self.record(row, proba)
+
+    # Ecrivain de fond --------------------------------------------------
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Demarre l'ecrivain (a appeler dans chaque worker, apres le fork)"""
+        if self.running:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._stop_event.clear()
+        self._segment = None
+        self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrete l'ecrivain apres avoir ecrit ce qui est en file"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._wakeup.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _drain(self) -> List[Tuple[float, Sequence[float], float]]:
+        items = []
+        queue = self._queue
+        try:
+            while True:
+                items.append(queue.popleft())
+        except IndexError:
+            return items
+
+    def flush(self) -> int:
+        """Ecrit les observations en file ; renvoie leur nombre"""
+        with self._write_lock:
+            items = self._drain()
+            if not items:
+                return 0
+            records = np.empty(len(items), dtype=RECORD_DTYPE)
+            records["timestamp"] = [item[0] for item in items]
+            features = np.asarray([item[1] for item in items], dtype=np.float32)
+            for j, name in enumerate(FEATURE_NAMES):
+                records[name] = features[:, j]
+            records["churn_probability"] = [item[2] for item in items]
+            try:
+                self._write(records.tobytes())
+            except OSError as e:
+                self.write_errors += 1
+                logger.error(f"Capture du trafic : écriture impossible ({e})")
+                return 0
+            self.written += len(items)
+            return len(items)
+
+    def _write(self, data: bytes):
+        # Decoupage sur des frontieres d'enregistrement : aucun segment ne
+        # depasse max_segment_bytes
+        limit = self.max_segment_bytes - self.max_segment_bytes % RECORD_DTYPE.itemsize
+        while data:
+            if self._segment is None or self._segment_bytes >= limit:
+                self._rotate()
+            room = limit - self._segment_bytes
+            with open(self._segment, "ab") as f:
+                f.write(data[:room])
+            self._segment_bytes += min(room, len(data))
+            data = data[room:]
+
+    def _rotate(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._segment = os.path.join(self.directory, f"capture-{time.time_ns():020d}-{os.getpid()}.bin")
+        self._segment_bytes = 0
+        self.rotations += 1
+        # Borne globale : le nouveau segment compte parmi les max_segments.
+        # Le segment courant (le plus recent) d'un autre worker vivant n'est
+        # jamais supprime : il est peut-etre en cours d'ecriture.
+        existing = self.segments()
+        excess = len(existing) - (self.max_segments - 1)
+        if excess <= 0:
+            return
+        protected = _live_current_segments(existing)
+        for path in [p for p in existing if p not in protected][:excess]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # Lecture -----------------------------------------------------------
+    def segments(self) -> List[str]:
+        """Segments existants, du plus ancien au plus recent"""
+        return sorted(glob.glob(os.path.join(self.directory, "capture-*.bin")))
+
+    @staticmethod
+    def read_segment(path: str, offset: int = 0) -> Tuple[np.ndarray, int]:
+        """Enregistrements complets a partir de `offset` ; renvoie (records, nouvel offset)"""
+        try:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return np.empty(0, dtype=RECORD_DTYPE), offset
+        usable = len(data) - len(data) % RECORD_DTYPE.itemsize
+        return np.frombuffer(data[:usable], dtype=RECORD_DTYPE), offset + usable
+
+    def read(self):
+        """Toutes les observations conservees (DataFrame, apres ecriture de la file)"""
+        import pandas as pd
+
+        self.flush()
+        parts = [self.read_segment(path)[0] for path in self.segments()]
+        records = np.concatenate(parts) if parts else np.empty(0, dtype=RECORD_DTYPE)
+        return pd.DataFrame(records)
+
+    def stats(self) -> dict:
+        segments = self.segments()
+        return {
+            "enabled": self.running,
+            "directory": self.directory,
+            "queue_depth": len(self._queue),
+            "captured": self.captured,
+            "written": self.written,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors,
+            "segments": len(segments),
+            "max_segments": self.max_segments,
+            "disk_bytes": sum(os.path.getsize(p) for p in segments if os.path.exists(p)),
+            "max_disk_bytes": self.max_segment_bytes * self.max_segments,
+            "record_bytes": RECORD_DTYPE.itemsize
+        }
+
+
+def _segment_pid(path: str) -> Optional[int]:
+    try:
+        return int(os.path.basename(path)[: -len(".bin")].rsplit("-", 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # processus d'un autre utilisateur
+    return True
+
+
+def _live_current_segments(segments: List[str]) -> set:
+    """Dernier segment de chaque autre processus encore vivant"""
+    latest = {}
+    for path in segments:  # ordre chronologique : le dernier l'emporte
+        pid = _segment_pid(path)
+        if pid is not None and pid != os.getpid():
+            latest[pid] = path
+    return {path for pid, path in latest.items() if _pid_alive(pid)}
+
+
+def build_capture_from_env() -> Optional[TrafficCapture]:
+    """Capture configuree par CAPTURE_DIR (vide = desactivee) / CAPTURE_SEGMENT_MB / CAPTURE_MAX_SEGMENTS"""
+    directory = os.getenv("CAPTURE_DIR")
+    if not directory:
+        return None
+    return TrafficCapture(
+        directory,
+        max_segment_bytes=int(float(os.getenv("CAPTURE_SEGMENT_MB", "16")) * 1024 * 1024),
+        max_segments=int(os.getenv("CAPTURE_MAX_SEGMENTS", "8")),
+        flush_interval=float(os.getenv("CAPTURE_FLUSH_INTERVAL", "1.0"))
+    )
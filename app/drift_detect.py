@@ -1,35 +1,485 @@
-import matplotlib
-matplotlib.use("Agg")  # OBLIGATOIRE pour Docker / Azure
-
 import pandas as pd
 import numpy as np
-from scipy.stats import ks_2samp
+from scipy.stats import ks_2samp, kstwo
+import atexit
+import io
 import json
+import multiprocessing
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from app.reference_sketch import is_sketch, load_sketch
 from datetime import datetime
-import matplotlib.pyplot as plt
-import seaborn as sns
 
-def detect_drift(reference_file, production_file, threshold=0.05, output_dir="drift_reports"):
-    os.makedirs(output_dir, exist_ok=True)
+METHODS = ("binned", "exact")
 
-    ref = pd.read_csv(reference_file)
-    prod = pd.read_csv(production_file)
+# Nombre maximal de classes par feature : au-dela, bornes aux quantiles
+MAX_BINS = 512
 
-    results = {}
+TARGET = "Exited"
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+class ReferenceSummary:
+    """Distribution de reference resumee une fois pour toutes.
+
+    Pour chaque feature : bornes de classes et fonction de repartition de
+    reference a ces bornes (test binne), et valeurs triees quand la
+    reference est un CSV (test exact). Les bornes sont les valeurs
+    distinctes si elles sont peu nombreuses (features discretes : KS
+    exact), sinon des quantiles.
+    """
+
+    def __init__(self, columns, edges, cdf, sizes, sorted_values=None):
+        self.columns = list(columns)
+        self.edges = edges
+        self.cdf = cdf
+        self.sizes = sizes
+        # Absent pour une esquisse : le mode exact compare alors aux bornes
+        self.sorted = sorted_values
+
+    @classmethod
+    def from_frame(cls, frame, max_bins=MAX_BINS):
+        columns = [c for c in frame.columns if c != TARGET]
+        edges, cdf, sizes, sorted_values = {}, {}, {}, {}
+        for col in columns:
+            values = np.sort(frame[col].dropna().to_numpy(dtype=np.float64))
+            distinct = np.unique(values)
+            if len(distinct) <= max_bins:
+                col_edges = distinct
+            else:
+                col_edges = np.unique(np.quantile(values, np.linspace(0, 1, max_bins + 1)))
+            sorted_values[col] = values
+            edges[col] = col_edges
+            cdf[col] = np.searchsorted(values, col_edges, side="right") / max(len(values), 1)
+            sizes[col] = len(values)
+        return cls(columns, edges, cdf, sizes, sorted_values)
+
+    @classmethod
+    def from_sketch(cls, sketch, max_bins=MAX_BINS):
+        """Depuis une esquisse (app.reference_sketch) ; les classes sont
+        regroupees si l'esquisse en a plus que `max_bins`"""
+        edges, cdf, sizes = {}, {}, {}
+        for col, feature in sketch["features"].items():
+            col_edges = np.asarray(feature["edges"], dtype=np.float64)
+            col_cdf = np.cumsum(feature["counts"]) / max(feature["n"], 1)
+            if len(col_edges) > max_bins:
+                # Sous-ensemble des bornes : la repartition y reste exacte
+                keep = np.unique(np.searchsorted(col_cdf, np.linspace(0, 1, max_bins + 1)[1:], side="left"))
+                keep = np.unique(np.append(np.clip(keep, 0, len(col_edges) - 1), len(col_edges) - 1))
+                col_edges, col_cdf = col_edges[keep], col_cdf[keep]
+            edges[col], cdf[col], sizes[col] = col_edges, col_cdf, feature["n"]
+        return cls(list(sketch["features"]), edges, cdf, sizes)
+
+    def size(self, col):
+        return self.sizes[col]
+
+
+_references = {}
+_references_lock = threading.Lock()
+
+
+def load_reference(path, max_bins=MAX_BINS):
+    """Resume de reference (CSV ou esquisse .json), recalcule seulement si le fichier change"""
+    key = _file_key(path)
+    with _references_lock:
+        summary = _references.get((path, max_bins))
+        if summary is None or summary[0] != key:
+            if is_sketch(path):
+                reference = ReferenceSummary.from_sketch(load_sketch(path), max_bins)
+            else:
+                reference = ReferenceSummary.from_frame(pd.read_csv(path), max_bins)
+            summary = (key, reference)
+            _references[(path, max_bins)] = summary
+        return summary[1]
+
+
+class ProductionHistogram:
+    """Comptes de production par classe de reference, mis a jour au fil de l'eau"""
+
+    def __init__(self, reference):
+        self.reference = reference
+        self.counts = {col: np.zeros(len(reference.edges[col]) + 1, dtype=np.int64) for col in reference.columns}
+        self.rows = 0
+        # kstwo.sf coute plusieurs ms pour les petites p-values : memorisee
+        # tant que les comptes de la feature ne changent pas
+        self._pvalues = {}
+
+    def update(self, frame):
+        """Ajoute des observations (DataFrame) ; cout proportionnel au lot"""
+        for col in self.reference.columns:
+            if col not in frame.columns:
+                continue
+            values = frame[col].to_numpy(dtype=np.float64)
+            values = values[~np.isnan(values)]
+            # Classe k : edges[k-1] < v <= edges[k]
+            bins = np.searchsorted(self.reference.edges[col], values, side="left")
+            self.counts[col] += np.bincount(bins, minlength=len(self.counts[col]))
+        self.rows += len(frame)
 
-    for col in ref.columns:
-        if col != "Exited" and col in prod.columns:
-            stat, p = ks_2samp(ref[col].dropna(), prod[col].dropna())
+    def reset(self):
+        """Remet les comptes a zero (les p-values memorisees restent valides)"""
+        for counts in self.counts.values():
+            counts[:] = 0
+        self.rows = 0
+
+    def merge(self, other):
+        """Ajoute les comptes d'un autre histogramme (meme reference)"""
+        for col in self.reference.columns:
+            self.counts[col] += other.counts[col]
+        self.rows += other.rows
+
+    def results(self, threshold=0.05):
+        results = {}
+        for col in self.reference.columns:
+            if not self.counts[col].any():
+                continue
+            stat, p = self.ks(col)
             results[col] = {
-                "p_value": float(p),
-                "statistic": float(stat),
+                "p_value": p,
+                "statistic": stat,
                 "drift_detected": bool(p < threshold)
             }
+        return results
+
+    def ks(self, col):
+        """Statistique KS et p-value (asymptotique, comme ks_2samp method='asymp')"""
+        counts = self.counts[col]
+        n = int(counts.sum())
+        m = self.reference.size(col)
+        if n == 0 or m == 0:
+            return float("nan"), float("nan")
+        prod_cdf = np.cumsum(counts[:-1]) / n
+        statistic = float(np.max(np.abs(self.reference.cdf[col] - prod_cdf)))
+        # Valeurs au-dessus de la derniere borne : F_ref = 1 en dessous
+        statistic = max(statistic, counts[-1] / n)
+        cached = self._pvalues.get(col)
+        if cached is not None and cached[:2] == (n, statistic):
+            return statistic, cached[2]
+        en = m * n / (m + n)
+        p = float(np.clip(kstwo.sf(statistic, np.round(en)), 0, 1))
+        self._pvalues[col] = (n, statistic, p)
+        return statistic, p
+
+
+class DriftMonitor:
+    """Suivi incremental du drift d'un fichier de production.
+
+    Le fichier de production est lu en queue : seules les lignes ajoutees
+    depuis le dernier appel sont parsees et ajoutees aux histogrammes. Un
+    fichier tronque ou remplace est relu depuis le debut. Le test est
+    ensuite en O(classes) par feature, quel que soit le volume accumule.
+    """
+
+    def __init__(self, reference_file, production_file):
+        self.reference_file = reference_file
+        self.production_file = production_file
+        self.reference = load_reference(reference_file)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.histogram = ProductionHistogram(self.reference)
+        self._header = None
+        self._offset = 0
+        self._inode = None
+
+    def refresh(self):
+        """Integre les lignes ajoutees au fichier de production ; renvoie leur nombre"""
+        with self._lock:
+            reference = load_reference(self.reference_file)
+            stat = os.stat(self.production_file)
+            if (reference is not self.reference or stat.st_ino != self._inode
+                    or stat.st_size < self._offset):
+                self.reference = reference
+                self._reset()
+                self._inode = stat.st_ino
+            if stat.st_size == self._offset:
+                return 0
+
+            with open(self.production_file, "rb") as f:
+                f.seek(self._offset)
+                data = f.read(stat.st_size - self._offset)
+            # Seules les lignes completes sont consommees (ecriture en cours)
+            end = data.rfind(b"\n") + 1
+            if end == 0:
+                return 0
+            data = data[:end]
+            if self._header is None:
+                header_end = data.index(b"\n") + 1
+                self._header, data = data[:header_end], data[header_end:]
+            self._offset += end
+            if not data.strip():
+                return 0
+
+            frame = pd.read_csv(io.BytesIO(self._header + data))
+            self.histogram.update(frame)
+            return len(frame)
+
+    def results(self, threshold=0.05):
+        with self._lock:
+            return self.histogram.results(threshold)
+
+
+class CaptureDriftMonitor:
+    """Suivi incremental du drift sur le trafic capture (app.capture).
+
+    Un histogramme par segment, alimente par les seuls enregistrements
+    ajoutes depuis le dernier appel ; les segments supprimes par rotation
+    sortent de la fenetre avec leurs comptes.
+    """
+
+    def __init__(self, reference_file, capture):
+        self.reference_file = reference_file
+        self.capture = capture
+        self.reference = load_reference(reference_file)
+        self.histogram = ProductionHistogram(self.reference)
+        self._segments = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Integre les nouveaux enregistrements ; renvoie leur nombre"""
+        with self._lock:
+            reference = load_reference(self.reference_file)
+            if reference is not self.reference:
+                self.reference = reference
+                self.histogram = ProductionHistogram(reference)
+                self._segments = {}
+            self.capture.flush()
+            paths = self.capture.segments()
+            for gone in set(self._segments) - set(paths):
+                del self._segments[gone]
+            added = 0
+            for path in paths:
+                offset, histogram = self._segments.get(path, (0, None))
+                records, offset = self.capture.read_segment(path, offset)
+                if histogram is None:
+                    histogram = ProductionHistogram(self.reference)
+                if len(records):
+                    histogram.update(pd.DataFrame(records))
+                    added += len(records)
+                self._segments[path] = (offset, histogram)
+            self.histogram.reset()
+            for _, segment_histogram in self._segments.values():
+                self.histogram.merge(segment_histogram)
+            return added
+
+    def results(self, threshold=0.05):
+        with self._lock:
+            return self.histogram.results(threshold)
+
+
+_monitors = {}
+_monitors_lock = threading.Lock()
+
+
+def get_monitor(reference_file, production_file=None, capture=None):
+    """Moniteur partage (un par source) pour la duree du processus"""
+    with _monitors_lock:
+        key = (reference_file, production_file if capture is None else id(capture))
+        if key not in _monitors:
+            if capture is not None:
+                _monitors[key] = CaptureDriftMonitor(reference_file, capture)
+            else:
+                _monitors[key] = DriftMonitor(reference_file, production_file)
+        return _monitors[key]
+
+
+# Lecture par blocs des colonnes de production (mode exact / echantillonne)
+CHUNK_ROWS = 200000
+
+
+def dkw_bound(n, confidence=0.95):
+    """Borne de Dvoretzky-Kiefer-Wolfowitz : sup|F_n - F| <= eps avec probabilite `confidence`.
+
+    La statistique KS calculee sur n lignes tirees au hasard est a au
+    plus eps de celle des donnees completes (meme probabilite).
+    """
+    if n <= 0:
+        return float("nan")
+    return float(np.sqrt(np.log(2 / (1 - confidence)) / (2 * n)))
+
+
+def sample_columns(production_file, columns, sample_size=None, stratify_by=None, seed=0, chunksize=CHUNK_ROWS):
+    """Lit seulement `columns`, par blocs ; renvoie (echantillon, lignes lues).
+
+    Echantillonnage par priorites : chaque ligne recoit une cle aleatoire
+    et les `sample_size` plus petites sont gardees (tirage uniforme sans
+    remise, memoire bornee). Avec la meme graine, des processus lisant des
+    colonnes differentes retiennent les memes lignes. `stratify_by` : une
+    reserve par strate, puis allocation proportionnelle aux effectifs.
+    """
+    usecols = list(dict.fromkeys(list(columns) + ([stratify_by] if stratify_by else [])))
+    rng = np.random.default_rng(seed)
+    kept, rows, strata = [], 0, {}
+    for chunk in pd.read_csv(production_file, usecols=usecols, chunksize=chunksize):
+        rows += len(chunk)
+        if sample_size is None:
+            kept.append(chunk)
+            continue
+        chunk = chunk.assign(_key=rng.random(len(chunk)))
+        frame = pd.concat(kept + [chunk]) if kept else chunk
+        if stratify_by:
+            for value, count in chunk[stratify_by].value_counts().items():
+                strata[value] = strata.get(value, 0) + count
+            frame = frame.sort_values("_key").groupby(stratify_by, sort=False).head(sample_size)
+        else:
+            frame = frame.nsmallest(sample_size, "_key")
+        kept = [frame]
+
+    frame = pd.concat(kept) if kept else pd.DataFrame(columns=usecols)
+    if sample_size is not None and stratify_by and rows:
+        quotas = {value: int(round(sample_size * count / rows)) for value, count in strata.items()}
+        frame = frame.sort_values("_key")
+        frame = frame[frame.groupby(stratify_by, sort=False).cumcount() < frame[stratify_by].map(quotas)]
+    return frame.drop(columns="_key", errors="ignore"), rows
+
+
+def _ks_columns(reference_file, prod, columns, threshold, sampled, rows, confidence):
+    reference = load_reference(reference_file)
+    results = {}
+    for col in columns:
+        values = prod[col].dropna()
+        if reference.sorted is not None:
+            stat, p = ks_2samp(reference.sorted[col], values)
+        else:
+            stat, p = _ks_against_edges(reference, col, values.to_numpy(dtype=np.float64))
+        results[col] = {
+            "p_value": float(p),
+            "statistic": float(stat),
+            "drift_detected": bool(p < threshold)
+        }
+        if sampled:
+            results[col].update(
+                sample_size=len(values),
+                rows=rows,
+                statistic_error_bound=dkw_bound(len(values), confidence)
+            )
+    return results
+
+
+def _ks_against_edges(reference, col, values):
+    """KS contre une reference esquissee : ecarts evalues aux bornes de
+    l'esquisse (exact pour les features discretes)"""
+    n, m = len(values), reference.size(col)
+    if n == 0 or m == 0:
+        return float("nan"), float("nan")
+    values = np.sort(values)
+    edges = reference.edges[col]
+    prod_cdf = np.searchsorted(values, edges, side="right") / n
+    statistic = float(np.max(np.abs(reference.cdf[col] - prod_cdf)))
+    # Valeurs de production au-dela de la derniere borne de reference
+    statistic = max(statistic, 1.0 - prod_cdf[-1])
+    en = m * n / (m + n)
+    return statistic, float(np.clip(kstwo.sf(statistic, np.round(en)), 0, 1))
+
+
+def _exact_task(reference_file, production_file, columns, threshold, sample_size, stratify_by, seed, confidence):
+    """Lecture + tests KS d'un groupe de features (execute dans le pool)"""
+    prod, rows = sample_columns(production_file, columns, sample_size, stratify_by, seed)
+    return _ks_columns(reference_file, prod, columns, threshold, sample_size is not None, rows, confidence)
+
+
+def _exact_drift(reference_file, prod, threshold):
+    reference = load_reference(reference_file)
+    columns = [col for col in reference.columns if col in prod.columns]
+    return _ks_columns(reference_file, prod, columns, threshold, False, len(prod), None)
+
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    """Arrete le pool du controle exact (arret de l'API, fin du processus)"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool, _pool_workers = None, 0
+
+
+atexit.register(shutdown_pool)
+
+
+def exact_drift_file(reference_file, production_file, threshold=0.05, workers=1, sample_size=None,
+                     stratify_by=None, seed=0, confidence=0.95):
+    """ks_2samp par feature sur le fichier de production, en parallele et/ou echantillonne.
+
+    Les features sont reparties en `workers` groupes ; chaque processus ne
+    parse que ses colonnes (usecols, par blocs). Avec `sample_size`, chaque
+    resultat indique la taille d'echantillon et la borne DKW de l'erreur
+    sur la statistique au niveau `confidence`.
+    """
+    reference = load_reference(reference_file)
+    header = pd.read_csv(production_file, nrows=0).columns
+    columns = [col for col in reference.columns if col in header]
+    workers = max(1, min(int(workers), len(columns) or 1))
+    args = (threshold, sample_size, stratify_by, seed, confidence)
+    if workers == 1:
+        return _exact_task(reference_file, production_file, columns, *args)
+
+    groups = [columns[i::workers] for i in range(workers)]
+    futures = [
+        _get_pool(workers).submit(_exact_task, reference_file, production_file, group, *args)
+        for group in groups
+    ]
+    merged = {}
+    for future in futures:
+        merged.update(future.result())
+    return {col: merged[col] for col in columns}
+
+
+def detect_drift(reference_file, production_file, threshold=0.05, output_dir=None,
+                 method="binned", capture=None, workers=1, sample_size=None, stratify_by=None):
+    """Test KS par feature entre reference et production.
+
+    method="binned" (defaut) : resume de reference en cache et histogrammes
+    de production incrementaux ; la statistique est exacte pour les
+    features discretes et a au plus une classe de reference pres pour les
+    continues. method="exact" : ks_2samp sur toutes les donnees.
+    Si `capture` (app.capture.TrafficCapture) est fourni, la production est
+    le trafic capture au lieu de `production_file`. Les rapports sont
+    conserves par app.drift_store ; `output_dir` ecrit en plus un fichier
+    JSON par appel (ancien format). En mode exact sur fichier, `workers`,
+    `sample_size` et `stratify_by` sont transmis a exact_drift_file.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Methode inconnue : {method} (attendu : {', '.join(METHODS)})")
+
+    if method == "exact" and capture is not None:
+        results = _exact_drift(reference_file, capture.read(), threshold)
+    elif method == "exact":
+        results = exact_drift_file(
+            reference_file, production_file, threshold,
+            workers=workers, sample_size=sample_size, stratify_by=stratify_by
+        )
+    else:
+        monitor = get_monitor(reference_file, production_file, capture)
+        monitor.refresh()
+        results = monitor.results(threshold)
 
-    report_path = f"{output_dir}/drift_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    with open(report_path, "w") as f:
-        json.dump(results, f, indent=2)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        report_path = f"{output_dir}/drift_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(report_path, "w") as f:
+            json.dump(results, f, indent=2)
 
     return results
 
@@ -0,0 +1,186 @@
+"""Verifications de drift asynchrones sur un pool de processus.
+
+`/drift/check?async_job=true` soumet un job et renvoie immediatement son
+identifiant ; l'etat et le resultat sont lus via `/drift/jobs/{id}`. Deux
+soumissions identiques pendant qu'un job est en file ou en cours
+partagent le meme job ; le nombre de jobs actifs est plafonne. Si un
+processus du pool meurt, les jobs en cours echouent et le pool est
+reconstruit a la soumission suivante.
+"""
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+ACTIVE = (QUEUED, RUNNING)
+
+
+class JobLimitReached(Exception):
+    """Trop de jobs actifs : la soumission doit etre refusee (429)"""
+
+
+# Lecteurs de capture conserves dans chaque processus du pool : les
+# moniteurs incrementaux de drift_detect survivent d'un job a l'autre
+_capture_readers = {}
+
+
+def run_drift_job(reference_file, production_file, threshold, method, capture_dir, output_dir=None, **options):
+    """Execute detect_drift dans un processus du pool (`options` : workers, sample_size, stratify_by)"""
+    from app.drift_detect import detect_drift
+
+    capture = None
+    if capture_dir:
+        from app.capture import TrafficCapture
+        capture = _capture_readers.setdefault(capture_dir, TrafficCapture(capture_dir))
+    return detect_drift(
+        reference_file, production_file, threshold=threshold, output_dir=output_dir,
+        method=method, capture=capture, **options
+    )
+
+
+class DriftJobManager:
+    """Soumission, deduplication et suivi des jobs de drift"""
+
+    def __init__(self, max_workers: int = 1, max_active: int = 4, history: int = 100,
+                 listener: Optional[Callable[[dict], None]] = None):
+        self.max_workers = max(1, int(max_workers))
+        self.max_active = max(1, int(max_active))
+        self.history = max(1, int(history))
+        # Appele avec le job public a la fin de chaque job (ex. metriques)
+        self.listener = listener
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+        self._active_by_key = {}
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.pool_restarts = 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn : pas de fork d'un processus serveur multi-thread
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(self, key: tuple, fn: Callable, *args, on_done: Optional[Callable] = None, **kwargs) -> tuple:
+        """Soumet `fn(*args, **kwargs)` ; renvoie (job, deduplique ?).
+
+        `on_done(result)` transforme le resultat brut avant stockage (appele
+        dans le processus serveur).
+        """
+        with self._lock:
+            job_id = self._active_by_key.get(key)
+            if job_id is not None:
+                self.deduplicated += 1
+                return self._public(self._jobs[job_id]), True
+            if len(self._active_by_key) >= self.max_active:
+                self.rejected += 1
+                raise JobLimitReached(f"{self.max_active} jobs de drift déjà actifs")
+
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "status": QUEUED,
+                "submitted_at": time.time(),
+                "finished_at": None,
+                "duration_seconds": None,
+                "result": None,
+                "error": None
+            }
+            job["_key"] = key
+            job["_future"] = self._submit(fn, *args, **kwargs)
+            self._jobs[job["job_id"]] = job
+            self._active_by_key[key] = job["job_id"]
+            self.submitted += 1
+            self._trim()
+
+        job["_future"].add_done_callback(lambda future: self._finish(job, future, on_done))
+        return self._public(job), False
+
+    def _submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Soumission au pool ; un pool casse (worker mort) est reconstruit une fois"""
+        try:
+            return self._pool().submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            self._reset_pool()
+        try:
+            return self._pool().submit(fn, *args, **kwargs)
+        except BrokenProcessPool as e:
+            # Le job est enregistre en echec plutot que de faire echouer la requete
+            self._reset_pool()
+            future = Future()
+            future.set_exception(e)
+            return future
+
+    def _reset_pool(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.pool_restarts += 1
+
+    def _finish(self, job: dict, future, on_done: Optional[Callable]):
+        try:
+            result = future.result()
+            if on_done is not None:
+                result = on_done(result)
+            status, error = SUCCEEDED, None
+        except Exception as e:
+            result, status, error = None, FAILED, f"{type(e).__name__}: {e}"
+        with self._lock:
+            job.update(
+                status=status, result=result, error=error,
+                finished_at=time.time(),
+                duration_seconds=round(time.time() - job["submitted_at"], 4)
+            )
+            if self._active_by_key.get(job["_key"]) == job["job_id"]:
+                del self._active_by_key[job["_key"]]
+            public = self._public(job)
+        if self.listener is not None:
+            try:
+                self.listener(public)
+            except Exception:
+                pass
+
+    def _trim(self):
+        """Oublie les plus anciens jobs termines au-dela de `history`"""
+        finished = [jid for jid, job in self._jobs.items() if job["status"] not in ACTIVE]
+        for jid in finished[: max(0, len(self._jobs) - self.history)]:
+            del self._jobs[jid]
+
+    @staticmethod
+    def _public(job: dict) -> dict:
+        public = {k: v for k, v in job.items() if not k.startswith("_")}
+        if public["status"] == QUEUED and job["_future"].running():
+            public["status"] = RUNNING
+        return public
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._public(job) if job is not None else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active": len(self._active_by_key),
+                "max_active": self.max_active,
+                "workers": self.max_workers,
+                "submitted": self.submitted,
+                "deduplicated": self.deduplicated,
+                "rejected": self.rejected,
+                "pool_restarts": self.pool_restarts,
+                "tracked": len(self._jobs)
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
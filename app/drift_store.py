@@ -0,0 +1,281 @@
+"""Stockage indexe des rapports de drift (SQLite).
+
+Un rapport = une ligne dans `reports` + une ligne par feature dans
+`feature_results`, dont la cle primaire (feature, created_at, report_id)
+sert directement les requetes "historique d'une feature sur une periode".
+La compaction agrege les resultats anciens en une ligne par jour, feature
+et version de modele (`feature_daily`) ; la retention supprime le reste.
+"""
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+DAY = 86400
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS reports ("
+    " id INTEGER PRIMARY KEY,"
+    " created_at REAL NOT NULL,"
+    " model_version TEXT,"
+    " source TEXT,"
+    " method TEXT,"
+    " threshold REAL,"
+    " features_analyzed INTEGER NOT NULL,"
+    " features_drifted INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_reports_time ON reports (created_at)",
+    "CREATE TABLE IF NOT EXISTS feature_results ("
+    " feature TEXT NOT NULL,"
+    " created_at REAL NOT NULL,"
+    " report_id INTEGER NOT NULL,"
+    " model_version TEXT,"
+    " statistic REAL,"
+    " p_value REAL,"
+    " drift_detected INTEGER NOT NULL,"
+    " PRIMARY KEY (feature, created_at, report_id)"
+    ") WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS idx_results_version ON feature_results (model_version, feature, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_results_report ON feature_results (report_id)",
+    "CREATE TABLE IF NOT EXISTS feature_daily ("
+    " feature TEXT NOT NULL,"
+    " day REAL NOT NULL,"
+    " model_version TEXT NOT NULL DEFAULT '',"
+    " reports INTEGER NOT NULL,"
+    " drifted INTEGER NOT NULL,"
+    " mean_statistic REAL,"
+    " max_statistic REAL,"
+    " min_p_value REAL,"
+    " PRIMARY KEY (feature, day, model_version)"
+    ") WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS imported_files (name TEXT PRIMARY KEY)"
+)
+
+_JSON_NAME = re.compile(r"drift_(\d{8}_\d{6})\.json$")
+
+
+class DriftReportStore:
+    """Rapports de drift indexes par temps, feature et version de modele"""
+
+    def __init__(
+        self,
+        path: str,
+        retention_days: float = 90,
+        compact_after_days: float = 7,
+        compact_every: float = 3600
+    ):
+        self.path = path
+        self.retention_days = retention_days
+        self.compact_after_days = compact_after_days
+        self.compact_every = compact_every
+        self._local = threading.local()
+        self._last_compaction = 0.0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Une connexion par thread et par processus"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    # Ecriture ----------------------------------------------------------
+    def record(
+        self,
+        results: dict,
+        model_version: Optional[str] = None,
+        source: Optional[str] = None,
+        method: Optional[str] = None,
+        threshold: Optional[float] = None,
+        created_at: Optional[float] = None
+    ) -> int:
+        """Enregistre un rapport {feature: {statistic, p_value, drift_detected}} ; renvoie son id"""
+        created_at = time.time() if created_at is None else created_at
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN")
+            report_id = conn.execute(
+                "INSERT INTO reports (created_at, model_version, source, method, threshold,"
+                " features_analyzed, features_drifted) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (created_at, model_version, source, method, threshold, len(results),
+                 sum(bool(r["drift_detected"]) for r in results.values()))
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO feature_results (feature, created_at, report_id, model_version,"
+                " statistic, p_value, drift_detected) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (feature, created_at, report_id, model_version, r.get("statistic"),
+                     r.get("p_value"), int(bool(r["drift_detected"])))
+                    for feature, r in results.items()
+                ]
+            )
+        if time.time() - self._last_compaction >= self.compact_every:
+            self.compact()
+        return report_id
+
+    def import_json_reports(self, directory: str) -> int:
+        """Importe les anciens drift_YYYYmmdd_HHMMSS.json (une seule fois par fichier)"""
+        conn = self._connect()
+        imported = 0
+        for path in sorted(glob.glob(os.path.join(directory, "drift_*.json"))):
+            name = os.path.basename(path)
+            match = _JSON_NAME.search(name)
+            if not match or conn.execute("SELECT 1 FROM imported_files WHERE name = ?", (name,)).fetchone():
+                continue
+            try:
+                with open(path) as f:
+                    results = json.load(f)
+            except (OSError, ValueError):
+                continue
+            created_at = datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").timestamp()
+            self.record(results, source="json", created_at=created_at)
+            conn.execute("INSERT INTO imported_files (name) VALUES (?)", (name,))
+            imported += 1
+        return imported
+
+    # Maintenance -------------------------------------------------------
+    def compact(self, now: Optional[float] = None) -> dict:
+        """Agrege par jour les resultats plus vieux que compact_after_days, applique la retention"""
+        now = time.time() if now is None else now
+        self._last_compaction = now
+        # Seuil aligne sur un debut de jour : les jours compactes sont complets
+        cutoff = (now - self.compact_after_days * DAY) // DAY * DAY
+        horizon = now - self.retention_days * DAY
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO feature_daily (feature, day, model_version, reports, drifted,"
+                " mean_statistic, max_statistic, min_p_value)"
+                " SELECT feature, CAST(created_at / ? AS INTEGER) * ?, COALESCE(model_version, ''),"
+                "  COUNT(*), SUM(drift_detected), AVG(statistic), MAX(statistic), MIN(p_value)"
+                " FROM feature_results WHERE created_at < ?"
+                " GROUP BY 1, 2, 3"
+                " ON CONFLICT (feature, day, model_version) DO UPDATE SET"
+                "  mean_statistic = (mean_statistic * reports + excluded.mean_statistic * excluded.reports)"
+                "   / (reports + excluded.reports),"
+                "  reports = reports + excluded.reports,"
+                "  drifted = drifted + excluded.drifted,"
+                "  max_statistic = MAX(max_statistic, excluded.max_statistic),"
+                "  min_p_value = MIN(min_p_value, excluded.min_p_value)",
+                (DAY, DAY, cutoff)
+            )
+            compacted = conn.execute("DELETE FROM feature_results WHERE created_at < ?", (cutoff,)).rowcount
+            expired = conn.execute("DELETE FROM reports WHERE created_at < ?", (horizon,)).rowcount
+            conn.execute("DELETE FROM feature_daily WHERE day < ?", (horizon // DAY * DAY,))
+        return {"compacted_results": compacted, "expired_reports": expired}
+
+    # Lecture -----------------------------------------------------------
+    def history(
+        self,
+        feature: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        model_version: Optional[str] = None,
+        limit: int = 1000
+    ) -> list:
+        """Resultats d'une feature sur [start, end], du plus recent au plus ancien"""
+        query = (
+            "SELECT created_at, report_id, model_version, statistic, p_value, drift_detected"
+            " FROM feature_results WHERE feature = ? AND created_at BETWEEN ? AND ?"
+        )
+        params = [feature, start if start is not None else 0, end if end is not None else float("inf")]
+        if model_version is not None:
+            query += " AND model_version = ?"
+            params.append(model_version)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        return [
+            {**dict(row), "drift_detected": bool(row["drift_detected"]), "created_at": _iso(row["created_at"])}
+            for row in self._connect().execute(query, params)
+        ]
+
+    def daily(
+        self,
+        feature: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        model_version: Optional[str] = None
+    ) -> list:
+        """Agregats journaliers d'une feature (jours compactes)"""
+        query = (
+            "SELECT day, model_version, reports, drifted, mean_statistic, max_statistic, min_p_value"
+            " FROM feature_daily WHERE feature = ? AND day BETWEEN ? AND ?"
+        )
+        params = [feature, (start or 0) // DAY * DAY, end if end is not None else float("inf")]
+        if model_version is not None:
+            query += " AND model_version = ?"
+            params.append(model_version)
+        query += " ORDER BY day DESC"
+        return [
+            {**dict(row), "day": _iso(row["day"])[:10], "model_version": row["model_version"] or None}
+            for row in self._connect().execute(query, params)
+        ]
+
+    def reports(self, start: Optional[float] = None, end: Optional[float] = None, limit: int = 100) -> list:
+        rows = self._connect().execute(
+            "SELECT id, created_at, model_version, source, method, threshold, features_analyzed,"
+            " features_drifted FROM reports WHERE created_at BETWEEN ? AND ?"
+            " ORDER BY created_at DESC LIMIT ?",
+            (start if start is not None else 0, end if end is not None else float("inf"), limit)
+        )
+        return [{**dict(row), "created_at": _iso(row["created_at"])} for row in rows]
+
+    def report(self, report_id: int) -> Optional[dict]:
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM reports WHERE id = ?", (report_id,)).fetchone()
+        if row is None:
+            return None
+        features = {
+            r["feature"]: {
+                "statistic": r["statistic"],
+                "p_value": r["p_value"],
+                "drift_detected": bool(r["drift_detected"])
+            }
+            for r in conn.execute(
+                "SELECT feature, statistic, p_value, drift_detected FROM feature_results"
+                " WHERE report_id = ?",
+                (report_id,)
+            )
+        }
+        return {**dict(row), "created_at": _iso(row["created_at"]), "features": features}
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        count = lambda table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        return {
+            "path": self.path,
+            "reports": count("reports"),
+            "feature_results": count("feature_results"),
+            "daily_rollups": count("feature_daily"),
+            "retention_days": self.retention_days,
+            "compact_after_days": self.compact_after_days
+        }
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
+def build_store_from_env() -> DriftReportStore:
+    """Store configure par DRIFT_STORE_PATH / _RETENTION_DAYS / _COMPACT_AFTER_DAYS"""
+    return DriftReportStore(
+        os.getenv("DRIFT_STORE_PATH", "drift_reports/drift_reports.sqlite"),
+        retention_days=float(os.getenv("DRIFT_STORE_RETENTION_DAYS", "90")),
+        compact_after_days=float(os.getenv("DRIFT_STORE_COMPACT_AFTER_DAYS", "7"))
+    )
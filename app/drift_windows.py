@@ -0,0 +1,247 @@
+"""Drift par fenetres glissantes (derniere heure, jour, semaine...).
+
+Les observations capturees sont agregees a l'ecriture en histogrammes
+par tranche de temps (`bucket_seconds`) sur les classes de la reference.
+Une fenetre additionne les tranches concernees au lieu de relire les
+lignes ; KS et PSI sont ensuite calcules pour toutes les features a la
+fois sur une matrice (features x classes).
+"""
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from scipy.stats import kstwo
+
+from app.drift_detect import load_reference
+
+# Classes par feature pour les fenetres (memoire : tranches x features x classes)
+WINDOW_BINS = 64
+
+# Lissage des classes vides pour le PSI
+PSI_EPSILON = 1e-4
+
+_DURATION = re.compile(r"^(\d+(?:\.\d+)?)\s*([smhdw]?)$")
+_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_duration(value) -> float:
+    """'90', '5m', '1h', '7d', '1w' -> secondes"""
+    match = _DURATION.match(str(value).strip().lower())
+    if not match:
+        raise ValueError(f"Duree invalide : {value} (ex. 300, 5m, 1h, 7d)")
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+def psi(counts: np.ndarray, expected: np.ndarray) -> np.ndarray:
+    """Population Stability Index par ligne ; counts (F, B), expected (F, B) en probabilites"""
+    n = counts.sum(axis=1, keepdims=True)
+    actual = counts / np.maximum(n, 1)
+    used = (expected > 0) | (actual > 0)
+    a = np.where(used, np.maximum(actual, PSI_EPSILON), 1.0)
+    e = np.where(used, np.maximum(expected, PSI_EPSILON), 1.0)
+    return ((a - e) * np.log(a / e)).sum(axis=1)
+
+
+def ks_from_histograms(counts: np.ndarray, reference_cdf: np.ndarray, reference_sizes: np.ndarray):
+    """Statistique KS et p-value asymptotique par ligne (comme ks_2samp method='asymp')"""
+    n = counts.sum(axis=1)
+    cdf = np.cumsum(counts, axis=1) / np.maximum(n, 1)[:, None]
+    statistic = np.abs(cdf - reference_cdf).max(axis=1)
+    en = np.round(reference_sizes * n / np.maximum(reference_sizes + n, 1))
+    with np.errstate(invalid="ignore"):
+        p_value = np.where(n > 0, np.clip(kstwo.sf(statistic, np.maximum(en, 1)), 0, 1), np.nan)
+    return statistic, p_value
+
+
+class WindowedDrift:
+    """Histogrammes de production par tranche de temps, sur les classes de la reference"""
+
+    def __init__(
+        self,
+        reference_file: str,
+        bucket_seconds: float = 300,
+        retention_seconds: float = 7 * 86400,
+        max_bins: int = WINDOW_BINS
+    ):
+        reference = load_reference(reference_file, max_bins)
+        self.reference_file = reference_file
+        self.columns = list(reference.columns)
+        self.bucket_seconds = float(bucket_seconds)
+        self.retention_seconds = float(retention_seconds)
+
+        # Bornes et repartition de reference completees a une largeur commune
+        # (classes de bourrage : F_ref = 1 et aucune observation)
+        width = max(len(reference.edges[c]) for c in self.columns) + 1
+        self.n_bins = width
+        self.edges = [reference.edges[c] for c in self.columns]
+        self.reference_cdf = np.ones((len(self.columns), width))
+        self.reference_prob = np.zeros((len(self.columns), width))
+        for j, col in enumerate(self.columns):
+            cdf = reference.cdf[col]
+            self.reference_cdf[j, :len(cdf)] = cdf
+            self.reference_prob[j, :len(cdf) + 1] = np.diff(np.concatenate([[0.0], cdf, [1.0]]))
+        self.reference_sizes = np.array([reference.size(c) for c in self.columns], dtype=np.float64)
+
+        self._buckets: Dict[int, np.ndarray] = {}
+        self._offsets: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.rows = 0
+
+    # Alimentation ------------------------------------------------------
+    def update(self, timestamps: np.ndarray, features: Dict[str, np.ndarray]):
+        """Ajoute des observations horodatees (colonnes -> tableaux)"""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if len(timestamps) == 0:
+            return
+        bucket_ids = np.floor(timestamps / self.bucket_seconds).astype(np.int64)
+        first, last = int(bucket_ids.min()), int(bucket_ids.max())
+        n_buckets, n_features, width = last - first + 1, len(self.columns), self.n_bins
+
+        # Un seul bincount pour toutes les (tranche, feature, classe)
+        keys = []
+        for j, (col, edges) in enumerate(zip(self.columns, self.edges)):
+            values = np.asarray(features[col], dtype=np.float64)
+            valid = ~np.isnan(values)
+            bins = np.searchsorted(edges, values[valid], side="left")
+            keys.append(((bucket_ids[valid] - first) * n_features + j) * width + bins)
+        counts = np.bincount(np.concatenate(keys), minlength=n_buckets * n_features * width)
+        counts = counts.reshape(n_buckets, n_features, width)
+
+        with self._lock:
+            for offset in np.flatnonzero(counts.any(axis=(1, 2))):
+                bucket = first + int(offset)
+                if bucket in self._buckets:
+                    self._buckets[bucket] += counts[offset]
+                else:
+                    self._buckets[bucket] = counts[offset].astype(np.int64)
+            self.rows += len(timestamps)
+            self._expire()
+
+    def _expire(self):
+        # Retention relative a la tranche la plus recente observee
+        horizon = max(self._buckets, default=0) - self.retention_seconds // self.bucket_seconds
+        for bucket in [b for b in self._buckets if b < horizon]:
+            del self._buckets[bucket]
+
+    def refresh(self, capture) -> int:
+        """Integre les enregistrements ajoutes aux segments de `capture` (app.capture)"""
+        capture.flush()
+        paths = capture.segments()
+        added = 0
+        for path in paths:
+            records, offset = capture.read_segment(path, self._offsets.get(path, 0))
+            self._offsets[path] = offset
+            if len(records):
+                self.update(records["timestamp"], {col: records[col] for col in self.columns})
+                added += len(records)
+        for gone in set(self._offsets) - set(paths):
+            del self._offsets[gone]
+        return added
+
+    # Requetes ----------------------------------------------------------
+    def _counts(self, start: float, end: float) -> np.ndarray:
+        first, last = int(start // self.bucket_seconds), int(end // self.bucket_seconds)
+        total = np.zeros((len(self.columns), self.n_bins), dtype=np.int64)
+        with self._lock:
+            for bucket, counts in self._buckets.items():
+                if first <= bucket <= last:
+                    total += counts
+        return total
+
+    def _metrics(self, counts: np.ndarray, threshold: float, psi_threshold: float) -> dict:
+        statistic, p_value = ks_from_histograms(counts, self.reference_cdf, self.reference_sizes)
+        psi_values = psi(counts, self.reference_prob)
+        n = counts.sum(axis=1)
+        features = {}
+        for j, col in enumerate(self.columns):
+            if n[j] == 0:
+                continue
+            features[col] = {
+                "n": int(n[j]),
+                "statistic": float(statistic[j]),
+                "p_value": float(p_value[j]),
+                "psi": float(psi_values[j]),
+                "drift_detected": bool(p_value[j] < threshold),
+                "psi_alert": bool(psi_values[j] >= psi_threshold)
+            }
+        return features
+
+    def window(self, seconds: float, now: Optional[float] = None, threshold: float = 0.05,
+               psi_threshold: float = 0.2) -> dict:
+        """Drift de la fenetre (now - seconds, now]"""
+        now = time.time() if now is None else now
+        features = self._metrics(self._counts(now - seconds, now), threshold, psi_threshold)
+        return {
+            "window_seconds": seconds,
+            "end": now,
+            "rows": max((f["n"] for f in features.values()), default=0),
+            "features_drifted": sum(f["drift_detected"] for f in features.values()),
+            "features_psi_alert": sum(f["psi_alert"] for f in features.values()),
+            "features": features
+        }
+
+    def timeline(self, window_seconds: float, step_seconds: float, points: int = 48,
+                 now: Optional[float] = None) -> List[dict]:
+        """PSI et KS d'une fenetre glissante, evaluee tous les `step_seconds`.
+
+        Sommes cumulees sur les tranches : chaque point coute une
+        soustraction, pas une nouvelle agregation.
+        """
+        now = time.time() if now is None else now
+        size = self.bucket_seconds
+        last = int(now // size)
+        span = int(np.ceil(window_seconds / size))
+        stride = max(1, int(round(step_seconds / size)))
+        ends = last - stride * np.arange(points)[::-1]
+        first = int(ends[0]) - span + 1
+
+        series = np.zeros((last - first + 1, len(self.columns), self.n_bins), dtype=np.int64)
+        with self._lock:
+            for bucket, counts in self._buckets.items():
+                if first <= bucket <= last:
+                    series[bucket - first] = counts
+        cumulative = np.concatenate([np.zeros_like(series[:1]), np.cumsum(series, axis=0)])
+        hi = ends - first + 1
+        windows = cumulative[hi] - cumulative[np.maximum(hi - span, 0)]     # (P, F, B)
+
+        flat = windows.reshape(-1, self.n_bins)
+        reps = (len(ends), 1)
+        statistic, p_value = ks_from_histograms(
+            flat, np.tile(self.reference_cdf, reps), np.tile(self.reference_sizes, len(ends))
+        )
+        psi_values = psi(flat, np.tile(self.reference_prob, reps)).reshape(len(ends), -1)
+        statistic = statistic.reshape(len(ends), -1)
+        p_value = p_value.reshape(len(ends), -1)
+        rows = windows.sum(axis=2).max(axis=1)
+
+        n = windows.sum(axis=2)
+        points = []
+        for i, end in enumerate(ends):
+            # Feature sans observation dans la fenetre : None (pas de NaN en JSON)
+            def series(values, digits=None):
+                return {
+                    col: (None if n[i, j] == 0 else float(values[i, j]) if digits is None
+                          else round(float(values[i, j]), digits))
+                    for j, col in enumerate(self.columns)
+                }
+            points.append({
+                "end": float((end + 1) * size),
+                "rows": int(rows[i]),
+                "psi": series(psi_values, 6),
+                "ks_statistic": series(statistic, 6),
+                "p_value": series(p_value)
+            })
+        return points
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "bucket_seconds": self.bucket_seconds,
+                "retention_seconds": self.retention_seconds,
+                "buckets": len(self._buckets),
+                "bins": self.n_bins,
+                "rows": self.rows,
+                "memory_bytes": sum(c.nbytes for c in self._buckets.values())
+            }
@@ -0,0 +1,235 @@
+"""Moteur d'inference compile pour les forets d'arbres scikit-learn.
+
+La foret est aplatie en tableaux NumPy (feature, seuil, enfants, valeur
+des feuilles) et evaluee pour tous les arbres et toutes les lignes a la
+fois, sans la validation ni l'orchestration joblib de `predict_proba`.
+Les probabilites sont identiques a celles de scikit-learn (meme
+conversion float32 des entrees, meme ordre de sommation des arbres).
+
+La foret compilee peut etre ecrite en fichiers .npy non compresses
+(`save_compiled`) puis ouverte en memoire partagee (`load_compiled`) :
+tous les workers d'un hote lisent alors la meme copie du cache de pages
+au lieu de deserialiser chacun leur propre copie des noeuds.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+
+ENGINES = ("sklearn", "compiled")
+
+# Nombre de lignes evaluees par bloc (borne la memoire des index de noeuds)
+BLOCK_ROWS = 4096
+
+# Format de l'artefact memory-mappable
+ARTIFACT_FORMAT = 1
+ARRAYS = ("feature", "threshold", "children", "class_values", "roots")
+
+
+class CompiledForest:
+    """Foret compilee en tableaux plats, compatible `predict_proba`"""
+
+    def __init__(self, feature, threshold, children, class_values, roots, max_depth, n_features, classes):
+        # Tous les tableaux sont utilises tels quels (aucune copie derivee) :
+        # ils peuvent etre des memmaps partages entre workers
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children            # [gauche, droite] entrelaces par noeud
+        self.class_values = class_values    # (n_classes, n_nodes)
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.classes_ = np.asarray(classes)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @property
+    def left(self) -> np.ndarray:
+        return self.children[0::2]
+
+    @property
+    def right(self) -> np.ndarray:
+        return self.children[1::2]
+
+    @property
+    def value(self) -> np.ndarray:
+        """Probabilites par feuille, forme (n_nodes, n_classes)"""
+        return self.class_values.T
+
+    @classmethod
+    def from_sklearn(cls, model) -> "CompiledForest":
+        """Compile un RandomForestClassifier / ExtraTreesClassifier entraine"""
+        estimators = getattr(model, "estimators_", None)
+        if not estimators or not hasattr(estimators[0], "tree_"):
+            raise TypeError(f"Modele non supporte par le moteur compile : {type(model).__name__}")
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise TypeError("Seules les forets mono-sortie sont supportees")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            n = tree.node_count
+            ids = np.arange(offset, offset + n, dtype=np.int64)
+            is_leaf = tree.children_left == -1
+
+            # Les feuilles pointent sur elles-memes : le parcours peut
+            # continuer sans branchement jusqu'a max_depth
+            lefts.append(np.where(is_leaf, ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, ids, tree.children_right + offset))
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+
+            # Meme normalisation que DecisionTreeClassifier.predict_proba
+            proba = tree.value[:, 0, :].astype(np.float64)
+            normalizer = proba.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(proba / normalizer)
+
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n
+
+        index_dtype = np.int32 if 2 * offset < np.iinfo(np.int32).max else np.int64
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children=np.column_stack([np.concatenate(lefts), np.concatenate(rights)]).astype(index_dtype).ravel(),
+            class_values=np.ascontiguousarray(np.concatenate(values).T),
+            roots=np.array(roots, dtype=index_dtype),
+            max_depth=max_depth,
+            n_features=model.n_features_in_,
+            classes=model.classes_
+        )
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Index des feuilles atteintes, forme (n_trees, n_rows)"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows = len(X)
+        flat_X = X.ravel()
+        # Decalage de chaque ligne dans X aplati, pour chaque (arbre, ligne)
+        row_offset = np.tile(np.arange(n_rows, dtype=np.intp) * self.n_features_in_, self.n_trees)
+        idx = np.repeat(self.roots.astype(np.intp), n_rows)
+        for _ in range(self.max_depth):
+            x = flat_X.take(row_offset + self.feature.take(idx))
+            go_right = x > self.threshold.take(idx)
+            idx = self.children.take(2 * idx + go_right)
+        return idx.reshape(self.n_trees, n_rows)
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"X doit etre de forme (n, {self.n_features_in_}), recu {X.shape}"
+            )
+        out = np.empty((len(X), len(self.class_values)), dtype=np.float64)
+        for start in range(0, len(X), BLOCK_ROWS):
+            leaves = self.apply(X[start:start + BLOCK_ROWS])
+            for k, class_value in enumerate(self.class_values):
+                # Reduction sur l'axe des arbres : somme sequentielle dans
+                # l'ordre des arbres, comme l'accumulation de scikit-learn
+                total = class_value.take(leaves).sum(axis=0)
+                out[start:start + BLOCK_ROWS, k] = total / self.n_trees
+        return out
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def check_parity(reference, compiled, n_samples: int = 512, seed: int = 0, X=None) -> float:
+    """Ecart maximal entre les probabilites sklearn et compilees.
+
+    Utilise `X` s'il est fourni, sinon des lignes tirees dans les bornes
+    des seuils de la foret.
+    """
+    if X is None:
+        rng = np.random.default_rng(seed)
+        finite = np.isfinite(compiled.threshold)
+        lows = np.zeros(compiled.n_features_in_)
+        highs = np.ones(compiled.n_features_in_)
+        for j in range(compiled.n_features_in_):
+            t = compiled.threshold[finite & (compiled.feature == j)]
+            if len(t):
+                lows[j], highs[j] = t.min() - 1, t.max() + 1
+        X = rng.uniform(lows, highs, size=(n_samples, compiled.n_features_in_))
+        # Un quart des lignes arrondies : les seuils entre entiers sont exerces
+        X[: n_samples // 4] = np.round(X[: n_samples // 4])
+    expected = np.asarray(reference.predict_proba(X))
+    return float(np.max(np.abs(expected - compiled.predict_proba(X))))
+
+
+def compile_model(model):
+    """Compile `model` et verifie la parite exacte avec scikit-learn"""
+    compiled = CompiledForest.from_sklearn(model)
+    gap = check_parity(model, compiled)
+    if gap != 0.0:
+        raise ValueError(f"Parite non respectee avec scikit-learn (ecart max {gap:.3g})")
+    return compiled
+
+
+def save_compiled(compiled: CompiledForest, path: str, metadata: dict = None):
+    """Ecrit la foret dans le repertoire `path` (un .npy par tableau + meta.json).
+
+    L'ecriture se fait dans un repertoire temporaire renomme a la fin : un
+    worker qui charge en parallele voit l'ancien artefact ou le nouveau,
+    jamais un melange des deux.
+    """
+    path = os.path.normpath(path)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name in ARRAYS:
+        np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(getattr(compiled, name)))
+    meta = {
+        "format": ARTIFACT_FORMAT,
+        "max_depth": compiled.max_depth,
+        "n_features": compiled.n_features_in_,
+        "classes": compiled.classes_.tolist(),
+        "n_trees": compiled.n_trees,
+        "n_nodes": compiled.n_nodes,
+        **(metadata or {})
+    }
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    old = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path):
+        os.rename(path, old)
+    os.rename(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+def read_metadata(path: str) -> dict:
+    with open(os.path.join(path, "meta.json")) as f:
+        return json.load(f)
+
+
+def load_compiled(path: str, mmap: bool = True):
+    """Ouvre un artefact ecrit par `save_compiled` ; renvoie (foret, meta).
+
+    Avec mmap=True les tableaux sont des memmaps en lecture seule : les
+    pages sont partagees par tous les processus qui ouvrent les memes
+    fichiers.
+    """
+    meta = read_metadata(path)
+    if meta.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"Format d'artefact non supporte : {meta.get('format')}")
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+        for name in ARRAYS
+    }
+    compiled = CompiledForest(
+        max_depth=meta["max_depth"],
+        n_features=meta["n_features"],
+        classes=meta["classes"],
+        **arrays
+    )
+    return compiled, meta
@@ -1,20 +1,63 @@
-from fastapi import FastAPI, HTTPException, Security, Depends
+from app.startup import startup_profile
+
+# Dependances du chemin /predict, importees et chronometrees ici (rapport
+# dans /health) ; celles du drift (pandas, scipy) au premier usage
+startup_profile.import_modules([
+    "numpy", "pydantic", "starlette", "fastapi", "joblib",
+    "app.models", "app.scoring", "app.streaming", "app.batching", "app.cache",
+    "app.capture", "app.forest_engine", "app.model_registry", "app.drift_jobs",
+    "app.drift_store", "app.metrics", "app.telemetry"
+])
+
+from fastapi import FastAPI, HTTPException, Security, Depends, Body, Query, Request
 from fastapi.security import APIKeyHeader
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from typing import Any, List, Optional
 import os
-import joblib
 import numpy as np
 import logging
 import os
+import sys
 import traceback
 
-from opencensus.ext.azure.log_exporter import AzureLogHandler
-from app.models import CustomerFeatures, PredictionResponse, HealthResponse
-from app.drift_detect import detect_drift
-from functools import lru_cache
-import hashlib
+from app.models import (
+    CustomerFeatures,
+    PredictionResponse,
+    BatchPredictionResponse,
+    HealthResponse
+)
+from app.scoring import (
+    features_to_row,
+    rows_to_matrix,
+    score_matrix,
+    format_prediction,
+    format_predictions
+)
+from app.streaming import StreamScorer, DEFAULT_CHUNK_ROWS, detect_format
+from app.batching import MicroBatcher, BatcherOverloaded
+from app.cache import build_cache_from_env
+from app.capture import build_capture_from_env
+from app.forest_engine import ENGINES, compile_model
+from app import model_registry
+from app.drift_jobs import DriftJobManager, JobLimitReached, run_drift_job
+from app.drift_store import build_store_from_env
+from app.telemetry import build_telemetry_from_env
+from app.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    COUNTER,
+    GAUGE,
+    MetricsMiddleware,
+    MetricsRegistry,
+    SnapshotWriter,
+    read_snapshots
+)
 import json
+import threading
+import time
+from datetime import datetime, timezone
 
 # -------------------------------------------------
 # Logging & Application Insights
@@ -24,11 +67,17 @@ logger = logging.getLogger("bank-churn-api")
 
 APPINSIGHTS_CONN = os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING")
 if APPINSIGHTS_CONN:
+    startup_profile.import_modules(["opencensus.ext.azure.log_exporter"])
+    from opencensus.ext.azure.log_exporter import AzureLogHandler
     logger.addHandler(AzureLogHandler(connection_string=APPINSIGHTS_CONN))
     logger.info("Application Insights connecté")
 else:
     logger.warning("Application Insights non configuré")
 
+# Evenements metier (prediction, batch, drift) : mis en file sur le chemin
+# de requete, exportes par lots par un thread de fond
+telemetry = build_telemetry_from_env(logger)
+
 # -------------------------------------------------
 # Initialisation FastAPI
 # -------------------------------------------------
@@ -47,6 +96,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# -------------------------------------------------
+# Métriques (Prometheus, exposees sur /metrics)
+# -------------------------------------------------
+# Sous gunicorn, instantane de chaque worker dans METRICS_DIR (agrege par /metrics)
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+metrics = MetricsRegistry()
+HTTP_DURATION = metrics.histogram(
+    "bank_churn_http_request_duration_seconds",
+    "Duree des requetes HTTP par route et statut",
+    ("method", "route", "status")
+)
+PREDICT_STAGE = metrics.histogram(
+    "bank_churn_predict_stage_seconds",
+    "Duree de chaque etape du chemin de prediction",
+    ("endpoint", "stage")
+)
+BATCH_ROWS = metrics.histogram(
+    "bank_churn_batch_rows",
+    "Lignes par requete /predict/batch",
+    buckets=(1, 10, 100, 1000, 10000, 100000)
+)
+DRIFT_JOB_DURATION = metrics.histogram(
+    "bank_churn_drift_job_duration_seconds",
+    "Duree des jobs de drift asynchrones (soumission -> fin)",
+    ("status",),
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+)
+
+# Series du chemin chaud resolues une fois pour toutes
+STAGE_DECODE = PREDICT_STAGE.labels("predict", "decode_validate")
+STAGE_FEATURES = PREDICT_STAGE.labels("predict", "features")
+STAGE_CACHE_LOOKUP = PREDICT_STAGE.labels("predict", "cache_lookup")
+STAGE_SCORE = PREDICT_STAGE.labels("predict", "score")
+STAGE_CACHE_STORE = PREDICT_STAGE.labels("predict", "cache_store")
+STAGE_CAPTURE = PREDICT_STAGE.labels("predict", "capture")
+STAGE_TELEMETRY = PREDICT_STAGE.labels("predict", "telemetry")
+BATCH_VALIDATE = PREDICT_STAGE.labels("batch", "validate")
+BATCH_SCORE = PREDICT_STAGE.labels("batch", "score")
+BATCH_FORMAT = PREDICT_STAGE.labels("batch", "format")
+
+def _stage(series, since: float) -> float:
+    """Enregistre la duree ecoulee depuis `since` ; renvoie l'instant courant"""
+    now = time.perf_counter()
+    series.observe(now - since)
+    return now
+
+app.add_middleware(MetricsMiddleware, histogram=HTTP_DURATION)
+
 # -------------------------------------------------
 # Sécurité - API Key
 # -------------------------------------------------
@@ -66,17 +165,181 @@ async def get_api_key(api_key_header: str = Security(api_key_header)):
 # Chargement du modèle
 # -------------------------------------------------
 MODEL_PATH = os.getenv("MODEL_PATH", "model/churn_model.pkl")
+MODEL_SOURCE = os.getenv("MODEL_SOURCE", "file").lower()
+MODEL_REGISTRY_VERSION = os.getenv("MODEL_REGISTRY_VERSION", "latest")
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
+INFERENCE_ENGINE = os.getenv("INFERENCE_ENGINE", "sklearn").lower()
+# Artefact .npy ecrit par train_model.py, ouvert en memoire partagee quand
+# le moteur compile est actif (une seule copie des arbres par hote)
+MODEL_MMAP_PATH = os.getenv("MODEL_MMAP_PATH", model_registry.mmap_path_for(MODEL_PATH))
+# Esquisse de la distribution d'entrainement, versionnee avec le modele :
+# reference du drift pour le modele servi
+REFERENCE_SKETCH_PATH = os.getenv("REFERENCE_SKETCH_PATH", model_registry.sketch_path_for(MODEL_PATH))
 model = None
+model_version = None
+model_loaded_at = None
+model_load_seconds = None
+engine = None
+model_mmap = False
+model_preloaded = False
+model_signature = None
+drift_reference = None
+watcher = None
+_model_lock = threading.Lock()
+_reload_lock = threading.Lock()
 
-@app.on_event("startup")
-async def load_model():
-    global model
+# Ligne d'exemple pour prechauffer un nouveau modele avant l'echange
+WARMUP_ROW = (650, 35, 5, 50000.0, 2, 1, 1, 75000.0, 0, 1)
+
+# Cache des predictions, vide a chaque changement de modele
+prediction_cache = build_cache_from_env()
+
+def prepare_model(raw_model, requested_engine: str = INFERENCE_ENGINE):
+    """Renvoie (modele a servir, moteur actif) selon INFERENCE_ENGINE.
+
+    Le moteur compile est verifie contre scikit-learn ; en cas d'echec le
+    modele scikit-learn est servi tel quel.
+    """
+    if requested_engine not in ENGINES:
+        logger.error(f"INFERENCE_ENGINE inconnu : {requested_engine}, utilisation de sklearn")
+        return raw_model, "sklearn"
+    if requested_engine == "compiled":
+        try:
+            return compile_model(raw_model), "compiled"
+        except Exception as e:
+            logger.error(f"Moteur compilé indisponible, utilisation de sklearn : {e}")
+    return raw_model, "sklearn"
+
+def load_served_model(source: str, version: str):
+    """Renvoie (modele a servir, version, moteur actif, memory-mappe ?)"""
+    if source == "file" and INFERENCE_ENGINE == "compiled" and os.path.isdir(MODEL_MMAP_PATH):
+        try:
+            served, new_version = model_registry.load_mmap(MODEL_PATH, MODEL_MMAP_PATH)
+            return served, new_version, "compiled", True
+        except Exception as e:
+            logger.error(f"Artefact memory-mappé inutilisable, chargement du pickle : {e}")
+    raw, new_version = model_registry.load(source, MODEL_PATH, version)
+    served, active_engine = prepare_model(raw)
+    return served, new_version, active_engine, False
+
+def set_model(new_model, version, active_engine=None, load_seconds=None, mmap=False):
+    """Remplace le modele servi et invalide le cache des predictions.
+
+    Les requetes en cours gardent leur reference a l'ancien modele et se
+    terminent avec lui.
+    """
+    global model, model_version, model_loaded_at, model_load_seconds, engine, model_mmap
+    with _model_lock:
+        model = new_model
+        model_version = version
+        engine = active_engine
+        model_mmap = mmap
+        model_load_seconds = load_seconds
+        model_loaded_at = datetime.now(timezone.utc).isoformat() if new_model is not None else None
+        prediction_cache.clear()
+
+def model_info() -> dict:
+    return {
+        "model_version": model_version,
+        "model_loaded_at": model_loaded_at,
+        "model_load_seconds": model_load_seconds,
+        "engine": engine,
+        "model_mmap": model_mmap,
+        "drift_reference": drift_reference
+    }
+
+def reload_model(source: str = MODEL_SOURCE, version: str = MODEL_REGISTRY_VERSION) -> dict:
+    """Charge, prechauffe puis echange atomiquement le modele servi"""
+    global model_signature, drift_reference
+    with _reload_lock:
+        started = time.perf_counter()
+        # Signature relevee avant le chargement : un changement pendant le
+        # chargement sera vu par le watcher
+        signature = _source_signature() if source == MODEL_SOURCE else None
+        served, new_version, active_engine, mmap = load_served_model(source, version)
+        loaded = time.perf_counter()
+        served.predict_proba(rows_to_matrix([WARMUP_ROW]))
+        startup_profile.record("model_load", loaded - started)
+        startup_profile.record("model_warmup", time.perf_counter() - loaded)
+        reference = model_registry.reference_sketch(source, new_version, REFERENCE_SKETCH_PATH)
+        set_model(served, new_version, active_engine, round(time.perf_counter() - started, 4), mmap)
+        drift_reference = reference
+        model_signature = signature
+    logger.info(
+        f"Modèle chargé ({source}, version {model_version}, moteur {engine}, "
+        f"mmap {model_mmap}, {model_load_seconds}s)"
+    )
+    return model_info()
+
+def _source_signature():
+    if MODEL_SOURCE == "registry":
+        return model_registry.latest_registry_version()
+    return model_registry.file_signature(MODEL_PATH)
+
+# -------------------------------------------------
+# Mode pre-fork (gunicorn.conf.py) et disponibilite des workers
+# -------------------------------------------------
+READINESS_DIR = os.getenv("READINESS_DIR")
+
+def readiness_file(pid: Optional[int] = None) -> Optional[str]:
+    if not READINESS_DIR:
+        return None
+    return os.path.join(READINESS_DIR, f"worker-{pid or os.getpid()}.ready")
+
+def mark_ready():
+    """Signale que ce worker a un modele charge et accepte les predictions"""
+    path = readiness_file()
+    if path is None:
+        return
+    os.makedirs(READINESS_DIR, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"pid": os.getpid(), **model_info()}, f)
+
+def clear_ready(pid: Optional[int] = None):
+    path = readiness_file(pid)
+    if path is not None and os.path.exists(path):
+        os.remove(path)
+
+def preload_model():
+    """Charge le modele dans le processus maitre, avant le fork des workers"""
+    global model_preloaded
     try:
-        model = joblib.load(MODEL_PATH)
-        logger.info(f"Modèle chargé depuis {MODEL_PATH}")
+        reload_model()
+        model_preloaded = True
     except Exception as e:
-        logger.error(f"Erreur chargement modèle : {e}")
-        model = None
+        logger.error(f"Préchargement du modèle échoué, chargement par worker : {e}")
+
+@app.on_event("startup")
+async def load_model():
+    global watcher
+    if model_preloaded and model is not None:
+        # Modele herite du maitre (copie sur ecriture) : pas de rechargement
+        logger.info(f"Modèle préchargé hérité du maître (version {model_version})")
+    else:
+        try:
+            reload_model()
+        except Exception as e:
+            logger.error(f"Erreur chargement modèle : {e}")
+            set_model(None, None)
+
+    if MODEL_WATCH_INTERVAL > 0 and watcher is None:
+        watcher = model_registry.ModelWatcher(_source_signature, reload_model, MODEL_WATCH_INTERVAL)
+        # Signature du modele effectivement servi (un worker recycle herite du
+        # modele du maitre, eventuellement plus ancien que le fichier actuel)
+        watcher.prime(model_signature if model is not None else None)
+        watcher.start()
+        logger.info(f"Surveillance du modèle active (toutes les {MODEL_WATCH_INTERVAL:g}s)")
+
+    if model is not None:
+        mark_ready()
+
+@app.on_event("shutdown")
+async def stop_model_watcher():
+    global watcher
+    clear_ready()
+    if watcher is not None:
+        watcher.stop()
+        watcher = None
 
 # -------------------------------------------------
 # Endpoints généraux
@@ -95,117 +358,677 @@ def root():
 def health():
     if model is None:
         raise HTTPException(status_code=503, detail="Modèle non chargé")
-    return {"status": "healthy", "model_loaded": True}
+    return {
+        "status": "healthy",
+        "model_loaded": True,
+        "worker_pid": os.getpid(),
+        "startup": startup_report(),
+        **model_info()
+    }
+
+@app.post("/admin/reload", tags=["Admin"])
+def admin_reload(
+    source: Optional[str] = Query(None, pattern="^(file|registry)$"),
+    version: str = "latest",
+    api_key: str = Depends(get_api_key)
+):
+    """Recharge le modele (MODEL_PATH ou registre MLflow) sans redemarrage.
+
+    Le nouveau modele est charge et prechauffe avant l'echange ; en cas
+    d'echec, le modele actuel reste servi.
+    """
+    try:
+        return reload_model(source or MODEL_SOURCE, version)
+    except Exception as e:
+        logger.error(f"Rechargement du modèle échoué : {e}")
+        raise HTTPException(status_code=500, detail=f"Rechargement échoué : {e}")
 
 # -------------------------------------------------
 # Caching & Utils
 # -------------------------------------------------
-def hash_features(features_dict: dict) -> str:
-    """Cree un hash unique pour les features"""
-    return hashlib.md5(
-        json.dumps(features_dict, sort_keys=True).encode()
-    ).hexdigest()
-
-@lru_cache(maxsize=1000)
-def predict_cached(features_hash: str, features_json: str):
-    """Fonction de prediction mise en cache"""
-    features_dict = json.loads(features_json)
-    
-    # Preparation des donnees pour le modele
-    X = np.array([[ 
-        features_dict["CreditScore"],
-        features_dict["Age"],
-        features_dict["Tenure"],
-        features_dict["Balance"],
-        features_dict["NumOfProducts"],
-        features_dict["HasCrCard"],
-        features_dict["IsActiveMember"],
-        features_dict["EstimatedSalary"],
-        features_dict["Geography_Germany"],
-        features_dict["Geography_Spain"]
-    ]])
-    
-    # Prediction
-    proba = model.predict_proba(X)[0][1]
-    prediction = int(proba > 0.5)
-    risk = "Low" if proba < 0.3 else "Medium" if proba < 0.7 else "High"
-    
-    return {
-        "churn_probability": round(float(proba), 4),
-        "prediction": prediction,
-        "risk_level": risk
-    }
+def hash_features(row: tuple) -> str:
+    """Empreinte courte des features (pour les logs), sans passage par JSON"""
+    return format(hash(row) & 0xFFFFFFFFFFFFFFFF, "016x")
+
+def score_one(row: tuple) -> float:
+    """Probabilite de churn pour une seule ligne"""
+    return float(score_matrix(model, rows_to_matrix([row]))[0])
+
+def predict_cached(row: tuple) -> dict:
+    """Prediction d'une ligne validee, via le cache versionne"""
+    key = (model_version, row)
+    result = prediction_cache.get(key)
+    if result is None:
+        result = format_prediction(score_one(row))
+        prediction_cache.put(key, result)
+    return result
+
+async def cache_call(fn, *args):
+    """Acces au cache depuis un endpoint async (SQLite : hors de la boucle)"""
+    if prediction_cache.blocking:
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
+@app.get("/cache/stats", tags=["Monitoring"])
+def cache_stats(api_key: str = Depends(get_api_key)):
+    """Hits, misses et evictions du cache des predictions"""
+    return {**prediction_cache.stats(), "model_version": model_version}
+
+# -------------------------------------------------
+# Micro-batching (optionnel)
+# -------------------------------------------------
+MICROBATCH_ENABLED = os.getenv("MICROBATCH_ENABLED", "0") == "1"
+
+def score_rows(rows):
+    """Score un lot de lignes avec le modele courant"""
+    return score_matrix(model, rows_to_matrix(rows))
+
+batcher = MicroBatcher(
+    score_rows,
+    max_batch_size=int(os.getenv("MICROBATCH_MAX_SIZE", "64")),
+    max_wait_ms=float(os.getenv("MICROBATCH_MAX_WAIT_MS", "2")),
+    max_queue_size=int(os.getenv("MICROBATCH_MAX_QUEUE", "10000"))
+)
+
+@app.on_event("startup")
+async def start_batcher():
+    if MICROBATCH_ENABLED:
+        await batcher.start()
+        logger.info(
+            f"Micro-batching actif ({batcher.max_batch_size} lignes / "
+            f"{batcher.max_wait * 1000:g} ms)"
+        )
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await batcher.stop()
+
+@app.get("/batching/stats", tags=["Monitoring"])
+def batching_stats(api_key: str = Depends(get_api_key)):
+    """Profondeur de file, taille des lots et temps d'attente du micro-batching"""
+    return batcher.stats()
+
+# -------------------------------------------------
+# Capture du trafic (alimente la detection de drift)
+# -------------------------------------------------
+traffic_capture = build_capture_from_env()
+
+@app.on_event("startup")
+async def start_capture():
+    if traffic_capture is not None:
+        traffic_capture.start()
+        logger.info(f"Capture du trafic active ({traffic_capture.directory})")
+
+@app.on_event("shutdown")
+async def stop_capture():
+    if traffic_capture is not None:
+        traffic_capture.stop()
+
+# -------------------------------------------------
+# Telemetrie (export asynchrone)
+# -------------------------------------------------
+@app.on_event("startup")
+async def start_telemetry():
+    telemetry.start()
+
+@app.on_event("shutdown")
+async def stop_telemetry():
+    telemetry.stop()
+
+@app.get("/telemetry/stats", tags=["Monitoring"])
+def telemetry_stats(api_key: str = Depends(get_api_key)):
+    """Evenements emis, echantillonnes, perdus (file pleine) et exportes"""
+    return telemetry.stats()
+
+@app.get("/capture/stats", tags=["Monitoring"])
+def capture_stats(api_key: str = Depends(get_api_key)):
+    """Observations capturees, perdues et espace disque des segments"""
+    if traffic_capture is None:
+        return {"enabled": False}
+    return traffic_capture.stats()
 
 # -------------------------------------------------
 # Prédiction
 # -------------------------------------------------
 @app.post("/predict", response_model=PredictionResponse)
-def predict(features: CustomerFeatures, api_key: str = Depends(get_api_key)):
+async def predict(features: CustomerFeatures, request: Request, api_key: str = Depends(get_api_key)):
+    # Lecture du corps, validation Pydantic et cle API (avant l'endpoint)
+    t = time.perf_counter()
+    STAGE_DECODE.observe(t - getattr(request.state, "received_at", t))
     if model is None:
         raise HTTPException(status_code=503, detail="Modèle indisponible")
 
     try:
-        # On utilise model_dump() pour Pydantic V2
-        features_dict = features.model_dump()
-        features_hash = hash_features(features_dict)
-        features_json = json.dumps(features_dict)
+        # Cle de cache : tuple des features validees + version du modele
+        row = features_to_row(features)
+        features_hash = hash_features(row)
+        key = (model_version, row)
+        t = _stage(STAGE_FEATURES, t)
+
+        result = await cache_call(prediction_cache.get, key)
+        t = _stage(STAGE_CACHE_LOOKUP, t)
+        if result is None:
+            if batcher.running:
+                # Regroupe les requetes concurrentes en un seul predict_proba
+                # (l'attente du lot est comptee dans `score`)
+                proba = await batcher.submit(row)
+            else:
+                proba = await run_in_threadpool(score_one, row)
+            t = _stage(STAGE_SCORE, t)
+            result = format_prediction(proba)
+            await cache_call(prediction_cache.put, key, result)
+            t = _stage(STAGE_CACHE_STORE, t)
+
+        if traffic_capture is not None:
+            traffic_capture.record(row, result["churn_probability"])
+            t = _stage(STAGE_CAPTURE, t)
         
-        # Utilise le cache si disponible
-        result = predict_cached(features_hash, features_json)
+        telemetry.emit("prediction", {
+            "features_hash": features_hash,
+            "probability": result["churn_probability"],
+            "risk_level": result["risk_level"]
+        })
+        _stage(STAGE_TELEMETRY, t)
         
-        logger.info(
-            "prediction",
-            extra={
-                "custom_dimensions": {
-                    "event_type": "prediction",
-                    "features_hash": features_hash,
-                    "probability": result["churn_probability"],
-                    "risk_level": result["risk_level"]
+        return result
+
+    except BatcherOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erreur prediction : {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# -------------------------------------------------
+# Prédiction batch (vectorisée)
+# -------------------------------------------------
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "10000"))
+
+# Le corps est lu en List[Any] pour rejeter les lignes invalides une par une,
+# mais documente comme une liste de CustomerFeatures dans /docs
+BATCH_REQUEST_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {
+                "schema": {
+                    "type": "array",
+                    "items": {"$ref": "#/components/schemas/CustomerFeatures"}
                 }
             }
+        }
+    }
+}
+
+@app.post(
+    "/predict/batch",
+    response_model=BatchPredictionResponse,
+    openapi_extra=BATCH_REQUEST_SCHEMA
+)
+def predict_batch(
+    rows: List[Any] = Body(...),
+    validate_response: bool = True,
+    api_key: str = Depends(get_api_key)
+):
+    """Predit un lot de clients avec un seul appel predict_proba.
+
+    Les lignes invalides sont rejetees individuellement (champ `errors`)
+    sans faire echouer le lot. `validate_response=false` renvoie le JSON
+    directement, sans validation Pydantic de chaque ligne de reponse.
+    """
+    if model is None:
+        raise HTTPException(status_code=503, detail="Modèle indisponible")
+    if len(rows) > BATCH_MAX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch trop volumineux ({len(rows)} > {BATCH_MAX_ROWS} lignes)"
         )
-        
-        return result
 
+    BATCH_ROWS.observe(len(rows))
+    t = time.perf_counter()
+    valid_index, valid_rows, errors = [], [], []
+    for i, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({
+                "index": i,
+                "errors": [{
+                    "type": "dict_type",
+                    "loc": [],
+                    "msg": "La ligne doit etre un objet CustomerFeatures",
+                    "input": row
+                }]
+            })
+            continue
+        try:
+            valid_rows.append(features_to_row(CustomerFeatures.model_validate(row)))
+            valid_index.append(i)
+        except ValidationError as e:
+            errors.append({
+                "index": i,
+                "errors": e.errors(include_url=False, include_context=False)
+            })
+
+    t = _stage(BATCH_VALIDATE, t)
+
+    try:
+        probas = score_matrix(model, rows_to_matrix(valid_rows))
     except Exception as e:
-        logger.error(f"Erreur prediction : {e}")
+        logger.error(f"Erreur prediction batch : {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    t = _stage(BATCH_SCORE, t)
+
+    predictions = [None] * len(rows)
+    for i, result in zip(valid_index, format_predictions(probas)):
+        predictions[i] = result
+    _stage(BATCH_FORMAT, t)
+
+    if traffic_capture is not None:
+        traffic_capture.record_many(valid_rows, probas)
+
+    telemetry.emit("batch_prediction", {
+        "n_rows": len(rows),
+        "n_scored": len(valid_rows),
+        "n_errors": len(errors)
+    })
+
+    payload = {
+        "predictions": predictions,
+        "errors": errors,
+        "n_rows": len(rows),
+        "n_scored": len(valid_rows)
+    }
+    if not validate_response:
+        return JSONResponse(content=payload)
+    return payload
+
+# -------------------------------------------------
+# Prédiction en flux (CSV / NDJSON)
+# -------------------------------------------------
+class UploadStreamingResponse(StreamingResponse):
+    """StreamingResponse qui n'ecoute pas `receive` pendant l'envoi.
+
+    Starlette 0.27 lance listen_for_disconnect en parallele du generateur :
+    cette tache consommerait les messages http.request du corps que le
+    generateur lit lui-meme via request.stream(). Une deconnexion du client
+    est detectee par request.stream() (ClientDisconnect).
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+@app.post("/predict/stream")
+async def predict_stream(
+    request: Request,
+    input_format: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$"),
+    chunk_rows: int = Query(DEFAULT_CHUNK_ROWS, ge=1, le=100000),
+    api_key: str = Depends(get_api_key)
+):
+    """Score un fichier CSV ou NDJSON envoye en flux (corps brut), bloc par bloc.
+
+    Les predictions sont renvoyees en NDJSON pendant la reception du
+    fichier ; la derniere ligne contient toujours le resume (`summary`)
+    avec le debit en lignes/s et, le cas echeant, l'erreur rencontree.
+    """
+    if model is None:
+        raise HTTPException(status_code=503, detail="Modèle indisponible")
+
+    fmt = input_format or detect_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Content-Type non supporté : envoyer le fichier brut en text/csv ou application/x-ndjson"
+        )
+
+    scorer = StreamScorer(model, fmt=fmt, chunk_rows=chunk_rows)
+
+    async def generate():
+        error = None
+        try:
+            async for block in request.stream():
+                out = await run_in_threadpool(scorer.feed, block)
+                if out:
+                    yield out
+            out = await run_in_threadpool(scorer.finish)
+            if out:
+                yield out
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Erreur prediction flux : {e}")
+        finally:
+            telemetry.emit("stream_prediction", scorer.summary(error))
+        yield scorer.trailer(error)
+
+    return UploadStreamingResponse(generate(), media_type="application/x-ndjson")
 
 # -------------------------------------------------
 # Drift Detection (API)
 # -------------------------------------------------
-@app.post("/drift/check", tags=["Monitoring"])
-def check_drift(threshold: float = 0.05, api_key: str = Depends(get_api_key)):
+# CSV d'entrainement : reference de repli quand le modele servi n'a pas
+# d'esquisse (modele anterieur aux esquisses)
+DRIFT_REFERENCE_FILE = "data/bank_churn.csv"
+DRIFT_PRODUCTION_FILE = "data/production_data.csv"
+
+def drift_module():
+    """app.drift_detect (pandas, scipy), importe au premier controle de drift"""
+    return startup_profile.lazy_import("app.drift_detect")
+
+def drift_reference_file() -> str:
+    """Esquisse du modele servi, sinon le CSV d'entrainement"""
+    return drift_reference or DRIFT_REFERENCE_FILE
+
+drift_jobs = DriftJobManager(
+    max_workers=int(os.getenv("DRIFT_JOB_WORKERS", "1")),
+    max_active=int(os.getenv("DRIFT_JOB_MAX_ACTIVE", "4")),
+    history=int(os.getenv("DRIFT_JOB_HISTORY", "100")),
+    listener=lambda job: DRIFT_JOB_DURATION.labels(job["status"]).observe(job["duration_seconds"] or 0.0)
+)
+
+@app.on_event("shutdown")
+async def stop_drift_jobs():
+    drift_jobs.shutdown()
+    # Pool du controle exact : seulement si app.drift_detect a ete charge
+    module = sys.modules.get("app.drift_detect")
+    if module is not None:
+        module.shutdown_pool()
+
+# Rapports de drift : SQLite indexe (feature, date, version du modele)
+drift_store = build_store_from_env()
+
+@app.on_event("startup")
+async def import_drift_reports():
+    """Reprend une fois pour toutes les anciens rapports JSON de drift_reports/"""
     try:
-        results = detect_drift(
-            reference_file="data/bank_churn.csv",
-            production_file="data/production_data.csv",
-            threshold=threshold
-        )
+        imported = drift_store.import_json_reports("drift_reports")
+        if imported:
+            logger.info(f"{imported} rapports de drift JSON importés")
+    except Exception as e:
+        logger.error(f"Import des rapports JSON échoué : {e}")
 
-        drifted = [f for f, r in results.items() if r["drift_detected"]]
-        drift_pct = len(drifted) / len(results) * 100
+def summarize_drift(results: dict, source: str, method: Optional[str] = None, threshold: Optional[float] = None) -> dict:
+    """Resume d'une verification de drift, enregistre et journalise"""
+    if not results:
+        raise ValueError("Aucune observation de production à comparer")
+    drifted = [f for f, r in results.items() if r["drift_detected"]]
+    drift_pct = len(drifted) / len(results) * 100
+    report_id = drift_store.record(results, model_version, source, method, threshold)
 
-        logger.info(
-            "drift_detection",
-            extra={
-                "custom_dimensions": {
-                    "event_type": "drift_detection",
-                    "features_analyzed": len(results),
-                    "features_drifted": len(drifted),
-                    "drift_percentage": drift_pct,
-                    "risk_level": "HIGH" if drift_pct > 50 else "MEDIUM" if drift_pct > 20 else "LOW"
-                }
-            }
-        )
+    telemetry.emit("drift_detection", {
+        "features_analyzed": len(results),
+        "features_drifted": len(drifted),
+        "drift_percentage": drift_pct,
+        "risk_level": "HIGH" if drift_pct > 50 else "MEDIUM" if drift_pct > 20 else "LOW"
+    })
 
-        return {
-            "status": "success",
-            "features_analyzed": len(results),
-            "features_drifted": len(drifted)
-        }
+    return {
+        "status": "success",
+        "report_id": report_id,
+        "source": source,
+        "features_analyzed": len(results),
+        "features_drifted": len(drifted)
+    }
+
+@app.post("/drift/check", tags=["Monitoring"])
+def check_drift(
+    threshold: float = 0.05,
+    method: str = Query("binned", pattern="^(binned|exact)$"),
+    source: Optional[str] = Query(None, pattern="^(capture|file)$"),
+    async_job: bool = False,
+    workers: int = Query(1, ge=1, le=64),
+    sample_size: Optional[int] = Query(None, ge=100),
+    stratify_by: Optional[str] = None,
+    api_key: str = Depends(get_api_key)
+):
+    """Test KS par feature ; `binned` (defaut) est incremental, `exact` relit tout.
+
+    La production est le trafic capture s'il est actif et non vide, sinon
+    data/production_data.csv (`source` force l'un ou l'autre). Avec
+    `async_job=true`, le calcul part sur un pool de processus et la reponse
+    (202) contient l'identifiant a suivre sur /drift/jobs/{job_id}.
+    En mode `exact` sur fichier : `workers` repartit les features sur des
+    processus, `sample_size` (et `stratify_by`) echantillonne la production
+    avec une borne d'erreur sur la statistique.
+    """
+    options = {"workers": workers, "sample_size": sample_size, "stratify_by": stratify_by}
+    reference_file = drift_reference_file()
+    if source == "capture" and traffic_capture is None:
+        raise HTTPException(status_code=409, detail="Capture du trafic désactivée (CAPTURE_DIR)")
+    if source is None:
+        use_capture = traffic_capture is not None and bool(traffic_capture.captured or traffic_capture.segments())
+        source = "capture" if use_capture else "file"
+
+    if async_job:
+        capture_dir = None
+        if source == "capture":
+            # Le job lit les segments sur disque : la file en memoire y est ecrite
+            traffic_capture.flush()
+            capture_dir = traffic_capture.directory
+        try:
+            job, deduplicated = drift_jobs.submit(
+                ("drift_check", reference_file, threshold, method, source, *options.values()),
+                run_drift_job,
+                reference_file, DRIFT_PRODUCTION_FILE, threshold, method, capture_dir,
+                on_done=lambda results: {**summarize_drift(results, source, method, threshold), "features": results},
+                **options
+            )
+        except JobLimitReached as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        return JSONResponse(status_code=202, content={**job, "deduplicated": deduplicated})
 
+    try:
+        results = drift_module().detect_drift(
+            reference_file=reference_file,
+            production_file=DRIFT_PRODUCTION_FILE,
+            threshold=threshold,
+            method=method,
+            capture=traffic_capture if source == "capture" else None,
+            **options
+        )
+        if not results:
+            raise HTTPException(status_code=409, detail="Aucune observation de production à comparer")
+        return summarize_drift(results, source, method, threshold)
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        # Parametres incompatibles avec les donnees (ex. colonne stratify_by inconnue)
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception:
         tb = traceback.format_exc()
         logger.error(tb)
-        raise HTTPException(status_code=500, detail="Erreur drift detection")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Erreur drift detection")
+
+@app.get("/drift/jobs/{job_id}", tags=["Monitoring"])
+def drift_job_status(job_id: str, api_key: str = Depends(get_api_key)):
+    """Etat (queued, running, succeeded, failed) et resultat d'un job de drift"""
+    job = drift_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job inconnu ou expiré")
+    return job
+
+@app.get("/drift/jobs", tags=["Monitoring"])
+def drift_jobs_stats(api_key: str = Depends(get_api_key)):
+    """Jobs actifs, dedupliques et refuses"""
+    return drift_jobs.stats()
+
+def _epoch(value: Optional[datetime]) -> Optional[float]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+@app.get("/drift/history", tags=["Monitoring"])
+def drift_history(
+    feature: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    model_version: Optional[str] = None,
+    resolution: str = Query("raw", pattern="^(raw|daily)$"),
+    limit: int = Query(1000, ge=1, le=100000),
+    api_key: str = Depends(get_api_key)
+):
+    """Historique du drift d'une feature sur une periode (brut ou agrege par jour)"""
+    if resolution == "daily":
+        points = drift_store.daily(feature, _epoch(start), _epoch(end), model_version)
+    else:
+        points = drift_store.history(feature, _epoch(start), _epoch(end), model_version, limit)
+    return {"feature": feature, "resolution": resolution, "points": points}
+
+@app.get("/drift/reports", tags=["Monitoring"])
+def drift_reports(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=10000),
+    api_key: str = Depends(get_api_key)
+):
+    """Derniers rapports de drift (resume)"""
+    return {"reports": drift_store.reports(_epoch(start), _epoch(end), limit), "store": drift_store.stats()}
+
+@app.get("/drift/reports/{report_id}", tags=["Monitoring"])
+def drift_report(report_id: int, api_key: str = Depends(get_api_key)):
+    """Detail d'un rapport : resultat par feature"""
+    report = drift_store.report(report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Rapport inconnu ou expiré")
+    return report
+
+# -------------------------------------------------
+# Drift par fenetres glissantes (trafic capture)
+# -------------------------------------------------
+DRIFT_BUCKET_SECONDS = float(os.getenv("DRIFT_BUCKET_SECONDS", "300"))
+DRIFT_RETENTION_SECONDS = float(os.getenv("DRIFT_RETENTION_SECONDS", str(7 * 86400)))
+drift_windows = None
+_drift_windows_lock = threading.Lock()
+
+def get_drift_windows():
+    """Histogrammes par tranche, alimentes par les segments de capture"""
+    global drift_windows
+    if traffic_capture is None:
+        raise HTTPException(status_code=409, detail="Capture du trafic désactivée (CAPTURE_DIR)")
+    reference_file = drift_reference_file()
+    with _drift_windows_lock:
+        # Nouvelle reference (changement de modele) : histogrammes reconstruits
+        if drift_windows is None or drift_windows.reference_file != reference_file:
+            drift_windows = startup_profile.lazy_import("app.drift_windows").WindowedDrift(
+                reference_file,
+                bucket_seconds=DRIFT_BUCKET_SECONDS,
+                retention_seconds=DRIFT_RETENTION_SECONDS
+            )
+        drift_windows.refresh(traffic_capture)
+    return drift_windows
+
+def _durations(*values) -> list:
+    try:
+        parse_duration = startup_profile.lazy_import("app.drift_windows").parse_duration
+        return [parse_duration(v) for v in values]
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/drift/windows", tags=["Monitoring"])
+def drift_by_window(
+    windows: str = "1h,1d,7d",
+    threshold: float = 0.05,
+    psi_threshold: float = 0.2,
+    api_key: str = Depends(get_api_key)
+):
+    """KS et PSI de chaque feature sur les fenetres demandees (ex. 1h,1d,7d)"""
+    monitor = get_drift_windows()
+    labels = [w.strip() for w in windows.split(",") if w.strip()]
+    now = time.time()
+    return {
+        "windows": {
+            label: monitor.window(seconds, now, threshold, psi_threshold)
+            for label, seconds in zip(labels, _durations(*labels))
+        },
+        **monitor.stats()
+    }
+
+@app.get("/drift/timeline", tags=["Monitoring"])
+def drift_timeline(
+    window: str = "1h",
+    step: str = "5m",
+    points: int = Query(48, ge=1, le=2000),
+    api_key: str = Depends(get_api_key)
+):
+    """Evolution du PSI / KS d'une fenetre glissante, pour les graphiques"""
+    window_seconds, step_seconds = _durations(window, step)
+    monitor = get_drift_windows()
+    return {
+        "window_seconds": window_seconds,
+        "step_seconds": step_seconds,
+        "points": monitor.timeline(window_seconds, step_seconds, points)
+    }
+
+# -------------------------------------------------
+# Métriques : jauges lues a la collecte et endpoint /metrics
+# -------------------------------------------------
+def _cache_requests():
+    stats = prediction_cache.stats()
+    return [(("hit",), stats["hits"]), (("miss",), stats["misses"])]
+
+metrics.callback(
+    GAUGE, "bank_churn_model_info", "Modele servi (valeur 1)",
+    lambda: [((model_version, engine, model_mmap), 1)] if model is not None else [],
+    ("version", "engine", "mmap")
+)
+metrics.callback(GAUGE, "bank_churn_model_loaded", "1 si un modele est servi", lambda: int(model is not None))
+metrics.callback(
+    COUNTER, "bank_churn_prediction_cache_requests_total", "Consultations du cache des predictions",
+    _cache_requests, ("result",)
+)
+metrics.callback(
+    COUNTER, "bank_churn_prediction_cache_evictions_total", "Evictions du cache des predictions",
+    lambda: prediction_cache.evictions
+)
+metrics.callback(GAUGE, "bank_churn_microbatch_queue_depth", "Lignes en attente de micro-batching",
+                 lambda: batcher.stats()["queue_depth"])
+metrics.callback(GAUGE, "bank_churn_drift_jobs_active", "Jobs de drift en file ou en cours",
+                 lambda: drift_jobs.stats()["active"])
+metrics.callback(
+    COUNTER, "bank_churn_capture_dropped_total", "Observations de trafic perdues (file pleine)",
+    lambda: traffic_capture.dropped if traffic_capture is not None else None
+)
+
+metrics.callback(
+    COUNTER, "bank_churn_telemetry_events_total", "Evenements de telemetrie par issue",
+    lambda: [((outcome,), telemetry.stats()[outcome]) for outcome in ("exported", "sampled_out", "dropped")],
+    ("outcome",)
+)
+
+metrics_writer = None
+
+@app.on_event("startup")
+async def start_metrics_writer():
+    global metrics_writer
+    if METRICS_DIR and metrics_writer is None:
+        metrics_writer = SnapshotWriter(metrics, METRICS_DIR, METRICS_FLUSH_INTERVAL)
+        metrics_writer.start()
+
+@app.on_event("shutdown")
+async def stop_metrics_writer():
+    global metrics_writer
+    if metrics_writer is not None:
+        metrics_writer.stop()
+        metrics_writer = None
+
+@app.get("/metrics", tags=["Monitoring"], response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Metriques au format texte Prometheus (sans cle API : cible de scrape)"""
+    others = read_snapshots(METRICS_DIR, exclude_pid=os.getpid()) if METRICS_DIR else []
+    return PlainTextResponse(metrics.render(others), media_type=METRICS_CONTENT_TYPE)
+
+# -------------------------------------------------
+# Profil de demarrage (dernier handler de startup)
+# -------------------------------------------------
+def startup_report() -> dict:
+    return {"preloaded": model_preloaded, **startup_profile.report()}
+
+@app.on_event("startup")
+async def log_startup_profile():
+    startup_profile.ready()
+    report = startup_report()
+    logger.info(
+        f"Démarrage en {report['ready_seconds']}s (imports {report['import_seconds']}s, "
+        f"modèle {report['phases'].get('model_load')}s, préchauffage {report['phases'].get('model_warmup')}s)"
+    )
\ No newline at end of file
@@ -0,0 +1,377 @@
+"""Metriques au format texte Prometheus, a faible cout d'enregistrement.
+
+Compteurs et histogrammes sont repartis en fragments par thread : un
+enregistrement ne touche que le fragment du thread courant (aucun verrou,
+un seul ecrivain par fragment). La lecture (/metrics) additionne les
+fragments.
+
+Sous gunicorn, chaque worker depose periodiquement un instantane dans
+METRICS_DIR ; /metrics additionne alors les compteurs et histogrammes de
+tous les workers, y compris ceux deja recycles (archive ecrite par le
+maitre). Les jauges sont celles du worker qui repond.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from threading import get_ident
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+COUNTER, GAUGE, HISTOGRAM = "counter", "gauge", "histogram"
+
+# Secondes : de 50 us (cache) a 10 s (gros batch / drift synchrone)
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+ARCHIVE_NAME = "metrics-archive.json"
+
+# Starlette ajoute "; charset=utf-8"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+class _CounterChild:
+    __slots__ = ("_shards",)
+
+    def __init__(self):
+        self._shards = {}
+
+    def inc(self, amount: float = 1.0):
+        shards = self._shards
+        ident = get_ident()
+        shard = shards.get(ident)
+        if shard is None:
+            shards[ident] = [amount]
+        else:
+            shard[0] += amount
+
+    def value(self) -> float:
+        return sum(shard[0] for shard in list(self._shards.values()))
+
+
+class _HistogramChild:
+    __slots__ = ("_buckets", "_shards")
+
+    def __init__(self, buckets: Sequence[float]):
+        self._buckets = buckets
+        self._shards = {}
+
+    def observe(self, value: float):
+        shards = self._shards
+        ident = get_ident()
+        shard = shards.get(ident)
+        if shard is None:
+            # [compte par classe..., +Inf, somme]
+            shard = shards[ident] = [0] * (len(self._buckets) + 1) + [0.0]
+        shard[bisect_left(self._buckets, value)] += 1
+        shard[-1] += value
+
+    def value(self) -> list:
+        """Comptes par classe (non cumules, +Inf en dernier) puis somme"""
+        total = [0] * (len(self._buckets) + 1) + [0.0]
+        for shard in list(self._shards.values()):
+            for i, v in enumerate(shard):
+                total[i] += v
+        return total
+
+
+class Metric:
+    """Famille de series (meme nom, valeurs d'etiquettes differentes)"""
+
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(float(b) for b in buckets) if kind == HISTOGRAM else None
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> object:
+        """Serie pour ces valeurs d'etiquettes ; a garder pour le chemin chaud"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} attend les etiquettes {self.labelnames}")
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = _HistogramChild(self.buckets) if self.kind == HISTOGRAM else _CounterChild()
+                    self._children[tuple(str(v) for v in values)] = child
+                    self._children[values] = child
+        return child
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def samples(self) -> list:
+        with self._lock:
+            children = {tuple(str(v) for v in k): c for k, c in self._children.items()}
+        return [[list(labels), child.value()] for labels, child in children.items()]
+
+
+class CallbackMetric:
+    """Valeur(s) lue(s) au moment de la collecte (etat deja tenu ailleurs).
+
+    `fn()` renvoie un nombre, ou une liste de (valeurs d'etiquettes, nombre).
+    """
+
+    def __init__(self, kind: str, name: str, documentation: str, fn: Callable, labelnames: Sequence[str] = ()):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = None
+        self.fn = fn
+
+    def samples(self) -> list:
+        value = self.fn()
+        if value is None:
+            return []
+        if isinstance(value, (int, float)):
+            return [[[], float(value)]]
+        return [[[str(v) for v in labels], float(v)] for labels, v in value]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metrique deja enregistree : {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Metric:
+        return self._register(Metric(COUNTER, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Metric:
+        return self._register(Metric(HISTOGRAM, name, documentation, labelnames, buckets))
+
+    def callback(self, kind: str, name: str, documentation: str, fn: Callable,
+                 labelnames: Sequence[str] = ()) -> CallbackMetric:
+        return self._register(CallbackMetric(kind, name, documentation, fn, labelnames))
+
+    def snapshot(self) -> dict:
+        """Etat serialisable en JSON (echange entre workers)"""
+        snapshot = {}
+        for name, metric in self._metrics.items():
+            try:
+                samples = metric.samples()
+            except Exception:
+                # Une jauge en echec ne doit pas casser la collecte
+                continue
+            snapshot[name] = {
+                "type": metric.kind,
+                "help": metric.documentation,
+                "labelnames": list(metric.labelnames),
+                "buckets": list(metric.buckets) if metric.buckets else None,
+                "samples": samples
+            }
+        return snapshot
+
+    def render(self, others: Iterable[dict] = ()) -> str:
+        """Texte Prometheus ; `others` : instantanes d'autres workers"""
+        return render(merge_snapshots([self.snapshot(), *others]))
+
+
+def merge_snapshots(snapshots: List[dict]) -> dict:
+    """Additionne compteurs et histogrammes ; jauges du premier instantane"""
+    merged = {}
+    for index, snapshot in enumerate(snapshots):
+        for name, family in snapshot.items():
+            if family["type"] == GAUGE and index > 0:
+                continue
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = {**family, "samples": {}}
+            elif target.get("buckets") != family.get("buckets"):
+                continue
+            for labels, value in family["samples"]:
+                key = tuple(labels)
+                if key not in target["samples"]:
+                    target["samples"][key] = value if not isinstance(value, list) else list(value)
+                elif isinstance(value, list):
+                    target["samples"][key] = [a + b for a, b in zip(target["samples"][key], value)]
+                else:
+                    target["samples"][key] += value
+    for family in merged.values():
+        family["samples"] = [[list(k), v] for k, v in family["samples"].items()]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render(snapshot: dict) -> str:
+    lines = []
+    for name, family in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        names = family["labelnames"]
+        for labels, value in sorted(family["samples"], key=lambda s: s[0]):
+            if family["type"] != HISTOGRAM:
+                lines.append(f"{name}{_labels(names, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(family["buckets"] + [float("inf")], value[:-1]):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{name}_bucket{_labels(names, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(names, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------------------------------
+# Agregation entre workers (fichiers d'instantanes)
+# -------------------------------------------------
+def snapshot_file(directory: str, pid: Optional[int] = None) -> str:
+    return os.path.join(directory, f"metrics-{pid or os.getpid()}.json")
+
+
+def write_snapshot(registry: MetricsRegistry, directory: str, pid: Optional[int] = None):
+    """Ecriture atomique de l'instantane de ce processus"""
+    os.makedirs(directory, exist_ok=True)
+    path = snapshot_file(directory, pid)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp, path)
+
+
+def _read(path: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_snapshots(directory: str, exclude_pid: Optional[int] = None) -> List[dict]:
+    """Instantanes des autres workers et archive des workers termines"""
+    if not directory or not os.path.isdir(directory):
+        return []
+    skip = os.path.basename(snapshot_file(directory, exclude_pid)) if exclude_pid else None
+    snapshots = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".json") and name != skip:
+            snapshot = _read(os.path.join(directory, name))
+            if snapshot:
+                snapshots.append(snapshot)
+    return snapshots
+
+
+def archive_worker(directory: str, pid: int):
+    """Integre l'instantane d'un worker termine a l'archive (dans le maitre).
+
+    Les compteurs restent monotones malgre le recyclage des workers et le
+    nombre de fichiers reste borne. Les jauges du worker sont abandonnees.
+    """
+    path = snapshot_file(directory, pid)
+    snapshot = _read(path)
+    if snapshot is None:
+        return
+    counters = {name: family for name, family in snapshot.items() if family["type"] != GAUGE}
+    archive_path = os.path.join(directory, ARCHIVE_NAME)
+    archive = merge_snapshots([_read(archive_path) or {}, counters])
+    tmp = f"{archive_path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(archive, f)
+    os.replace(tmp, archive_path)
+    os.remove(path)
+
+
+def reset_directory(directory: str):
+    """Repart de zero au demarrage du maitre"""
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.startswith("metrics-"):
+                os.remove(os.path.join(directory, name))
+
+
+class SnapshotWriter(threading.Thread):
+    """Ecrit l'instantane du worker toutes les `interval` secondes"""
+
+    def __init__(self, registry: MetricsRegistry, directory: str, interval: float = 5.0):
+        super().__init__(name="metrics-writer", daemon=True)
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        self.flush()
+
+    def flush(self):
+        try:
+            write_snapshot(self.registry, self.directory)
+        except OSError:
+            pass
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.flush()
+
+
+# -------------------------------------------------
+# Middleware ASGI
+# -------------------------------------------------
+class MetricsMiddleware:
+    """Duree et nombre de requetes par (methode, route, statut).
+
+    Middleware ASGI pur (pas de BaseHTTPMiddleware : ni tache ni file
+    supplementaire par requete). La route est le gabarit FastAPI
+    (/drift/jobs/{job_id}), pas le chemin, pour borner la cardinalite.
+    L'instant d'arrivee est expose dans request.state.received_at.
+    """
+
+    def __init__(self, app, histogram: Metric):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        scope.setdefault("state", {})["received_at"] = started
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            self.histogram.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status[0]
+            ).observe(time.perf_counter() - started)
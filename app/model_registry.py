@@ -0,0 +1,188 @@
+"""Chargement des modeles (fichier ou registre MLflow) et surveillance.
+
+Le chargement et le prechauffage se font hors du chemin de requete (thread
+de surveillance ou endpoint d'administration) ; seul l'echange final du
+modele est fait sous verrou dans app.main.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Callable, Optional
+
+import joblib
+
+logger = logging.getLogger("bank-churn-api")
+
+SOURCES = ("file", "registry")
+
+REGISTRY_NAME = os.getenv("MODEL_REGISTRY_NAME", "bank-churn-classifier")
+TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", "./mlruns")
+SKETCH_NAME = "reference_sketch.json"
+
+
+def artifact_version(path: str) -> str:
+    """Version d'un artefact : empreinte courte de son contenu"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def file_signature(path: str) -> Optional[tuple]:
+    """Signature peu couteuse (mtime, taille) pour detecter un nouveau fichier"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def mmap_path_for(path: str) -> str:
+    """Repertoire de l'artefact memory-mappable associe a un pickle"""
+    return os.path.splitext(path)[0] + "_mmap"
+
+
+def load_mmap(path: str, mmap_path: str):
+    """Ouvre la foret compilee en memoire partagee ; renvoie (foret, version).
+
+    L'artefact doit avoir ete ecrit a partir du pickle `path` actuel (meme
+    empreinte), sinon LookupError : un artefact perime n'est jamais servi.
+    """
+    from app.forest_engine import load_compiled, read_metadata
+
+    version = artifact_version(path)
+    if read_metadata(mmap_path).get("source_version") != version:
+        raise LookupError(f"Artefact {mmap_path} perime par rapport a {path}")
+    compiled, _ = load_compiled(mmap_path, mmap=True)
+    return compiled, version
+
+
+def sketch_path_for(path: str) -> str:
+    """Esquisse de reference ecrite par train_model.py a cote du pickle"""
+    return os.path.join(os.path.dirname(path), SKETCH_NAME)
+
+
+def reference_sketch(source: str, version: str, sketch_path: str, tracking_uri: str = TRACKING_URI) -> Optional[str]:
+    """Chemin de l'esquisse de reference du modele `version`, ou None.
+
+    Source fichier : l'esquisse locale n'est retenue que si elle a ete
+    ecrite pour ce pickle (meme empreinte). Source registre : elle est
+    telechargee depuis le run MLflow de la version. Jamais d'exception :
+    sans esquisse, l'appelant retombe sur le CSV de reference.
+    """
+    try:
+        if source == "registry":
+            import mlflow.artifacts
+
+            name, number = version.rsplit("/", 1)
+            run_id = _mlflow_client(tracking_uri).get_model_version(name, number).run_id
+            destination = os.path.join(os.path.dirname(sketch_path) or ".", "registry", name, number)
+            os.makedirs(destination, exist_ok=True)
+            return mlflow.artifacts.download_artifacts(
+                run_id=run_id,
+                artifact_path=f"reference_sketch/{SKETCH_NAME}",
+                dst_path=destination,
+                tracking_uri=tracking_uri
+            )
+        with open(sketch_path) as f:
+            sketch_version = json.load(f).get("model_version")
+        if sketch_version != version:
+            logger.warning(f"Esquisse {sketch_path} écrite pour {sketch_version}, modèle servi {version}")
+            return None
+        return sketch_path
+    except Exception as e:
+        logger.warning(f"Esquisse de référence indisponible ({source}, {version}) : {e}")
+        return None
+
+
+def _mlflow_client(tracking_uri: str = TRACKING_URI):
+    # Import paresseux : MLflow n'est necessaire que pour le registre
+    from mlflow.tracking import MlflowClient
+    return MlflowClient(tracking_uri=tracking_uri)
+
+
+def latest_registry_version(name: str = REGISTRY_NAME, tracking_uri: str = TRACKING_URI) -> Optional[str]:
+    """Numero de la derniere version enregistree de `name`"""
+    versions = _mlflow_client(tracking_uri).search_model_versions(f"name='{name}'")
+    if not versions:
+        return None
+    return str(max(int(v.version) for v in versions))
+
+
+def load_from_file(path: str):
+    """Charge un pickle joblib ; renvoie (modele, version)"""
+    return joblib.load(path), artifact_version(path)
+
+
+def load_from_registry(
+    name: str = REGISTRY_NAME,
+    version: str = "latest",
+    tracking_uri: str = TRACKING_URI
+):
+    """Charge une version du registre MLflow ; renvoie (modele, version)"""
+    import mlflow
+    import mlflow.sklearn
+
+    if version == "latest":
+        version = latest_registry_version(name, tracking_uri)
+        if version is None:
+            raise LookupError(f"Aucune version enregistrée pour {name}")
+    mlflow.set_tracking_uri(tracking_uri)
+    return mlflow.sklearn.load_model(f"models:/{name}/{version}"), f"{name}/{version}"
+
+
+def load(source: str, path: str, version: str = "latest"):
+    """Charge depuis `source` ('file' ou 'registry')"""
+    if source == "file":
+        return load_from_file(path)
+    if source == "registry":
+        return load_from_registry(version=version)
+    raise ValueError(f"Source de modele inconnue : {source} (attendu : {', '.join(SOURCES)})")
+
+
+class ModelWatcher(threading.Thread):
+    """Thread de fond qui recharge le modele quand sa source change.
+
+    `signature()` doit etre peu couteuse (stat du fichier, numero de la
+    derniere version du registre). En cas d'echec du rechargement, le modele
+    en place est conserve et la tentative est refaite au tour suivant.
+    """
+
+    def __init__(self, signature: Callable[[], object], on_change: Callable[[], None], interval: float):
+        super().__init__(name="model-watcher", daemon=True)
+        self.signature = signature
+        self.on_change = on_change
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._last = None
+
+    def prime(self, current):
+        """Signature du modele deja charge (evite un rechargement immediat)"""
+        self._last = current
+
+    def stop(self):
+        self._stop_event.set()
+
+    def check(self) -> bool:
+        """Un tour de surveillance ; renvoie True si le modele a ete recharge"""
+        try:
+            current = self.signature()
+        except Exception as e:
+            logger.error(f"Surveillance du modèle : {e}")
+            return False
+        if current is None or current == self._last:
+            return False
+        try:
+            self.on_change()
+        except Exception as e:
+            logger.error(f"Rechargement du modèle échoué, modèle actuel conservé : {e}")
+            return False
+        self._last = current
+        return True
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.check()
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Any, Dict, List, Optional
 
 class CustomerFeatures(BaseModel):
     """Schema pour les features d'un client"""
@@ -36,7 +36,31 @@ class PredictionResponse(BaseModel):
     prediction: int = Field(..., description="Prediction binaire (0=reste, 1=part)")
     risk_level: str = Field(..., description="Niveau de risque (Low/Medium/High)")
 
+class BatchRowError(BaseModel):
+    """Erreur de validation d'une ligne du batch"""
+    index: int = Field(..., description="Position de la ligne dans la requete")
+    errors: List[Dict[str, Any]] = Field(..., description="Erreurs Pydantic de la ligne")
+
+class BatchPredictionResponse(BaseModel):
+    """Schema pour la reponse de prediction batch"""
+    predictions: List[Optional[PredictionResponse]] = Field(
+        ..., description="Une prediction par ligne (null si la ligne est invalide)"
+    )
+    errors: List[BatchRowError] = Field(default_factory=list, description="Lignes rejetees")
+    n_rows: int = Field(..., description="Nombre de lignes recues")
+    n_scored: int = Field(..., description="Nombre de lignes predites")
+
 class HealthResponse(BaseModel):
     """Schema pour le health check"""
+    model_config = ConfigDict(protected_namespaces=())
+
     status: str
-    model_loaded: bool
\ No newline at end of file
+    model_loaded: bool
+    model_version: Optional[str] = Field(None, description="Version du modele servi")
+    model_loaded_at: Optional[str] = Field(None, description="Date de chargement (UTC, ISO 8601)")
+    model_load_seconds: Optional[float] = Field(None, description="Duree de chargement + prechauffage")
+    engine: Optional[str] = Field(None, description="Moteur d'inference actif (sklearn/compiled)")
+    model_mmap: Optional[bool] = Field(None, description="Arbres ouverts en memoire partagee (artefact .npy)")
+    worker_pid: Optional[int] = Field(None, description="PID du worker ayant repondu")
+    drift_reference: Optional[str] = Field(None, description="Esquisse de reference du drift (None : CSV d'entrainement)")
+    startup: Optional[Dict[str, Any]] = Field(None, description="Profil de demarrage : imports, chargement, prechauffage")
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""Esquisses compactes de la distribution de reference.
+
+Ecrites par train_model.py a cote du modele (model/reference_sketch.json)
+et journalisees avec lui dans MLflow : la detection de drift n'a plus
+besoin du CSV d'entrainement et compare toujours la production a la
+reference du modele servi.
+
+Par feature : effectifs exacts des valeurs distinctes (features
+discretes) ou histogramme sur des bornes aux quantiles (continues), plus
+quelques statistiques descriptives. La taille ne depend pas du nombre de
+lignes d'entrainement.
+"""
+import json
+import os
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+SKETCH_FORMAT = 1
+SKETCH_BINS = 512
+SKETCH_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+TARGET = "Exited"
+
+
+def sketch_feature(values: np.ndarray, max_bins: int = SKETCH_BINS) -> dict:
+    """Esquisse d'une colonne : bornes, effectifs cumulables et statistiques"""
+    values = np.sort(np.asarray(values, dtype=np.float64))
+    values = values[~np.isnan(values)]
+    distinct = np.unique(values)
+    if len(distinct) <= max_bins:
+        kind, edges = "discrete", distinct
+    else:
+        kind, edges = "continuous", np.unique(np.quantile(values, np.linspace(0, 1, max_bins + 1)))
+    # counts[k] = nombre de valeurs dans (edges[k-1], edges[k]]
+    cumulative = np.searchsorted(values, edges, side="right")
+    counts = np.diff(np.concatenate([[0], cumulative]))
+    return {
+        "kind": kind,
+        "n": int(len(values)),
+        "edges": edges.tolist(),
+        "counts": counts.tolist(),
+        "min": float(values[0]) if len(values) else None,
+        "max": float(values[-1]) if len(values) else None,
+        "mean": float(values.mean()) if len(values) else None,
+        "std": float(values.std()) if len(values) else None,
+        "quantiles": {
+            f"p{int(q * 100):02d}": float(np.quantile(values, q)) for q in SKETCH_QUANTILES
+        } if len(values) else {}
+    }
+
+
+def build_sketch(frame, model_version: Optional[str] = None, max_bins: int = SKETCH_BINS) -> dict:
+    """Esquisse de toutes les features d'un DataFrame (la cible est ignoree)"""
+    return {
+        "format": SKETCH_FORMAT,
+        "model_version": model_version,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "rows": int(len(frame)),
+        "features": {
+            col: sketch_feature(frame[col].to_numpy(), max_bins)
+            for col in frame.columns if col != TARGET
+        }
+    }
+
+
+def save_sketch(sketch: dict, path: str) -> str:
+    """Ecriture atomique (fichier temporaire renomme)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(sketch, f)
+    os.replace(tmp, path)
+    return path
+
+
+def load_sketch(path: str) -> dict:
+    with open(path) as f:
+        sketch = json.load(f)
+    if sketch.get("format") != SKETCH_FORMAT:
+        raise ValueError(f"Format d'esquisse non supporte : {sketch.get('format')}")
+    return sketch
+
+
+def is_sketch(path: str) -> bool:
+    return str(path).endswith(".json")
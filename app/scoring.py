@@ -0,0 +1,100 @@
+from operator import attrgetter
+from typing import Iterable, List, Sequence
+
+import numpy as np
+
+from app.models import CustomerFeatures
+
+# Ordre des colonnes attendu par le modele (identique a train_model.py)
+FEATURE_NAMES = list(CustomerFeatures.model_fields)
+
+_get_features = attrgetter(*FEATURE_NAMES)
+
+
+def features_to_row(features: CustomerFeatures) -> tuple:
+    """Convertit un CustomerFeatures valide en tuple ordonne"""
+    return _get_features(features)
+
+
+def rows_to_matrix(rows: Sequence[Sequence[float]]) -> np.ndarray:
+    """Construit une matrice (n, 10) contigue a partir des lignes"""
+    X = np.array(rows, dtype=np.float64)
+    return X.reshape(-1, len(FEATURE_NAMES))
+
+
+def score_matrix(model, X: np.ndarray) -> np.ndarray:
+    """Probabilites de churn pour toute la matrice en un seul appel"""
+    if len(X) == 0:
+        return np.empty(0, dtype=np.float64)
+    return np.asarray(model.predict_proba(X))[:, 1]
+
+
+def risk_level(proba: float) -> str:
+    """Niveau de risque a partir de la probabilite"""
+    return "Low" if proba < 0.3 else "Medium" if proba < 0.7 else "High"
+
+
+def format_prediction(proba: float) -> dict:
+    """Reponse au format PredictionResponse"""
+    proba = float(proba)
+    return {
+        "churn_probability": round(proba, 4),
+        "prediction": int(proba > 0.5),
+        "risk_level": risk_level(proba)
+    }
+
+
+def format_predictions(probas: Iterable[float]) -> List[dict]:
+    """Version vectorisee : une reponse par ligne"""
+    return [format_prediction(p) for p in np.asarray(probas, dtype=np.float64).tolist()]
+
+
+def _feature_bounds():
+    """Bornes (ge/le) et type entier de chaque feature, lus sur le schema"""
+    lower, upper, integer = [], [], []
+    for field in CustomerFeatures.model_fields.values():
+        lo = next((m.ge for m in field.metadata if hasattr(m, "ge")), -np.inf)
+        hi = next((m.le for m in field.metadata if hasattr(m, "le")), np.inf)
+        lower.append(lo)
+        upper.append(hi)
+        integer.append(field.annotation is int)
+    return np.array(lower, dtype=np.float64), np.array(upper, dtype=np.float64), np.array(integer)
+
+
+_LOWER, _UPPER, _INTEGER = _feature_bounds()
+
+
+def check_matrix(X: np.ndarray):
+    """Controles par cellule, memes regles que CustomerFeatures (vectorise).
+
+    Renvoie trois masques (n, 10) : valeur presente et numerique, dans les
+    bornes, entiere pour les champs int.
+    """
+    with np.errstate(invalid="ignore"):
+        finite = np.isfinite(X)
+        in_range = (X >= _LOWER) & (X <= _UPPER)
+        whole = ~_INTEGER | (np.floor(X) == X)
+    return finite, in_range, whole
+
+
+def validate_matrix(X: np.ndarray) -> np.ndarray:
+    """Masque des lignes valides"""
+    finite, in_range, whole = check_matrix(X)
+    return np.all(finite & in_range & whole, axis=1)
+
+
+def row_errors(finite: np.ndarray, in_range: np.ndarray, whole: np.ndarray) -> List[dict]:
+    """Erreurs d'une ligne invalide, au format des erreurs Pydantic"""
+    errors = []
+    for j, name in enumerate(FEATURE_NAMES):
+        if not finite[j]:
+            errors.append({"type": "missing", "loc": [name], "msg": "Valeur manquante ou non numerique"})
+        elif not in_range[j]:
+            errors.append({
+                "type": "out_of_range",
+                "loc": [name],
+                "msg": f"Valeur hors bornes [{_LOWER[j]:g}, {_UPPER[j]:g}]"
+            })
+        elif not whole[j]:
+            errors.append({"type": "int_type", "loc": [name], "msg": "Valeur entiere attendue"})
+    return errors
@@ -0,0 +1,74 @@
+"""Profil de demarrage : imports, chargement et prechauffage du modele.
+
+Les dependances du chemin /predict sont importees (et chronometrees)
+au chargement de app.main ; celles du drift (pandas, scipy) ne le sont
+qu'au premier usage via `lazy_import`, ce qui est aussi enregistre. Le
+rapport est journalise une fois le worker pret et renvoye par /health.
+"""
+import importlib
+import sys
+import time
+from contextlib import contextmanager
+from types import ModuleType
+from typing import Dict, Iterable, Optional
+
+
+class StartupProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imports: Dict[str, float] = {}
+        self.lazy_imports: Dict[str, float] = {}
+        self.phases: Dict[str, float] = {}
+        self.ready_seconds: Optional[float] = None
+
+    @property
+    def completed(self) -> bool:
+        return self.ready_seconds is not None
+
+    def import_modules(self, modules: Iterable[str]):
+        """Importe dans l'ordre ; chaque duree exclut les modules deja charges"""
+        for name in modules:
+            if name in sys.modules:
+                continue
+            started = time.perf_counter()
+            importlib.import_module(name)
+            self.imports[name] = round(time.perf_counter() - started, 4)
+
+    def lazy_import(self, name: str) -> ModuleType:
+        """Module importe au premier usage (cout enregistre une seule fois)"""
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        self.lazy_imports.setdefault(name, round(time.perf_counter() - started, 4))
+        return module
+
+    def record(self, phase: str, seconds: float):
+        """Duree d'une etape du demarrage (ignoree une fois le demarrage termine)"""
+        if not self.completed:
+            self.phases[phase] = round(seconds, 4)
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def ready(self):
+        if not self.completed:
+            self.ready_seconds = round(time.perf_counter() - self.started, 4)
+
+    def report(self) -> dict:
+        return {
+            "imports": dict(self.imports),
+            "import_seconds": round(sum(self.imports.values()), 4),
+            "phases": dict(self.phases),
+            "ready_seconds": self.ready_seconds,
+            "lazy_imports": dict(self.lazy_imports)
+        }
+
+
+startup_profile = StartupProfile()
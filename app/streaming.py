@@ -0,0 +1,285 @@
+"""Scoring en flux (CSV / NDJSON) a memoire bornee.
+
+Utilise par l'endpoint POST /predict/stream et en ligne de commande :
+
+    python -m app.streaming data/bank_churn.csv -o predictions.ndjson
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from app.scoring import (
+    FEATURE_NAMES,
+    score_matrix,
+    format_predictions,
+    check_matrix,
+    row_errors
+)
+
+DEFAULT_CHUNK_ROWS = 5000
+READ_BLOCK_SIZE = 1 << 20
+MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", str(64 * 1024)))
+
+FORMATS = ("csv", "ndjson")
+
+_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json": "ndjson",
+}
+
+# Marqueur d'une ligne tronquee car plus longue que MAX_LINE_BYTES
+_OVERSIZED = None
+
+
+def detect_format(content_type: Optional[str], filename: Optional[str] = None) -> Optional[str]:
+    """Deduit le format (csv / ndjson) du Content-Type ou de l'extension.
+
+    Renvoie None si le Content-Type n'est pas supporte (ex. multipart).
+    """
+    if filename:
+        ext = filename.lower().rsplit(".", 1)[-1]
+        return "csv" if ext == "csv" else "ndjson"
+    if not content_type:
+        return "ndjson"
+    mime = content_type.split(";", 1)[0].strip().lower()
+    return _CONTENT_TYPES.get(mime)
+
+
+class StreamScorer:
+    """Parse, score et serialise un flux par blocs de `chunk_rows` lignes.
+
+    Seuls le reliquat de ligne incomplete (borne par `max_line_bytes`) et
+    le bloc en cours sont gardes en memoire : la consommation reste
+    constante quelle que soit la taille du fichier.
+    """
+
+    def __init__(
+        self,
+        model,
+        fmt: str = "csv",
+        chunk_rows: int = DEFAULT_CHUNK_ROWS,
+        max_line_bytes: int = MAX_LINE_BYTES
+    ):
+        if fmt not in FORMATS:
+            raise ValueError(f"Format inconnu : {fmt} (attendu : {', '.join(FORMATS)})")
+        self.model = model
+        self.fmt = fmt
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.max_line_bytes = max_line_bytes
+        self.rows_seen = 0
+        self.rows_scored = 0
+        self.rows_failed = 0
+        self._pending = b""
+        self._skipping = False
+        self._columns: Optional[List[int]] = None
+        self._lines: List[Optional[str]] = []
+        self._started = time.perf_counter()
+
+    # ---------------------------------------------
+    # Parsing
+    # ---------------------------------------------
+    def _parse_header(self, line: Optional[str]):
+        if line is _OVERSIZED:
+            raise ValueError("En-tete CSV trop long")
+        header = [h.strip() for h in next(csv.reader([line]))]
+        missing = [name for name in FEATURE_NAMES if name not in header]
+        if missing:
+            raise ValueError(f"Colonnes manquantes dans l'en-tete CSV : {missing}")
+        self._columns = [header.index(name) for name in FEATURE_NAMES]
+
+    @staticmethod
+    def _to_float(value) -> float:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return np.nan
+
+    def _parse_csv(self, lines: List[str]) -> np.ndarray:
+        X = np.full((len(lines), len(FEATURE_NAMES)), np.nan)
+        for i, record in enumerate(csv.reader(lines)):
+            if not record:
+                continue
+            try:
+                X[i] = [record[c] for c in self._columns]
+            except (IndexError, ValueError):
+                # Cas lent : cellule par cellule, les manquantes restent NaN
+                X[i] = [
+                    self._to_float(record[c]) if c < len(record) else np.nan
+                    for c in self._columns
+                ]
+        return X
+
+    def _parse_ndjson(self, lines: List[str]) -> np.ndarray:
+        X = np.full((len(lines), len(FEATURE_NAMES)), np.nan)
+        for i, line in enumerate(lines):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                X[i] = [self._to_float(record.get(name)) for name in FEATURE_NAMES]
+        return X
+
+    # ---------------------------------------------
+    # Scoring
+    # ---------------------------------------------
+    def _score_lines(self) -> bytes:
+        lines, self._lines = self._lines, []
+        if not lines:
+            return b""
+
+        oversized = [line is _OVERSIZED for line in lines]
+        text = ["" if line is _OVERSIZED else line for line in lines]
+        X = self._parse_csv(text) if self.fmt == "csv" else self._parse_ndjson(text)
+
+        finite, in_range, whole = check_matrix(X)
+        cells_ok = finite & in_range & whole
+        valid = np.all(cells_ok, axis=1) & ~np.array(oversized)
+        results = iter(format_predictions(score_matrix(self.model, X[valid])))
+
+        out = []
+        for i, ok in enumerate(valid.tolist()):
+            if ok:
+                record = {"index": self.rows_seen, **next(results)}
+                self.rows_scored += 1
+            else:
+                if oversized[i]:
+                    errors = [{
+                        "type": "line_too_long",
+                        "loc": [],
+                        "msg": f"Ligne plus longue que {self.max_line_bytes} octets"
+                    }]
+                else:
+                    errors = row_errors(finite[i], in_range[i], whole[i])
+                record = {"index": self.rows_seen, "errors": errors}
+                self.rows_failed += 1
+            self.rows_seen += 1
+            out.append(json.dumps(record))
+        return ("\n".join(out) + "\n").encode()
+
+    def _add_line(self, line: Optional[str]) -> bytes:
+        if self.fmt == "csv" and self._columns is None:
+            self._parse_header(line)
+            return b""
+        self._lines.append(line)
+        if len(self._lines) >= self.chunk_rows:
+            return self._score_lines()
+        return b""
+
+    def feed(self, data: bytes) -> bytes:
+        """Ajoute un morceau du flux et renvoie le NDJSON des blocs complets"""
+        data = self._pending + data
+        *complete, self._pending = data.split(b"\n")
+
+        out = []
+        for raw in complete:
+            if self._skipping:
+                # Fin d'une ligne trop longue : elle est rejetee en bloc
+                self._skipping = False
+                out.append(self._add_line(_OVERSIZED))
+                continue
+            line = raw.decode("utf-8-sig").strip()
+            if line:
+                out.append(self._add_line(line))
+
+        if len(self._pending) > self.max_line_bytes:
+            self._pending = b""
+            self._skipping = True
+        return b"".join(out)
+
+    def finish(self) -> bytes:
+        """Score le reliquat (sans la ligne de resume)"""
+        out = []
+        if self._skipping:
+            self._skipping = False
+            out.append(self._add_line(_OVERSIZED))
+        elif self._pending.strip():
+            out.append(self._add_line(self._pending.decode("utf-8-sig").strip()))
+        self._pending = b""
+        out.append(self._score_lines())
+        return b"".join(out)
+
+    def summary(self, error: Optional[str] = None) -> dict:
+        elapsed = time.perf_counter() - self._started
+        summary = {
+            "rows": self.rows_seen,
+            "scored": self.rows_scored,
+            "errors": self.rows_failed,
+            "elapsed_seconds": round(elapsed, 4),
+            "rows_per_sec": round(self.rows_seen / elapsed, 1) if elapsed > 0 else 0.0
+        }
+        if error is not None:
+            summary["error"] = error
+        return summary
+
+    def trailer(self, error: Optional[str] = None) -> bytes:
+        """Ligne de resume NDJSON, toujours emise en fin de flux"""
+        return (json.dumps({"summary": self.summary(error)}) + "\n").encode()
+
+
+def score_stream(
+    blocks: Iterable[bytes],
+    model,
+    fmt: str = "csv",
+    chunk_rows: int = DEFAULT_CHUNK_ROWS
+) -> Iterator[bytes]:
+    """Version synchrone : genere le NDJSON au fil des blocs lus"""
+    scorer = StreamScorer(model, fmt=fmt, chunk_rows=chunk_rows)
+    error = None
+    try:
+        for block in blocks:
+            out = scorer.feed(block)
+            if out:
+                yield out
+        yield scorer.finish()
+    except Exception as e:
+        error = str(e)
+    yield scorer.trailer(error)
+
+
+def _read_blocks(f, size: int = READ_BLOCK_SIZE) -> Iterator[bytes]:
+    while True:
+        block = f.read(size)
+        if not block:
+            return
+        yield block
+
+
+def main(argv=None):
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Scoring churn en flux (CSV / NDJSON -> NDJSON)")
+    parser.add_argument("input", help="Fichier CSV ou NDJSON ('-' pour stdin)")
+    parser.add_argument("-o", "--output", help="Fichier NDJSON de sortie (stdout par defaut)")
+    parser.add_argument("--format", choices=FORMATS, help="Format d'entree (deduit de l'extension)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--model", default="model/churn_model.pkl")
+    args = parser.parse_args(argv)
+
+    model = joblib.load(args.model)
+    fmt = args.format or detect_format(None, None if args.input == "-" else args.input)
+
+    src = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    dst = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for out in score_stream(_read_blocks(src), model, fmt=fmt, chunk_rows=args.chunk_rows):
+            dst.write(out)
+    finally:
+        if src is not sys.stdin.buffer:
+            src.close()
+        if dst is not sys.stdout.buffer:
+            dst.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Export de la telemetrie hors du chemin de requete.
+
+`emit()` applique l'echantillonnage puis ajoute l'evenement a une deque
+bornee (jamais bloquant : evenement perdu et compte si la file est
+pleine). Un thread d'export vide la file par lots vers l'exportateur :
+journal applicatif (et donc AzureLogHandler si Application Insights est
+configure), fichier JSON Lines, ou un exportateur de test.
+
+Chaque evenement porte son taux d'echantillonnage (`sample_rate`) pour
+que les agregations puissent reponderer les comptes.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+EXPORTERS = ("logging", "logging_events", "jsonl", "none")
+
+
+class LoggingExporter:
+    """Un enregistrement `telemetry_batch` par lot, emis depuis le thread
+    d'export : `custom_dimensions` porte le nombre d'evenements par type et
+    les evenements en tableau JSON.
+
+    `per_event=True` (TELEMETRY_EXPORTER=logging_events) emet a la place un
+    enregistrement par evenement, comme les anciens logs dans App Insights.
+    """
+
+    def __init__(self, logger: logging.Logger, per_event: bool = False):
+        self.logger = logger
+        self.per_event = per_event
+
+    def export(self, events: List[dict]):
+        if self.per_event:
+            for event in events:
+                self.logger.info(event["event_type"], extra={"custom_dimensions": event})
+            return
+        counts: Dict[str, int] = {}
+        for event in events:
+            counts[event["event_type"]] = counts.get(event["event_type"], 0) + 1
+        self.logger.info("telemetry_batch", extra={"custom_dimensions": {
+            "event_count": len(events),
+            "event_types": json.dumps(counts),
+            "events": json.dumps(events, default=str)
+        }})
+
+
+class JsonLinesExporter:
+    """Ajoute chaque lot a un fichier JSON Lines en une seule ecriture"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, events: List[dict]):
+        payload = "".join(json.dumps(event, default=str) + "\n" for event in events)
+        with open(self.path, "a") as f:
+            f.write(payload)
+
+
+class MemoryExporter:
+    """Exportateur local de substitution (tests, diagnostic)"""
+
+    def __init__(self):
+        self.batches: List[List[dict]] = []
+
+    @property
+    def events(self) -> List[dict]:
+        return [event for batch in self.batches for event in batch]
+
+    def export(self, events: List[dict]):
+        self.batches.append(list(events))
+
+
+class NullExporter:
+    def export(self, events: List[dict]):
+        pass
+
+
+class TelemetryPipeline:
+    """File bornee + thread d'export par lots.
+
+    `sample_rates` fixe le taux par type d'evenement ; les types absents
+    utilisent `default_sample_rate`.
+    """
+
+    def __init__(
+        self,
+        exporter,
+        sample_rates: Optional[Dict[str, float]] = None,
+        default_sample_rate: float = 1.0,
+        max_queue: int = 10000,
+        batch_size: int = 512,
+        flush_interval: float = 1.0
+    ):
+        self.exporter = exporter
+        self.sample_rates = {k: min(1.0, max(0.0, float(v))) for k, v in (sample_rates or {}).items()}
+        self.default_sample_rate = min(1.0, max(0.0, float(default_sample_rate)))
+        self.max_queue = max(1, int(max_queue))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._export_lock = threading.Lock()
+        self._random = random.random
+
+        # Statistiques
+        self.emitted = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.exported = 0
+        self.batches = 0
+        self.export_errors = 0
+
+    def emit(self, event_type: str, dimensions: dict) -> bool:
+        """Met en file un evenement ; renvoie False s'il est ecarte ou perdu"""
+        rate = self.sample_rates.get(event_type, self.default_sample_rate)
+        if rate < 1.0 and self._random() >= rate:
+            self.sampled_out += 1
+            return False
+        queue = self._queue
+        if len(queue) >= self.max_queue:
+            self.dropped += 1
+            return False
+        queue.append({
+            "event_type": event_type,
+            "timestamp": time.time(),
+            "sample_rate": rate,
+            **dimensions
+        })
+        self.emitted += 1
+        if len(queue) == self.batch_size:
+            self._wakeup.set()
+        return True
+
+    # Thread d'export ---------------------------------------------------
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Demarre le thread d'export (dans chaque worker, apres le fork)"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry-export", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrete le thread apres avoir exporte ce qui est en file"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._wakeup.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Exporte la file par lots de `batch_size` ; renvoie le nombre exporte"""
+        exported = 0
+        with self._export_lock:
+            queue = self._queue
+            while queue:
+                batch = []
+                try:
+                    while len(batch) < self.batch_size:
+                        batch.append(queue.popleft())
+                except IndexError:
+                    pass
+                try:
+                    self.exporter.export(batch)
+                except Exception:
+                    # Lot perdu : l'export ne doit jamais remonter jusqu'aux requetes
+                    self.export_errors += 1
+                    continue
+                self.batches += 1
+                self.exported += len(batch)
+                exported += len(batch)
+        return exported
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.running,
+            "exporter": type(self.exporter).__name__,
+            "sample_rates": self.sample_rates,
+            "default_sample_rate": self.default_sample_rate,
+            "queue_depth": len(self._queue),
+            "max_queue": self.max_queue,
+            "emitted": self.emitted,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+            "exported": self.exported,
+            "batches": self.batches,
+            "export_errors": self.export_errors
+        }
+
+
+def build_telemetry_from_env(logger: logging.Logger) -> TelemetryPipeline:
+    """Pipeline configure par TELEMETRY_EXPORTER / _SAMPLE_RATE / _QUEUE_SIZE /
+    _BATCH_SIZE / _FLUSH_INTERVAL / _PATH.
+
+    TELEMETRY_SAMPLE_RATE ne s'applique qu'aux evenements par prediction ;
+    batch, flux et drift sont toujours exportes.
+    """
+    name = os.getenv("TELEMETRY_EXPORTER", "logging").lower()
+    if name not in EXPORTERS:
+        raise ValueError(f"Exportateur de telemetrie inconnu : {name} (attendu : {', '.join(EXPORTERS)})")
+    if name in ("logging", "logging_events"):
+        exporter = LoggingExporter(logger, per_event=name == "logging_events")
+    elif name == "jsonl":
+        exporter = JsonLinesExporter(os.getenv("TELEMETRY_PATH", "telemetry/events.jsonl"))
+    else:
+        exporter = NullExporter()
+    return TelemetryPipeline(
+        exporter,
+        sample_rates={"prediction": float(os.getenv("TELEMETRY_SAMPLE_RATE", "1.0"))},
+        max_queue=int(os.getenv("TELEMETRY_QUEUE_SIZE", "10000")),
+        batch_size=int(os.getenv("TELEMETRY_BATCH_SIZE", "512")),
+        flush_interval=float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "1.0"))
+    )
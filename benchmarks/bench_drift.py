@@ -0,0 +1,83 @@
+"""Duree de detect_drift en fonction de la taille du fichier de production.
+
+Pour chaque taille, un fichier de production est genere en retirant des
+lignes du jeu de reference (avec un decalage sur deux features), puis
+mesure avec :
+- binned : premiere verification (lecture complete) puis verification
+  suivante sans nouvelles lignes (incrementale) ;
+- exact : ks_2samp sur toutes les lignes ;
+- sampled : ks_2samp sur un echantillon de `--sample-size` lignes.
+
+Usage :
+    python benchmarks/bench_drift.py --sizes 10000,100000,1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import REFERENCE_FILE, metric, print_metrics, save_results
+
+DEFAULT_SIZES = (10000, 100000, 500000)
+
+
+def write_production(path: str, n_rows: int, seed: int = 0) -> str:
+    import numpy as np
+    import pandas as pd
+
+    reference = pd.read_csv(REFERENCE_FILE).drop(columns="Exited")
+    rng = np.random.default_rng(seed)
+    production = reference.iloc[rng.integers(0, len(reference), n_rows)].reset_index(drop=True)
+    production["Age"] = production["Age"] + rng.integers(0, 5, n_rows)
+    production["Balance"] = production["Balance"] * 1.1
+    production.to_csv(path, index=False)
+    return path
+
+
+def _ms(fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return (time.perf_counter() - started) * 1000
+
+
+def bench_drift(sizes=DEFAULT_SIZES, sample_size: int = 10000, reference_file: str = REFERENCE_FILE) -> dict:
+    from app.drift_detect import detect_drift
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench-drift-") as tmp:
+        for size in sizes:
+            production = write_production(os.path.join(tmp, f"production_{size}.csv"), size)
+            run = lambda **kw: detect_drift(reference_file, production, **kw)  # noqa: E731
+            results[f"drift.binned_cold.rows_{size}.ms"] = metric(_ms(lambda: run(method="binned")), "ms")
+            results[f"drift.binned_incremental.rows_{size}.ms"] = metric(
+                _ms(lambda: run(method="binned")), "ms"
+            )
+            results[f"drift.exact.rows_{size}.ms"] = metric(_ms(lambda: run(method="exact")), "ms")
+            if size > sample_size:
+                results[f"drift.sampled.rows_{size}.ms"] = metric(
+                    _ms(lambda: run(method="exact", sample_size=sample_size)), "ms"
+                )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)))
+    parser.add_argument("--sample-size", type=int, default=10000)
+    parser.add_argument("--json", default=None, help="fichier de resultats JSON")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings("ignore", message="ks_2samp: Exact calculation unsuccessful")
+    results = bench_drift([int(s) for s in args.sizes.split(",")], args.sample_size)
+    print_metrics(results)
+    if args.json:
+        save_results(results, args.json, ["drift"])
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Memoire par worker : pickle joblib vs artefact memory-mappe.
+
+Lance N processus (comme N workers uvicorn) qui chargent chacun le modele
+puis scorent un lot pour toucher toutes les pages des arbres. Une fois
+tous les workers charges, chacun lit /proc/self/smaps_rollup :
+
+- RSS : pages residentes, partagees comprises (compte N fois) ;
+- PSS : pages partagees divisees par le nombre de processus qui les
+  utilisent (la somme des PSS est la memoire reellement consommee) ;
+- Private : pages propres au processus.
+
+Les colonnes "modele" sont les increments mesures autour du chargement
+(sklearn est importe avant la mesure dans les deux modes).
+
+Usage :
+    python benchmarks/bench_model_memory.py --workers 4
+    python benchmarks/bench_model_memory.py --model model/churn_model.pkl --json results.json
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+MODES = ("pickle", "mmap")
+
+
+def memory_kb() -> dict:
+    """Rss / Pss / Private (kB) du processus courant"""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    }
+
+
+def _worker(mode, model_path, mmap_path, n_rows, loaded, measured, results):
+    import warnings
+
+    import numpy as np
+    import joblib
+    import sklearn.ensemble  # noqa: F401  (meme base dans les deux modes)
+    from app.forest_engine import load_compiled
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    before = memory_kb()
+    if mode == "pickle":
+        model = joblib.load(model_path)
+    else:
+        model, _ = load_compiled(mmap_path, mmap=True)
+
+    X = np.random.default_rng(os.getpid()).uniform(0, 1e5, size=(n_rows, model.n_features_in_))
+    model.predict_proba(X)
+
+    # Mesure quand tous les workers ont charge (les PSS en dependent)
+    loaded.wait()
+    after = memory_kb()
+    results.put({
+        "pid": os.getpid(),
+        **{f"{k}_kb": v for k, v in after.items()},
+        **{f"model_{k}_kb": after[k] - before[k] for k in after}
+    })
+    measured.wait()
+
+
+def run(mode: str, model_path: str, mmap_path: str, workers: int, n_rows: int) -> list:
+    ctx = mp.get_context("spawn")
+    loaded, measured = ctx.Barrier(workers), ctx.Barrier(workers + 1)
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=_worker, args=(mode, model_path, mmap_path, n_rows, loaded, measured, results))
+        for _ in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    rows = [results.get(timeout=300) for _ in procs]
+    measured.wait()
+    for p in procs:
+        p.join()
+    return rows
+
+
+def summarize(rows: list) -> dict:
+    n = len(rows)
+    return {
+        "workers": n,
+        "mean_rss_kb": round(sum(r["rss_kb"] for r in rows) / n),
+        "mean_pss_kb": round(sum(r["pss_kb"] for r in rows) / n),
+        "total_pss_kb": sum(r["pss_kb"] for r in rows),
+        "mean_model_rss_kb": round(sum(r["model_rss_kb"] for r in rows) / n),
+        "mean_model_pss_kb": round(sum(r["model_pss_kb"] for r in rows) / n),
+        "mean_model_private_kb": round(sum(r["model_private_kb"] for r in rows) / n)
+    }
+
+
+def ensure_mmap_artifact(model_path: str, mmap_path: str) -> str:
+    """Utilise l'artefact de train_model.py, ou en ecrit un temporaire"""
+    if os.path.isdir(mmap_path):
+        return mmap_path
+    import joblib
+    from app.forest_engine import compile_model, save_compiled
+
+    target = os.path.join(tempfile.mkdtemp(prefix="bench-mmap-"), "model_mmap")
+    print(f"Artefact {mmap_path} absent, compilation dans {target}")
+    return save_compiled(compile_model(joblib.load(model_path)), target)
+
+
+def main(argv=None):
+    from app.model_registry import mmap_path_for
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=os.getenv("MODEL_PATH", "model/churn_model.pkl"))
+    parser.add_argument("--mmap-path", default=None)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=1000, help="lignes scorees par worker")
+    parser.add_argument("--json", default=None, help="fichier de resultats JSON")
+    args = parser.parse_args(argv)
+
+    mmap_path = ensure_mmap_artifact(args.model, args.mmap_path or mmap_path_for(args.model))
+    report = {}
+    for mode in MODES:
+        report[mode] = summarize(run(mode, args.model, mmap_path, args.workers, args.rows))
+
+    print(f"\n{args.workers} workers - memoire moyenne par worker (kB)")
+    header = ("mode", "RSS", "PSS", "RSS modele", "PSS modele", "prive modele", "PSS total")
+    print("{:<8}{:>10}{:>10}{:>12}{:>12}{:>14}{:>12}".format(*header))
+    for mode, s in report.items():
+        print("{:<8}{:>10}{:>10}{:>12}{:>12}{:>14}{:>12}".format(
+            mode, s["mean_rss_kb"], s["mean_pss_kb"], s["mean_model_rss_kb"],
+            s["mean_model_pss_kb"], s["mean_model_private_kb"], s["total_pss_kb"]
+        ))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Latence unitaire de predict_cached et debit du scoring par lots.
+
+- predict_cached : lignes toutes differentes (cache manque : validation du
+  tuple, predict_proba, mise en cache) puis les memes lignes (cache touche) ;
+- scoring par lots : lignes/s de score_matrix pour plusieurs tailles de
+  lot, moteur scikit-learn et moteur compile.
+
+Usage :
+    python benchmarks/bench_predict.py
+    python benchmarks/bench_predict.py --sizes 1,100,10000 --json results.json
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import latency_metrics, load_model, metric, print_metrics, sample_rows, save_results, timed
+
+DEFAULT_SIZES = (1, 10, 100, 1000, 10000)
+
+
+def bench_predict_cached(model, n_miss: int = 200, n_hit: int = 5000) -> dict:
+    """predict_cached de app.main, avec le modele donne"""
+    os.environ.setdefault("API_KEY", "bench")
+    import app.main as app_main
+
+    app_main.set_model(model, "bench", "sklearn")
+    rows = [tuple(row) for row in sample_rows(n_miss, seed=1).tolist()]
+    # Lignes uniques : chaque appel est un manque de cache
+    rows = list(dict.fromkeys(rows))
+    app_main.predict_cached(rows[0])
+    app_main.prediction_cache.clear()
+
+    miss = []
+    for row in rows:
+        started = time.perf_counter()
+        app_main.predict_cached(row)
+        miss.append(time.perf_counter() - started)
+
+    hit = []
+    for i in range(n_hit):
+        row = rows[i % len(rows)]
+        started = time.perf_counter()
+        app_main.predict_cached(row)
+        hit.append(time.perf_counter() - started)
+
+    app_main.set_model(None, None)
+    return {**latency_metrics("predict_cached.miss", miss), **latency_metrics("predict_cached.hit", hit)}
+
+
+def bench_batch(model, sizes=DEFAULT_SIZES, engines=("sklearn", "compiled")) -> dict:
+    """Lignes/s de score_matrix par taille de lot et par moteur"""
+    from app.forest_engine import compile_model
+    from app.scoring import score_matrix
+
+    X = sample_rows(max(sizes), seed=2)
+    served = {"sklearn": model}
+    if "compiled" in engines:
+        try:
+            served["compiled"] = compile_model(model)
+        except (TypeError, ValueError) as e:
+            print(f"Moteur compile ignore : {e}")
+
+    results = {}
+    for engine, scorer in served.items():
+        if engine not in engines:
+            continue
+        for size in sizes:
+            batch = X[:size]
+            repeat = 20 if size <= 100 else 5
+            seconds = timed(lambda: score_matrix(scorer, batch), repeat=repeat)
+            results[f"batch.{engine}.size_{size}.rows_per_s"] = metric(size / seconds, "rows/s", "higher")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=None, help="pickle du modele (defaut : MODEL_PATH ou foret entrainee)")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)))
+    parser.add_argument("--misses", type=int, default=200)
+    parser.add_argument("--hits", type=int, default=5000)
+    parser.add_argument("--json", default=None, help="fichier de resultats JSON")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    model, _ = load_model(args.model)
+    results = {
+        **bench_predict_cached(model, args.misses, args.hits),
+        **bench_batch(model, [int(s) for s in args.sizes.split(",")])
+    }
+    print_metrics(results)
+    if args.json:
+        save_results(results, args.json, ["predict"])
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Outils communs aux benchmarks : modele, mesures, resultats JSON, comparaison.
+
+Chaque benchmark produit des metriques plates `{nom: {value, unit, better}}`
+(`better` : "lower" pour une latence, "higher" pour un debit). Les
+fichiers de resultats contiennent aussi l'environnement (versions, CPU,
+commit) pour que deux executions puissent etre comparees par `compare`.
+"""
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+REFERENCE_FILE = os.path.join(ROOT, "data", "bank_churn.csv")
+
+# Ecart relatif au-dela duquel une metrique est signalee en regression
+DEFAULT_TOLERANCE = 0.10
+
+
+def metric(value: float, unit: str, better: str = "lower") -> dict:
+    return {"value": float(value), "unit": unit, "better": better}
+
+
+UNITS = {"us": 1e6, "ms": 1e3, "s": 1.0}
+
+
+def latency_metrics(prefix: str, seconds: List[float], unit: str = "us") -> Dict[str, dict]:
+    """p50 / p95 / p99 / moyenne, en `unit` (us, ms ou s)"""
+    values = np.asarray(seconds, dtype=np.float64) * UNITS[unit]
+    return {
+        f"{prefix}.p50_{unit}": metric(np.percentile(values, 50), unit),
+        f"{prefix}.p95_{unit}": metric(np.percentile(values, 95), unit),
+        f"{prefix}.p99_{unit}": metric(np.percentile(values, 99), unit),
+        f"{prefix}.mean_{unit}": metric(values.mean(), unit)
+    }
+
+
+def timed(fn, repeat: int = 5, warmup: int = 1) -> float:
+    """Meilleur temps (s) de `fn()` sur `repeat` executions"""
+    for _ in range(warmup):
+        fn()
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def load_model(path: Optional[str] = None, n_estimators: int = 100):
+    """Modele servi (MODEL_PATH), ou foret entrainee sur data/bank_churn.csv"""
+    import joblib
+
+    path = path or os.getenv("MODEL_PATH", os.path.join(ROOT, "model", "churn_model.pkl"))
+    if os.path.exists(path):
+        return joblib.load(path), path
+
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+
+    df = pd.read_csv(REFERENCE_FILE)
+    X, y = df.drop("Exited", axis=1), df["Exited"]
+    model = RandomForestClassifier(n_estimators=n_estimators, max_depth=10, random_state=42, n_jobs=1)
+    # Entraine sur des tableaux : le service score des matrices sans noms de colonnes
+    model.fit(X.to_numpy(), y.to_numpy())
+    return model, None
+
+
+def sample_rows(n: int, seed: int = 0) -> np.ndarray:
+    """Lignes realistes tirees du jeu de reference (matrice (n, 10))"""
+    import pandas as pd
+
+    X = pd.read_csv(REFERENCE_FILE).drop("Exited", axis=1).to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    return X[rng.integers(0, len(X), n)]
+
+
+def environment() -> dict:
+    import sklearn
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count()
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpus": cpus,
+        "commit": commit
+    }
+
+
+def save_results(results: Dict[str, dict], path: Optional[str] = None, suites: Optional[List[str]] = None) -> str:
+    """Ecrit les resultats (benchmarks/results/<date>.json par defaut)"""
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + ".json")
+    payload = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "suites": suites or [],
+        "environment": environment(),
+        "metrics": results
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    return path
+
+
+def load_results(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline: dict, current: dict, tolerance: float = DEFAULT_TOLERANCE) -> List[dict]:
+    """Compare deux fichiers de resultats metrique par metrique.
+
+    Une metrique regresse si elle se degrade de plus de `tolerance`
+    (relatif) dans le sens indique par `better`. Les metriques absentes
+    de l'une des deux executions sont ignorees.
+    """
+    rows = []
+    for name, new in sorted(current["metrics"].items()):
+        old = baseline["metrics"].get(name)
+        if old is None:
+            continue
+        if old["value"]:
+            change = (new["value"] - old["value"]) / abs(old["value"])
+        else:
+            # Ex. taux d'erreur passe de 0 a une valeur positive
+            change = 0.0 if not new["value"] else float("inf") if new["value"] > 0 else float("-inf")
+        worse = change > tolerance if new["better"] == "lower" else change < -tolerance
+        better = change < -tolerance if new["better"] == "lower" else change > tolerance
+        rows.append({
+            "metric": name,
+            "unit": new["unit"],
+            "baseline": old["value"],
+            "current": new["value"],
+            "change": change,
+            "status": "regression" if worse else "improvement" if better else "ok"
+        })
+    return rows
+
+
+def print_metrics(results: Dict[str, dict]):
+    width = max((len(name) for name in results), default=10)
+    for name, m in results.items():
+        print(f"{name:<{width}}  {m['value']:>14.2f} {m['unit']}")
+
+
+def print_comparison(rows: List[dict]):
+    width = max((len(r["metric"]) for r in rows), default=10)
+    for r in rows:
+        flag = {"regression": "REGRESSION", "improvement": "mieux"}.get(r["status"], "")
+        print(f"{r['metric']:<{width}}  {r['baseline']:>12.2f} -> {r['current']:>12.2f} "
+              f"{r['unit']:<6} {r['change']:+7.1%}  {flag}")
@@ -0,0 +1,34 @@
+"""Compare deux fichiers de resultats de benchmarks.
+
+Code de sortie 1 si une metrique se degrade de plus de `--tolerance`
+(relatif) ; utilisable tel quel en CI.
+
+Usage :
+    python benchmarks/compare.py baseline.json current.json --tolerance 0.15
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import DEFAULT_TOLERANCE, compare, load_results, print_comparison
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    baseline, current = load_results(args.baseline), load_results(args.current)
+    if baseline["environment"].get("cpus") != current["environment"].get("cpus"):
+        print("Attention : nombre de CPU different entre les deux executions")
+    rows = compare(baseline, current, args.tolerance)
+    print_comparison(rows)
+    return 1 if any(r["status"] == "regression" for r in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Generateur de charge HTTP concurrent (asyncio + httpx).
+
+Envoie des requetes /predict (ou /predict/batch) avec `--concurrency`
+clients simultanes pendant `--duration` secondes (ou `--requests`
+requetes) et rapporte p50 / p95 / p99, debit (req/s) et erreurs.
+
+Sans `--url`, un serveur uvicorn local est demarre sur un port libre avec
+le modele MODEL_PATH (ou une foret entrainee pour l'occasion).
+`--unique` fixe la part de lignes jamais vues (cache manque).
+
+Usage :
+    python benchmarks/load_test.py --concurrency 32 --duration 20
+    python benchmarks/load_test.py --url http://localhost:8000 --api-key $API_KEY --endpoint batch
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import ROOT, latency_metrics, load_model, metric, print_metrics, sample_rows, save_results
+
+ENDPOINTS = {"predict": "/predict", "batch": "/predict/batch"}
+
+
+def make_payloads(n: int, unique: float, batch_rows: int, endpoint: str, seed: int = 3) -> list:
+    """Corps de requete ; une part `unique` de lignes distinctes, le reste repete"""
+    from app.scoring import FEATURE_NAMES
+
+    rows = sample_rows(n * (batch_rows if endpoint == "batch" else 1), seed=seed)
+    n_distinct = max(1, int(len(rows) * unique))
+    records = []
+    for i, row in enumerate(rows.tolist()):
+        row = rows[i % n_distinct].tolist() if i >= n_distinct else row
+        records.append({
+            name: int(v) if name not in ("Balance", "EstimatedSalary") else float(v)
+            for name, v in zip(FEATURE_NAMES, row)
+        })
+    if endpoint == "batch":
+        return [records[i:i + batch_rows] for i in range(0, len(records), batch_rows)]
+    return records
+
+
+async def run_load(url: str, api_key: str, path: str, payloads: list, concurrency: int,
+                   duration: float = None, requests: int = None) -> dict:
+    import httpx
+
+    latencies, statuses = [], {}
+    sent = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, headers={"X-API-Key": api_key}, timeout=60, limits=limits) as client:
+        deadline = time.perf_counter() + duration if duration else None
+
+        async def client_loop():
+            nonlocal sent
+            while True:
+                if requests is not None and sent >= requests:
+                    return
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                payload = payloads[sent % len(payloads)]
+                sent += 1
+                started = time.perf_counter()
+                try:
+                    response = await client.post(path, json=payload)
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {"latencies": latencies, "statuses": statuses, "elapsed": elapsed}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(api_key: str, model_path: str = None, workers: int = 1, env: dict = None):
+    """Demarre uvicorn en sous-processus ; renvoie (processus, url)"""
+    import joblib
+    import httpx
+
+    if model_path is None or not os.path.exists(model_path):
+        model, model_path = load_model(model_path)
+        if model_path is None:
+            model_path = os.path.join(tempfile.mkdtemp(prefix="bench-model-"), "churn_model.pkl")
+            joblib.dump(model, model_path)
+
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT,
+        env={**os.environ, "API_KEY": api_key, "MODEL_PATH": model_path, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Le serveur s'est arrete au demarrage")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Serveur non disponible apres 120 s")
+
+
+def summarize(run: dict, prefix: str) -> dict:
+    total = sum(run["statuses"].values())
+    errors = total - run["statuses"].get(200, 0)
+    return {
+        **latency_metrics(prefix, run["latencies"], "ms"),
+        f"{prefix}.rps": metric(total / run["elapsed"], "req/s", "higher"),
+        f"{prefix}.error_rate": metric(errors / total if total else 0.0, "ratio")
+    }
+
+
+def bench_load(url: str = None, api_key: str = "bench", endpoint: str = "predict", concurrency: int = 16,
+               duration: float = 10.0, requests: int = None, unique: float = 1.0, batch_rows: int = 100,
+               workers: int = 1, model_path: str = None) -> dict:
+    process = None
+    if url is None:
+        process, url = start_server(api_key, model_path, workers)
+    try:
+        payloads = make_payloads(2000 if endpoint == "predict" else 50, unique, batch_rows, endpoint)
+        # Chauffe (connexions, premier predict_proba) hors mesure
+        asyncio.run(run_load(url, api_key, ENDPOINTS[endpoint], payloads, concurrency, requests=concurrency))
+        run = asyncio.run(run_load(url, api_key, ENDPOINTS[endpoint], payloads, concurrency, duration, requests))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+    print(f"Statuts : {run['statuses']}")
+    return summarize(run, f"http.{endpoint}.c{concurrency}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=None, help="API existante (defaut : serveur local demarre)")
+    parser.add_argument("--api-key", default=os.getenv("API_KEY", "bench"))
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="predict")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="secondes (ignore si --requests)")
+    parser.add_argument("--requests", type=int, default=None)
+    parser.add_argument("--unique", type=float, default=1.0, help="part de lignes distinctes (0..1)")
+    parser.add_argument("--batch-rows", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1, help="workers uvicorn du serveur local")
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--json", default=None, help="fichier de resultats JSON")
+    args = parser.parse_args(argv)
+
+    results = bench_load(
+        args.url, args.api_key, args.endpoint, args.concurrency,
+        None if args.requests else args.duration, args.requests,
+        args.unique, args.batch_rows, args.workers, args.model
+    )
+    print_metrics(results)
+    if args.json:
+        save_results(results, args.json, ["load"])
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Execute la suite de benchmarks, enregistre les resultats et detecte les regressions.
+
+Suites : predict (latence predict_cached, debit par lots), drift (duree
+de detect_drift selon la taille), load (charge HTTP sur un serveur local).
+Les resultats sont ecrits dans benchmarks/results/<date>.json (ou
+`--json`). Avec `--baseline`, chaque metrique est comparee a une
+execution precedente et le code de sortie vaut 1 si l'une d'elles se
+degrade de plus de `--tolerance`.
+
+Usage :
+    python benchmarks/run_all.py
+    python benchmarks/run_all.py --suites predict,drift --baseline benchmarks/results/20260101T000000Z.json
+    python benchmarks/run_all.py --quick
+"""
+import argparse
+import os
+import sys
+import warnings
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import (
+    DEFAULT_TOLERANCE,
+    compare,
+    load_model,
+    load_results,
+    print_comparison,
+    print_metrics,
+    save_results
+)
+
+SUITES = ("predict", "drift", "load")
+
+
+def run_suites(suites, quick: bool = False, model_path: str = None) -> dict:
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    warnings.filterwarnings("ignore", message="ks_2samp: Exact calculation unsuccessful")
+    results = {}
+    if "predict" in suites:
+        from benchmarks.bench_predict import bench_batch, bench_predict_cached
+
+        model, _ = load_model(model_path)
+        results.update(bench_predict_cached(model, 50 if quick else 200, 1000 if quick else 5000))
+        results.update(bench_batch(model, (1, 100, 1000) if quick else (1, 10, 100, 1000, 10000)))
+    if "drift" in suites:
+        from benchmarks.bench_drift import bench_drift
+
+        results.update(bench_drift((10000, 50000) if quick else (10000, 100000, 500000)))
+    if "load" in suites:
+        from benchmarks.load_test import bench_load
+
+        results.update(bench_load(concurrency=16, duration=3 if quick else 15, model_path=model_path))
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suites", default=",".join(SUITES))
+    parser.add_argument("--quick", action="store_true", help="tailles et durees reduites")
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--json", default=None, help="fichier de resultats (defaut : benchmarks/results/)")
+    parser.add_argument("--baseline", default=None, help="resultats de reference a comparer")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"suites inconnues : {', '.join(sorted(unknown))}")
+
+    results = run_suites(suites, args.quick, args.model)
+    print_metrics(results)
+    path = save_results(results, args.json, suites)
+    print(f"\nResultats : {path}")
+
+    if args.baseline:
+        rows = compare(load_results(args.baseline), load_results(path), args.tolerance)
+        print(f"\nComparaison avec {args.baseline} (tolerance {args.tolerance:.0%})")
+        print_comparison(rows)
+        regressions = [r for r in rows if r["status"] == "regression"]
+        if regressions:
+            print(f"\n{len(regressions)} regression(s)")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,30 @@
+"""Donnees de production avec drift artificiel.
+
+`generate_drifted_data` (sans --scenario) : copie du jeu de reference avec
+un decalage gaussien sur quatre features, utilisee par le Dockerfile et
+la CI.
+
+Moteur de scenarios (`--scenario`) : flux horodate, genere bloc par bloc
+(operations vectorisees sur des tableaux numpy), pour eprouver et valider
+le drift par fenetres. Chaque ligne est tiree du jeu de reference puis
+deformee selon l'intensite du drift a son horodatage :
+- profil : sudden (bascule a `onset`), gradual (rampe de `onset` a la fin),
+  recurring (alternance toutes les demi-periodes), none ;
+- decalages de moyenne et changements d'echelle (en ecarts-types) ;
+- proportions des indicateurs (Geography_*, HasCrCard) ;
+- correlations entre paires de features continues (covariance).
+
+La colonne `drift_intensity` (0 a 1) donne la verite terrain par ligne.
+
+    python drift_data_gen.py --scenario gradual --rows 5000000 --duration 7d \
+        --output data/drift_stream.csv
+"""
+import argparse
+import re
+import time
+from dataclasses import dataclass, field, replace
+from typing import Dict, Tuple
+
 import pandas as pd
 import numpy as np
 import os
@@ -52,5 +79,249 @@ def generate_drifted_data(
     print(f"✅ Données de production générées avec drift '{drift_level}'")
     print(f"📁 Fichier : {output_file}")
 
+# -------------------------------------------------
+# Moteur de scenarios
+# -------------------------------------------------
+PROFILES = ("none", "sudden", "gradual", "recurring")
+
+# Multiplicateur des amplitudes du scenario
+LEVELS = {"low": 0.5, "medium": 1.0, "high": 2.0}
+
+
+@dataclass
+class DriftScenario:
+    """Deformations atteintes a l'intensite 1 (`profile` en donne l'evolution).
+
+    shifts : decalage de moyenne (ecarts-types de reference) ;
+    scales : facteur applique a l'ecart-type ;
+    proportions : part de 1 visee pour un indicateur 0/1 ;
+    correlations : correlation visee entre deux features continues.
+    """
+    profile: str = "sudden"
+    onset: float = 0.5        # fraction de la duree (sudden, gradual)
+    period: float = 86400.0   # secondes (recurring)
+    shifts: Dict[str, float] = field(default_factory=dict)
+    scales: Dict[str, float] = field(default_factory=dict)
+    proportions: Dict[str, float] = field(default_factory=dict)
+    correlations: Dict[Tuple[str, str], float] = field(default_factory=dict)
+
+    def intensity(self, progress: np.ndarray, elapsed: np.ndarray) -> np.ndarray:
+        """Intensite (0 a 1) par ligne, d'apres sa position dans le flux"""
+        if self.profile == "none":
+            return np.zeros(len(progress))
+        if self.profile == "sudden":
+            return (progress >= self.onset).astype(np.float64)
+        if self.profile == "gradual":
+            return np.clip((progress - self.onset) / max(1.0 - self.onset, 1e-12), 0.0, 1.0)
+        if self.profile == "recurring":
+            # Premiere demi-periode sans drift, puis alternance
+            return ((elapsed // (self.period / 2)) % 2).astype(np.float64)
+        raise ValueError(f"Profil inconnu : {self.profile} (attendu : {', '.join(PROFILES)})")
+
+
+SCENARIOS = {
+    "none": DriftScenario(profile="none"),
+    "sudden": DriftScenario(
+        profile="sudden",
+        shifts={"CreditScore": -0.3, "Age": 0.4, "Balance": 0.3},
+        proportions={"Geography_Germany": 0.7}
+    ),
+    "gradual": DriftScenario(
+        profile="gradual",
+        onset=0.2,
+        shifts={"Age": 0.5, "EstimatedSalary": -0.3},
+        scales={"Balance": 1.5},
+        proportions={"HasCrCard": 0.8}
+    ),
+    "recurring": DriftScenario(
+        profile="recurring",
+        shifts={"Balance": 0.4, "EstimatedSalary": 0.3},
+        proportions={"Geography_Spain": 0.75}
+    ),
+    # Marginales quasi inchangees : invisible pour KS / PSI par feature
+    "covariance": DriftScenario(
+        profile="sudden",
+        scales={"Age": 1.3},
+        correlations={("Balance", "EstimatedSalary"): 0.8, ("Age", "CreditScore"): -0.6}
+    ),
+}
+
+
+def apply_scenario(
+    values: np.ndarray,
+    columns: list,
+    intensity: np.ndarray,
+    scenario: DriftScenario,
+    mean: np.ndarray,
+    std: np.ndarray,
+    rng: np.random.Generator,
+    strength: float = 1.0
+) -> np.ndarray:
+    """Deforme un bloc (lignes x colonnes) en place, ligne par ligne selon `intensity`"""
+    index = {col: i for i, col in enumerate(columns)}
+    level = strength * intensity
+
+    # Covariance : b <- r a + sqrt(1 - r^2) b sur les valeurs centrees reduites
+    # (variance de b conservee si a et b sont independants dans la reference)
+    for (a, b), rho in scenario.correlations.items():
+        ia, ib = index[a], index[b]
+        r = np.clip(level * rho, -0.99, 0.99)
+        za = (values[:, ia] - mean[ia]) / std[ia]
+        zb = (values[:, ib] - mean[ib]) / std[ib]
+        values[:, ib] = mean[ib] + std[ib] * (r * za + np.sqrt(1 - r ** 2) * zb)
+
+    for col, factor in scenario.scales.items():
+        i = index[col]
+        values[:, i] = mean[i] + (values[:, i] - mean[i]) * (1 + level * (factor - 1))
+
+    for col, shift in scenario.shifts.items():
+        i = index[col]
+        values[:, i] += level * shift * std[i]
+
+    # Proportions : bascules 0 -> 1 (ou 1 -> 0) avec la probabilite qui amene
+    # la part de 1 de p_ref a p_ref + intensite * (cible - p_ref)
+    for col, target in scenario.proportions.items():
+        i = index[col]
+        p_ref = mean[i]
+        goal = p_ref + np.clip(level, 0.0, 1.0) * (target - p_ref)
+        u = rng.random(len(values))
+        x = values[:, i]
+        to_one = (x == 0) & (goal > p_ref) & (u < (goal - p_ref) / max(1 - p_ref, 1e-12))
+        to_zero = (x == 1) & (goal < p_ref) & (u < (p_ref - goal) / max(p_ref, 1e-12))
+        x[to_one] = 1.0
+        x[to_zero] = 0.0
+    return values
+
+
+def generate_scenario(
+    scenario: DriftScenario,
+    rows: int,
+    output_file: str,
+    reference_file: str = "data/bank_churn.csv",
+    duration: float = 7 * 86400,
+    start: float = None,
+    strength: float = 1.0,
+    chunk_rows: int = 500_000,
+    seed: int = 42
+) -> dict:
+    """Ecrit un flux horodate de `rows` lignes (CSV ou Parquet), bloc par bloc.
+
+    Lignes reparties regulierement sur [start, start + duration] ;
+    `start` vaut par defaut maintenant - duration (les fenetres "1h",
+    "1d" de l'API tombent sur la fin du flux).
+    """
+    import pyarrow as pa
+
+    started = time.perf_counter()
+    start = time.time() - duration if start is None else start
+    reference = pd.read_csv(reference_file)
+    columns = list(reference.columns)
+    values = reference.to_numpy(dtype=np.float64)
+    mean, std = values.mean(axis=0), values.std(axis=0)
+    std[std == 0] = 1.0
+
+    # Colonnes entieres non deformees continument : type d'origine conserve
+    continuous = set(scenario.shifts) | set(scenario.scales) | {c for pair in scenario.correlations for c in pair}
+    integer = [c for c in columns if pd.api.types.is_integer_dtype(reference[c]) and c not in continuous]
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    parquet = output_file.endswith(".parquet")
+    rng = np.random.default_rng(seed)
+    writer, handle = None, None
+    total_intensity = 0.0
+    try:
+        for first in range(0, rows, chunk_rows):
+            size = min(chunk_rows, rows - first)
+            progress = (np.arange(first, first + size) + 0.5) / rows
+            elapsed = progress * duration
+            intensity = scenario.intensity(progress, elapsed)
+            block = apply_scenario(
+                values[rng.integers(0, len(values), size)], columns, intensity,
+                scenario, mean, std, rng, strength
+            )
+            frame = pd.DataFrame(block, columns=columns)
+            frame[integer] = frame[integer].astype(np.int64)
+            frame.insert(0, "timestamp", start + elapsed)
+            frame["drift_intensity"] = intensity
+            total_intensity += float(intensity.sum())
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if parquet:
+                import pyarrow.parquet as pq
+                if writer is None:
+                    writer = pq.ParquetWriter(output_file, table.schema)
+                writer.write_table(table)
+            else:
+                import pyarrow.csv as pc
+                if handle is None:
+                    handle = open(output_file, "wb")
+                    handle.write((",".join(frame.columns) + "\n").encode())
+                pc.write_csv(table, handle, pc.WriteOptions(include_header=False, quoting_style="none"))
+    finally:
+        if writer is not None:
+            writer.close()
+        if handle is not None:
+            handle.close()
+
+    return {
+        "rows": rows,
+        "start": start,
+        "end": start + duration,
+        "mean_intensity": total_intensity / rows if rows else 0.0,
+        "seconds": time.perf_counter() - started
+    }
+
+
+_DURATION = re.compile(r"^(\d+(?:\.\d+)?)\s*([smhdw]?)$")
+_DURATION_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def duration(value) -> float:
+    """'90', '5m', '1h', '7d', '1w' -> secondes (meme syntaxe que les fenetres
+    de drift de l'API, sans importer app : l'etape "data" du Dockerfile n'a
+    que pandas / numpy)"""
+    match = _DURATION.match(str(value).strip().lower())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Duree invalide : {value} (ex. 300, 5m, 1h, 7d)")
+    return float(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Donnees de production avec drift artificiel")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS),
+                        help="Flux horodate (sans --scenario : generate_drifted_data)")
+    parser.add_argument("--level", choices=sorted(LEVELS), default="medium")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--duration", type=duration, default="7d", help="Etendue du flux (ex. 6h, 7d)")
+    parser.add_argument("--start", type=float, help="Debut du flux (epoch) ; defaut : maintenant - duree")
+    parser.add_argument("--onset", type=float, help="Debut du drift, fraction de la duree (sudden, gradual)")
+    parser.add_argument("--period", type=duration, help="Periode du drift recurrent (ex. 1d)")
+    parser.add_argument("--chunk-rows", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reference", default="data/bank_churn.csv")
+    parser.add_argument("--output", help="Fichier .csv ou .parquet")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.scenario is None:
+        generate_drifted_data(drift_level=args.level, output_file=args.output or "data/production_data.csv")
+        return
+
+    scenario = SCENARIOS[args.scenario]
+    overrides = {k: getattr(args, k) for k in ("onset", "period") if getattr(args, k) is not None}
+    if overrides:
+        scenario = replace(scenario, **overrides)
+    output = args.output or "data/drift_stream.csv"
+    summary = generate_scenario(
+        scenario, args.rows, output, args.reference, args.duration, args.start,
+        LEVELS[args.level], args.chunk_rows, args.seed
+    )
+    print(f"✅ Flux '{args.scenario}' ({args.level}) : {summary['rows']} lignes, "
+          f"intensite moyenne {summary['mean_intensity']:.2f}")
+    print(f"📁 Fichier : {output} ({summary['rows'] / summary['seconds']:,.0f} lignes/s)")
+
+
 if __name__ == "__main__":
-    generate_drifted_data(drift_level="medium")
\ No newline at end of file
+    main()
@@ -1,33 +1,377 @@
 # generate_data.py
-import pandas as pd
+"""Generateur de donnees synthetiques de churn, parallele et par blocs.
+
+Les lignes sont produites par blocs de `--chunk-rows` dans un pool de
+`--workers` processus. Chaque bloc a son propre flux aleatoire, derive de
+`--seed` par SeedSequence. Le jeu produit ne depend donc pas du nombre de
+processus, et chaque processus ecrit directement sa partition : la memoire
+reste celle d'un bloc par processus, quel que soit `--rows`.
+
+- Memes marginales que la version d'origine (entiers et reels uniformes,
+  indicateurs a 50 %), mais pas les memes tirages ni la meme cible.
+- `--correlation` (0 a 1) : copule gaussienne entre les features (age et
+  anciennete, solde et salaire, ...). 0 donne des features independantes.
+- `--churn-rate` : la cible suit un modele logistique (inactif, produit
+  unique, age > 60, Allemagne, score de credit bas). Son intercept est
+  calibre sur un echantillon pilote pour atteindre le taux demande.
+
+Jeu de reference : sans argument (ou avec `--legacy`), le script reprend
+le generateur d'origine (tirages sequentiels np.random, seed 42, churn
+additif) et reproduit le data/bank_churn.csv versionne (memes lignes).
+Le mode parallele donne un autre jeu : autres tirages et cible logistique,
+donc d'autres labels et un autre taux de churn. Il ne remplace
+data/bank_churn.csv que si on le demande explicitement (ex. `--rows 10000`).
+
+Sorties :
+    python generate_data.py                                   # jeu de reference data/bank_churn.csv
+    python generate_data.py --rows 10000000 --output data/churn_10m.csv
+    python generate_data.py --rows 1000000000 --format parquet --output data/churn_1b/
+Un chemin en .csv / .parquet donne un seul fichier (parties concatenees).
+Sinon, la sortie est un repertoire de partitions part-00000.<format>,
+accompagne de _manifest.json.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
+import pandas as pd
+from scipy.special import expit, ndtr
 
-np.random.seed(42)
-n_samples = 10000
-
-data = {
-    'CreditScore': np.random.randint(300, 850, n_samples),
-    'Age': np.random.randint(18, 80, n_samples),
-    'Tenure': np.random.randint(0, 11, n_samples),
-    'Balance': np.random.uniform(0, 200000, n_samples),
-    'NumOfProducts': np.random.randint(1, 5, n_samples),
-    'HasCrCard': np.random.choice([0, 1], n_samples),
-    'IsActiveMember': np.random.choice([0, 1], n_samples),
-    'EstimatedSalary': np.random.uniform(20000, 150000, n_samples),
-    'Geography_Germany': np.random.choice([0, 1], n_samples),
-    'Geography_Spain': np.random.choice([0, 1], n_samples),
+OUTPUT_PATH = "data/bank_churn.csv"
+FORMATS = ("csv", "parquet")
+MANIFEST = "_manifest.json"
+
+COLUMNS = [
+    'CreditScore', 'Age', 'Tenure', 'Balance', 'NumOfProducts', 'HasCrCard',
+    'IsActiveMember', 'EstimatedSalary', 'Geography_Germany', 'Geography_Spain'
+]
+
+# Correlations des variables latentes gaussiennes pour --correlation 1.0
+# (matrice definie positive ; --correlation c la melange avec l'identite)
+CORRELATIONS = {
+    ('Age', 'Tenure'): 0.35,
+    ('Age', 'Balance'): 0.25,
+    ('Age', 'IsActiveMember'): 0.15,
+    ('Balance', 'EstimatedSalary'): 0.40,
+    ('Balance', 'NumOfProducts'): -0.30,
+    ('CreditScore', 'Balance'): 0.20,
+    ('CreditScore', 'HasCrCard'): 0.15,
+    ('Geography_Germany', 'Balance'): 0.20,
+    ('Geography_Germany', 'Geography_Spain'): -0.50,
+}
+
+# Log-odds de churn par facteur de risque (intercept calibre)
+CHURN_WEIGHTS = {
+    'inactive': 1.6,
+    'single_product': 1.1,
+    'senior': 0.9,
+    'germany': 0.5,
+    'low_credit': 0.4
 }
 
-# Target : plus de chance de partir si inactif, peu de produits, etc.
-churn_prob = (
-    (1 - data['IsActiveMember']) * 0.3 +
-    (data['NumOfProducts'] == 1) * 0.2 +
-    (data['Age'] > 60) * 0.15 +
-    (data['Balance'] == 0) * 0.25
-)
-data['Exited'] = (np.random.random(n_samples) < churn_prob).astype(int)
-
-df = pd.DataFrame(data)
-df.to_csv('data/bank_churn.csv', index=False)
-print(f"Dataset cree : {len(df)} lignes")
-print(f"Taux de churn : {df['Exited'].mean():.2%}")
\ No newline at end of file
+PILOT_ROWS = 200_000
+
+
+def correlation_matrix(strength: float) -> np.ndarray:
+    matrix = np.eye(len(COLUMNS))
+    for (a, b), rho in CORRELATIONS.items():
+        i, j = COLUMNS.index(a), COLUMNS.index(b)
+        matrix[i, j] = matrix[j, i] = strength * rho
+    return matrix
+
+
+# -------------------------------------------------
+# Generation d'un bloc
+# -------------------------------------------------
+def _integers(u: np.ndarray, low: int, high: int) -> np.ndarray:
+    """Entier uniforme dans [low, high[ a partir d'un uniforme (comme randint)"""
+    return np.minimum(low + (u * (high - low)).astype(np.int64), high - 1)
+
+
+def generate_features(rng: np.random.Generator, rows: int, correlation: float = 0.0) -> pd.DataFrame:
+    """Features d'un bloc : uniformes de la copule -> marginales d'origine"""
+    z = rng.standard_normal((rows, len(COLUMNS)))
+    if correlation:
+        z = z @ np.linalg.cholesky(correlation_matrix(correlation)).T
+    u = ndtr(z)
+    return pd.DataFrame({
+        'CreditScore': _integers(u[:, 0], 300, 850),
+        'Age': _integers(u[:, 1], 18, 80),
+        'Tenure': _integers(u[:, 2], 0, 11),
+        'Balance': u[:, 3] * 200000,
+        'NumOfProducts': _integers(u[:, 4], 1, 5),
+        'HasCrCard': (u[:, 5] < 0.5).astype(np.int64),
+        'IsActiveMember': (u[:, 6] < 0.5).astype(np.int64),
+        'EstimatedSalary': 20000 + u[:, 7] * 130000,
+        'Geography_Germany': (u[:, 8] < 0.5).astype(np.int64),
+        'Geography_Spain': (u[:, 9] < 0.5).astype(np.int64),
+    })
+
+
+def churn_logit(df: pd.DataFrame) -> np.ndarray:
+    """Log-odds de churn sans intercept : plus de risque si inactif, peu de produits, etc."""
+    return (
+        CHURN_WEIGHTS['inactive'] * (1 - df['IsActiveMember'].to_numpy())
+        + CHURN_WEIGHTS['single_product'] * (df['NumOfProducts'].to_numpy() == 1)
+        + CHURN_WEIGHTS['senior'] * (df['Age'].to_numpy() > 60)
+        + CHURN_WEIGHTS['germany'] * df['Geography_Germany'].to_numpy()
+        + CHURN_WEIGHTS['low_credit'] * (df['CreditScore'].to_numpy() < 450)
+    )
+
+
+def calibrate_intercept(churn_rate: float, correlation: float, seed: int, rows: int = PILOT_ROWS) -> float:
+    """Intercept tel que la probabilite moyenne de churn vaille `churn_rate`.
+
+    Bisection sur un echantillon pilote (flux distinct de ceux des blocs) :
+    la moyenne de expit(intercept + logit) croit avec l'intercept.
+    """
+    logit = churn_logit(generate_features(np.random.default_rng([seed, 1]), rows, correlation))
+    low, high = -30.0, 30.0
+    for _ in range(100):
+        middle = (low + high) / 2
+        if expit(middle + logit).mean() < churn_rate:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def generate_chunk(seed: np.random.SeedSequence, rows: int, correlation: float, intercept: float) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = generate_features(rng, rows, correlation)
+    df['Exited'] = (rng.random(rows) < expit(intercept + churn_logit(df))).astype(np.int64)
+    return df
+
+
+def generate_legacy(rows: int = 10000, output: str = OUTPUT_PATH, seed: int = 42) -> pd.DataFrame:
+    """Generateur d'origine du jeu de reference (memes tirages que np.random.seed)"""
+    rng = np.random.RandomState(seed)
+    data = {
+        'CreditScore': rng.randint(300, 850, rows),
+        'Age': rng.randint(18, 80, rows),
+        'Tenure': rng.randint(0, 11, rows),
+        'Balance': rng.uniform(0, 200000, rows),
+        'NumOfProducts': rng.randint(1, 5, rows),
+        'HasCrCard': rng.choice([0, 1], rows),
+        'IsActiveMember': rng.choice([0, 1], rows),
+        'EstimatedSalary': rng.uniform(20000, 150000, rows),
+        'Geography_Germany': rng.choice([0, 1], rows),
+        'Geography_Spain': rng.choice([0, 1], rows),
+    }
+
+    # Target : plus de chance de partir si inactif, peu de produits, etc.
+    churn_prob = (
+        (1 - data['IsActiveMember']) * 0.3 +
+        (data['NumOfProducts'] == 1) * 0.2 +
+        (data['Age'] > 60) * 0.15 +
+        (data['Balance'] == 0) * 0.25
+    )
+    data['Exited'] = (rng.random_sample(rows) < churn_prob).astype(int)
+
+    df = pd.DataFrame(data)
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    df.to_csv(output, index=False)
+    return df
+
+
+def write_part(df: pd.DataFrame, path: str, fmt: str):
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, path)
+        return
+    # Writer CSV d'Arrow (~8x plus rapide que DataFrame.to_csv, memes valeurs
+    # a la relecture) ; en-tete ecrit a part pour ne pas etre entre guillemets
+    import pyarrow.csv as pc
+    with open(path, "wb") as f:
+        f.write((",".join(df.columns) + "\n").encode())
+        pc.write_csv(table, f, pc.WriteOptions(include_header=False, quoting_style="none"))
+
+
+def _write_chunk(task: tuple) -> dict:
+    """Processus du pool : genere un bloc et ecrit sa partition"""
+    index, seed, rows, correlation, intercept, path, fmt = task
+    started = time.perf_counter()
+    df = generate_chunk(seed, rows, correlation, intercept)
+    write_part(df, path, fmt)
+    return {
+        "index": index,
+        "rows": rows,
+        "churned": int(df['Exited'].sum()),
+        "seconds": time.perf_counter() - started
+    }
+
+
+# -------------------------------------------------
+# Assemblage de la sortie
+# -------------------------------------------------
+def output_layout(output: str, fmt: str = None):
+    """(format, fichier unique ?) d'apres l'extension du chemin de sortie"""
+    suffix = os.path.splitext(output)[1].lstrip(".").lower()
+    if suffix in FORMATS:
+        if fmt and fmt != suffix:
+            raise ValueError(f"--format {fmt} incompatible avec {output}")
+        return suffix, True
+    return fmt or "csv", False
+
+
+def concatenate(parts: list, output: str, fmt: str):
+    """Fichier unique a partir des parties, une partie en memoire a la fois"""
+    if fmt == "csv":
+        with open(output, "wb") as out:
+            for i, part in enumerate(parts):
+                with open(part, "rb") as f:
+                    if i:
+                        f.readline()  # en-tete deja ecrit
+                    shutil.copyfileobj(f, out, 1 << 20)
+        return
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for part in parts:
+            table = pq.read_table(part)
+            if writer is None:
+                writer = pq.ParquetWriter(output, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _replace_directory(staging: str, output: str):
+    """Remplace `output` par `staging` (seulement un jeu deja genere par ce script)"""
+    if os.path.exists(output):
+        if not os.path.exists(os.path.join(output, MANIFEST)):
+            raise FileExistsError(f"{output} existe et n'est pas un jeu genere (pas de {MANIFEST})")
+        shutil.rmtree(output)
+    os.replace(staging, output)
+
+
+def generate(
+    rows: int = 10000,
+    output: str = OUTPUT_PATH,
+    fmt: str = None,
+    workers: int = 1,
+    chunk_rows: int = 1_000_000,
+    seed: int = 42,
+    correlation: float = 0.0,
+    churn_rate: float = 0.25
+) -> dict:
+    """Genere `rows` lignes dans `output` ; renvoie le manifeste"""
+    fmt, single_file = output_layout(output, fmt)
+    started = time.perf_counter()
+    intercept = calibrate_intercept(churn_rate, correlation, seed)
+
+    sizes = [chunk_rows] * (rows // chunk_rows) + ([rows % chunk_rows] if rows % chunk_rows else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    parent = os.path.dirname(os.path.abspath(output))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix=".generate-")
+    try:
+        names = [f"part-{i:05d}.{fmt}" for i in range(len(sizes))]
+        tasks = [
+            (i, seeds[i], size, correlation, intercept, os.path.join(staging, names[i]), fmt)
+            for i, size in enumerate(sizes)
+        ]
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_write_chunk, tasks))
+        else:
+            results = [_write_chunk(task) for task in tasks]
+
+        churned = sum(r["churned"] for r in results)
+        manifest = {
+            "rows": rows,
+            "format": fmt,
+            "columns": COLUMNS + ['Exited'],
+            "seed": seed,
+            "chunk_rows": chunk_rows,
+            "chunks": len(sizes),
+            "correlation": correlation,
+            "churn_rate_target": churn_rate,
+            "churn_rate": churned / rows if rows else 0.0,
+            "intercept": intercept,
+            "files": names
+        }
+
+        if single_file:
+            tmp = os.path.join(staging, "output")
+            if len(names) == 1:
+                os.replace(os.path.join(staging, names[0]), tmp)
+            else:
+                concatenate([os.path.join(staging, name) for name in names], tmp, fmt)
+            os.replace(tmp, output)
+            manifest["files"] = [os.path.basename(output)]
+        else:
+            with open(os.path.join(staging, MANIFEST), "w") as f:
+                json.dump(manifest, f, indent=2)
+            os.chmod(staging, 0o755)  # mkdtemp cree le repertoire en 0700
+            _replace_directory(staging, output)
+    finally:
+        if os.path.isdir(staging):
+            shutil.rmtree(staging)
+
+    manifest["seconds"] = time.perf_counter() - started
+    return manifest
+
+
+def parse_args(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = argparse.ArgumentParser(description="Generateur de donnees synthetiques de churn")
+    parser.add_argument("--legacy", action="store_true",
+                        help="Generateur d'origine (jeu de reference data/bank_churn.csv) ; "
+                             "mode par defaut sans argument. Seuls --rows, --output et --seed s'appliquent")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--output", default=OUTPUT_PATH,
+                        help="Fichier .csv / .parquet, ou repertoire de partitions")
+    parser.add_argument("--format", choices=FORMATS, help="Format des partitions (deduit de l'extension sinon)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000, help="Lignes par bloc (memoire par processus)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--correlation", type=float, default=0.0, help="Force des correlations entre features (0 a 1)")
+    parser.add_argument("--churn-rate", type=float, default=0.25, help="Taux de churn moyen vise")
+    args = parser.parse_args(argv)
+    # Sans argument : le jeu de reference, pas un nouveau jeu a la meme place
+    args.legacy = args.legacy or not argv
+    if args.legacy and (args.format == "parquet" or args.correlation or args.churn_rate != 0.25
+                        or os.path.splitext(args.output)[1].lower() == ".parquet"):
+        parser.error("--legacy ne produit qu'un CSV, sans --correlation ni --churn-rate")
+    if args.rows < 1 or args.chunk_rows < 1:
+        parser.error("--rows et --chunk-rows doivent etre >= 1")
+    if not 0 <= args.correlation <= 1:
+        parser.error("--correlation doit etre dans [0, 1]")
+    if not 0 < args.churn_rate < 1:
+        parser.error("--churn-rate doit etre dans ]0, 1[")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.legacy:
+        df = generate_legacy(args.rows, args.output, args.seed)
+        print(f"Dataset cree : {len(df)} lignes")
+        print(f"Taux de churn : {df['Exited'].mean():.2%}")
+        return
+    manifest = generate(
+        args.rows, args.output, args.format, max(1, args.workers), args.chunk_rows,
+        args.seed, args.correlation, args.churn_rate
+    )
+    print(f"Dataset cree : {manifest['rows']} lignes ({args.output}, {manifest['chunks']} blocs)")
+    print(f"Taux de churn : {manifest['churn_rate']:.2%}")
+    print(f"Debit : {manifest['rows'] / manifest['seconds']:,.0f} lignes/s")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
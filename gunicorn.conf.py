@@ -0,0 +1,69 @@
+"""Configuration gunicorn : mode de production pre-fork.
+
+Le processus maitre importe l'application et charge le modele une seule
+fois (preload_app + when_ready), puis forke les workers uvicorn : les
+arbres sont partages en copie sur ecriture. gc.freeze() sort ces objets
+du ramasse-miettes pour que les workers ne salissent pas les pages
+partagees en les parcourant.
+
+Lancement :
+    gunicorn app.main:app -c gunicorn.conf.py
+
+Variables : WEB_CONCURRENCY (workers, defaut = CPU disponibles), PORT,
+GUNICORN_MAX_REQUESTS / _JITTER (recyclage), GUNICORN_GRACEFUL_TIMEOUT,
+GUNICORN_TIMEOUT, READINESS_DIR (fichiers de disponibilite par worker),
+METRICS_DIR (instantanes des metriques par worker, agreges par /metrics).
+"""
+import gc
+import os
+
+# Chaque worker signale sa disponibilite par un fichier <dir>/worker-<pid>.ready
+os.environ.setdefault("READINESS_DIR", "/tmp/bank-churn-ready")
+os.environ.setdefault("METRICS_DIR", "/tmp/bank-churn-metrics")
+
+
+def _cpu_count() -> int:
+    # CPU reellement attribues au conteneur (affinite), pas ceux de l'hote
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", _cpu_count()))
+preload_app = True
+
+# Recyclage progressif des workers (fuites memoire) ; la gigue evite que
+# tous les workers redemarrent en meme temps
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    """Maitre pret : charge le modele avant le fork des workers"""
+    from app import main
+    from app.metrics import reset_directory
+
+    reset_directory(os.environ["METRICS_DIR"])
+    main.preload_model()
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Modèle préchargé (version {main.model_version}, moteur {main.engine})")
+
+
+def child_exit(server, worker):
+    """Retire le fichier de disponibilite d'un worker termine (y compris
+    tue ou recycle) et archive ses compteurs ; appele dans le maitre"""
+    from app import main
+    from app.metrics import archive_worker
+
+    main.clear_ready(worker.pid)
+    archive_worker(os.environ["METRICS_DIR"], worker.pid)
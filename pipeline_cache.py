@@ -0,0 +1,142 @@
+"""Cache sur disque des etapes d'entrainement, adresse par contenu.
+
+Chaque etape (chargement, split, entrainement, evaluation, figures,
+enregistrement) est identifiee par le hachage de :
+- son code (source de la fonction et des fonctions qu'elle utilise) ;
+- ses parametres (JSON canonique) ;
+- les cles des etapes dont elle depend (la cle du chargement contient
+  l'empreinte du fichier de donnees).
+
+Un resultat est stocke une fois (`<racine>/<etape>/<cle>.joblib`, ecriture
+atomique) et relu tant qu'aucune de ces entrees ne change : une
+relance a l'identique ne recalcule rien, un changement d'hyperparametre
+ne recalcule qu'a partir de l'entrainement.
+"""
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import joblib
+
+CACHE_DIR = ".pipeline_cache"
+
+# A incrementer si le format des entrees en cache change
+CACHE_FORMAT = 1
+
+
+def file_digest(path: str) -> str:
+    """Empreinte SHA-256 du contenu d'un fichier"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_digest(functions: Iterable[Callable]) -> str:
+    """Empreinte du code source des fonctions (ou classes) donnees"""
+    digest = hashlib.sha256()
+    for fn in functions:
+        try:
+            source = inspect.getsource(fn)
+        except (OSError, TypeError):
+            # Code sans source (builtin, extension) : son nom qualifie
+            source = f"{getattr(fn, '__module__', '')}.{getattr(fn, '__qualname__', repr(fn))}"
+        digest.update(source.encode())
+    return digest.hexdigest()
+
+
+@dataclass
+class StageResult:
+    name: str
+    key: str
+    value: Any
+    hit: bool
+
+
+class StageCache:
+    """Execute les etapes ou relit leur resultat.
+
+    `enabled=False` execute toujours (cles calculees quand meme, pour que
+    les etapes suivantes restent chainees).
+    """
+
+    def __init__(self, root: str = CACHE_DIR, enabled: bool = True, environment: Optional[Dict[str, str]] = None):
+        self.root = root
+        self.enabled = enabled
+        # Versions des bibliotheques : un pickle n'est pas relu par une autre version
+        self.environment = environment or {}
+        self.results: List[StageResult] = []
+
+    def key(self, name: str, code: Iterable[Callable], params: Optional[dict] = None, upstream: Iterable[StageResult] = ()) -> str:
+        payload = json.dumps({
+            "format": CACHE_FORMAT,
+            "stage": name,
+            "code": code_digest(code),
+            "params": params or {},
+            "upstream": [stage.key for stage in upstream],
+            "environment": self.environment
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def path(self, name: str, key: str) -> str:
+        return os.path.join(self.root, name, f"{key}.joblib")
+
+    def run(
+        self,
+        name: str,
+        fn: Callable,
+        *args,
+        params: Optional[dict] = None,
+        upstream: Iterable[StageResult] = (),
+        code: Iterable[Callable] = (),
+        validate: Optional[Callable[[Any], bool]] = None,
+        **kwargs
+    ) -> StageResult:
+        """Resultat de `fn(*args, **kwargs)`, relu du cache si la cle est connue.
+
+        `params` et `upstream` doivent decrire tout ce dont le resultat
+        depend : `args` ne sont pas haches. `code` ajoute les fonctions
+        appelees par `fn` a l'empreinte du code. `validate(valeur)` peut
+        refuser une entree dont les effets de bord ont disparu (fichier
+        supprime...).
+        """
+        upstream = list(upstream)
+        key = self.key(name, [fn, *code], params, upstream)
+        path = self.path(name, key)
+        if self.enabled and os.path.exists(path):
+            try:
+                value = joblib.load(path)
+            except Exception:
+                value = None  # entree illisible : recalculee
+            else:
+                if validate is None or validate(value):
+                    return self._record(StageResult(name, key, value, hit=True))
+
+        value = fn(*args, **kwargs)
+        if self.enabled:
+            self._store(path, value)
+        return self._record(StageResult(name, key, value, hit=False))
+
+    def _record(self, result: StageResult) -> StageResult:
+        self.results.append(result)
+        status = "cache" if result.hit else "calcule"
+        print(f"[etape] {result.name:<9} {status:<8} {result.key[:12]}")
+        return result
+
+    def _store(self, path: str, value):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            joblib.dump(value, tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
@@ -4,6 +4,7 @@ import pandas as pd
 import json
 from typing import Dict, Any
 import os
+import time
 from datetime import datetime
 
 # Page configuration
@@ -264,55 +265,56 @@ with tab2:
     
     if uploaded_file is not None:
         st.markdown("### 📋 Preview")
-        df = pd.read_csv(uploaded_file)
-        st.dataframe(df.head(10), use_container_width=True)
+        df = pd.read_csv(uploaded_file, nrows=10)
+        st.dataframe(df, use_container_width=True)
+        uploaded_file.seek(0)
         
         if st.button("🚀 Run Batch Prediction", use_container_width=True):
             try:
-                headers = {}
+                headers = {"Content-Type": "text/csv"}
                 if st.session_state.api_key:
                     headers["X-API-Key"] = st.session_state.api_key
                 
-                # Convert CSV to JSON format
-                records = df.to_dict(orient='records')
+                def read_blocks(f, size=1 << 20):
+                    while True:
+                        block = f.read(size)
+                        if not block:
+                            return
+                        yield block
                 
                 with st.spinner("⏳ Processing predictions..."):
-                    all_predictions = []
-                    progress_bar = st.progress(0)
+                    # Envoi du fichier brut en flux : /predict/stream score par blocs
+                    response = requests.post(
+                        f"{st.session_state.backend_url}/predict/stream",
+                        data=read_blocks(uploaded_file),
+                        headers=headers,
+                        stream=True,
+                        timeout=60
+                    )
+                    response.raise_for_status()
                     
-                    for idx, record in enumerate(records):
-                        try:
-                            payload = {
-                                "CreditScore": float(record.get("CreditScore", 0)),
-                                "Age": float(record.get("Age", 0)),
-                                "Tenure": float(record.get("Tenure", 0)),
-                                "Balance": float(record.get("Balance", 0)),
-                                "NumOfProducts": float(record.get("NumOfProducts", 1)),
-                                "HasCrCard": float(record.get("HasCrCard", 0)),
-                                "IsActiveMember": float(record.get("IsActiveMember", 0)),
-                                "EstimatedSalary": float(record.get("EstimatedSalary", 0)),
-                                "Geography_Germany": float(record.get("Geography_Germany", 0)),
-                                "Geography_Spain": float(record.get("Geography_Spain", 0)),
-                            }
-                            
-                            response = requests.post(
-                                f"{st.session_state.backend_url}/predict",
-                                json=payload,
-                                headers=headers,
-                                timeout=10
-                            )
-                            
-                            if response.status_code == 200:
-                                result = response.json()
-                                all_predictions.append({
-                                    **record,
-                                    "Churn_Probability": result.get("churn_probability", 0),
-                                    "Prediction": "Churn" if result.get("churn_prediction") == 1 else "No Churn"
-                                })
-                        except Exception as e:
-                            st.warning(f"Row {idx} failed: {str(e)}")
-                        
-                        progress_bar.progress((idx + 1) / len(records))
+                    all_predictions = []
+                    summary = {}
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        result = json.loads(line)
+                        if "summary" in result:
+                            summary = result["summary"]
+                        elif "errors" in result:
+                            st.warning(f"Row {result['index']} failed: {result['errors']}")
+                        else:
+                            all_predictions.append({
+                                "Row": result["index"],
+                                "Churn_Probability": result["churn_probability"],
+                                "Prediction": "Churn" if result["prediction"] == 1 else "No Churn",
+                                "Risk_Level": result["risk_level"]
+                            })
+                
+                if summary.get("error"):
+                    st.error(f"❌ {summary['error']}")
+                elif summary:
+                    st.caption(f"{summary['rows']} rows in {summary['elapsed_seconds']}s ({summary['rows_per_sec']} rows/s)")
                 
                 # Display results
                 st.markdown("### 📊 Prediction Results")
@@ -433,14 +435,32 @@ with tab3:
                 if st.session_state.api_key:
                     headers["X-API-Key"] = st.session_state.api_key
                 
+                # Job asynchrone : soumission puis suivi, sans bloquer l'API
                 response = requests.post(
-                    f"{st.session_state.backend_url}/drift/check?threshold={threshold}",
+                    f"{st.session_state.backend_url}/drift/check?threshold={threshold}&async_job=true",
                     headers=headers,
                     timeout=10
                 )
-                
-                if response.status_code == 200:
+                drift_data, error = None, f"{response.status_code} - {response.text}"
+                if response.status_code == 202:
+                    job = response.json()
+                    with st.spinner("Drift check running..."):
+                        deadline = time.time() + 300
+                        while job["status"] in ("queued", "running") and time.time() < deadline:
+                            time.sleep(1)
+                            job = requests.get(
+                                f"{st.session_state.backend_url}/drift/jobs/{job['job_id']}",
+                                headers=headers,
+                                timeout=10
+                            ).json()
+                    if job["status"] == "succeeded":
+                        drift_data = job["result"]
+                    else:
+                        error = job.get("error") or f"Job {job['status']}"
+                elif response.status_code == 200:
                     drift_data = response.json()
+                
+                if drift_data is not None:
                     
                     features_drifted = drift_data.get("features_drifted", 0)
                     features_analyzed = drift_data.get("features_analyzed", 1)
@@ -473,7 +493,7 @@ with tab3:
                     with col_drift2:
                         st.metric("Features with Drift", features_drifted)
                 else:
-                    st.error(f"Error: {response.status_code} - {response.text}")
+                    st.error(f"Error: {error}")
             
             except Exception as e:
                 st.error(f"❌ Error checking drift: {str(e)}")
@@ -2,12 +2,14 @@
 import sys
 import os
 from unittest.mock import patch
+import json
 import numpy as np
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from fastapi.testclient import TestClient
 from app.main import app
+import app.main as app_main
 
 client = TestClient(app)
 
@@ -57,4 +59,189 @@ def test_drift_check():
 def test_unauthorized_access():
     """Test qu'un accès sans clé API est refusé"""
     response = client.post("/predict", json=TEST_CUSTOMER)
-    assert response.status_code == 403
\ No newline at end of file
+    assert response.status_code == 403
+
+def _mock_proba(X):
+    """predict_proba factice : une ligne de sortie par ligne d'entree"""
+    p = np.full(len(X), 0.8)
+    return np.column_stack([1 - p, p])
+
+def test_predict_batch_with_mock():
+    """Test /predict/batch : un seul predict_proba et erreurs par ligne"""
+    invalid = dict(TEST_CUSTOMER, Age=5)
+    with patch('app.main.model') as mock_model:
+        mock_model.predict_proba.side_effect = _mock_proba
+
+        response = client.post(
+            "/predict/batch",
+            json=[TEST_CUSTOMER, invalid, TEST_CUSTOMER],
+            headers=HEADERS
+        )
+        assert response.status_code == 200
+        body = response.json()
+        assert body["n_rows"] == 3
+        assert body["n_scored"] == 2
+        assert body["predictions"][0]["risk_level"] == "High"
+        assert body["predictions"][1] is None
+        assert body["errors"][0]["index"] == 1
+        assert mock_model.predict_proba.call_count == 1
+        assert mock_model.predict_proba.call_args[0][0].shape == (2, 10)
+
+def test_predict_batch_without_response_validation():
+    """Test /predict/batch avec validate_response=false"""
+    with patch('app.main.model') as mock_model:
+        mock_model.predict_proba.side_effect = _mock_proba
+
+        response = client.post(
+            "/predict/batch?validate_response=false",
+            json=[TEST_CUSTOMER] * 5,
+            headers=HEADERS
+        )
+        assert response.status_code == 200
+        assert response.json()["n_scored"] == 5
+
+def test_predict_batch_non_object_row():
+    """Test /predict/batch : une ligne non-objet est rejetee seule"""
+    with patch('app.main.model') as mock_model:
+        mock_model.predict_proba.side_effect = _mock_proba
+
+        response = client.post("/predict/batch", json=[1, TEST_CUSTOMER], headers=HEADERS)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["n_scored"] == 1
+        assert body["errors"][0]["index"] == 0
+
+def test_predict_batch_openapi_schema():
+    """Test que /docs decrit le batch comme une liste de CustomerFeatures"""
+    schema = client.get("/openapi.json").json()
+    body = schema["paths"]["/predict/batch"]["post"]["requestBody"]
+    items = body["content"]["application/json"]["schema"]["items"]
+    assert items["$ref"] == "#/components/schemas/CustomerFeatures"
+
+def _csv_body(*rows):
+    header = ",".join(TEST_CUSTOMER)
+    return "\n".join([header] + [",".join(str(v) for v in r.values()) for r in rows]) + "\n"
+
+def test_predict_stream_csv_with_mock():
+    """Test /predict/stream : CSV en entree, NDJSON + resume en sortie"""
+    bad = dict(TEST_CUSTOMER, CreditScore=9999)
+    body = _csv_body(TEST_CUSTOMER, bad, TEST_CUSTOMER)
+
+    with patch('app.main.model') as mock_model:
+        mock_model.predict_proba.side_effect = _mock_proba
+
+        response = client.post(
+            "/predict/stream?chunk_rows=2",
+            content=body,
+            headers={**HEADERS, "Content-Type": "text/csv"}
+        )
+        assert response.status_code == 200
+        lines = [json.loads(l) for l in response.text.splitlines()]
+        assert lines[0]["churn_probability"] == 0.8
+        assert lines[1]["errors"][0]["loc"] == ["CreditScore"]
+        assert lines[-1]["summary"]["rows"] == 3
+        assert lines[-1]["summary"]["scored"] == 2
+        assert "rows_per_sec" in lines[-1]["summary"]
+
+def test_predict_stream_ndjson_with_mock():
+    """Test /predict/stream avec un corps NDJSON"""
+    body = "\n".join(json.dumps(TEST_CUSTOMER) for _ in range(3))
+
+    with patch('app.main.model') as mock_model:
+        mock_model.predict_proba.side_effect = _mock_proba
+
+        response = client.post(
+            "/predict/stream",
+            content=body,
+            headers={**HEADERS, "Content-Type": "application/x-ndjson"}
+        )
+        assert response.status_code == 200
+        lines = [json.loads(l) for l in response.text.splitlines()]
+        assert [l["index"] for l in lines[:-1]] == [0, 1, 2]
+        assert mock_model.predict_proba.call_count == 1
+
+def test_predict_stream_errors_in_trailer():
+    """Test /predict/stream : une erreur de modele finit dans le resume"""
+    with patch('app.main.model') as mock_model:
+        mock_model.predict_proba.side_effect = RuntimeError("boom")
+
+        response = client.post(
+            "/predict/stream",
+            content=_csv_body(TEST_CUSTOMER),
+            headers={**HEADERS, "Content-Type": "text/csv"}
+        )
+        assert response.status_code == 200
+        assert json.loads(response.text.splitlines()[-1])["summary"]["error"] == "boom"
+
+def test_predict_stream_rejects_multipart():
+    """Test /predict/stream : un upload multipart est refuse (415)"""
+    with patch('app.main.model'):
+        response = client.post(
+            "/predict/stream",
+            files={"file": ("clients.csv", _csv_body(TEST_CUSTOMER), "text/csv")},
+            headers=HEADERS
+        )
+        assert response.status_code == 415
+
+def test_predict_with_microbatching():
+    """Test /predict avec le micro-batching actif (startup declenche)"""
+    with patch('app.main.MICROBATCH_ENABLED', True), TestClient(app) as batching_client:
+        # Le modele est remplace apres le startup (qui tente MODEL_PATH)
+        with patch('app.main.model') as mock_model:
+            app_main.prediction_cache.clear()
+            mock_model.predict_proba.side_effect = _mock_proba
+            response = batching_client.post("/predict", json=TEST_CUSTOMER, headers=HEADERS)
+            assert response.status_code == 200
+            assert response.json()["churn_probability"] == 0.8
+
+            stats = batching_client.get("/batching/stats", headers=HEADERS).json()
+            assert stats["enabled"] is True
+            assert stats["rows"] == 1
+
+def test_predict_with_sqlite_cache_off_event_loop(tmp_path):
+    """Test /predict avec le cache SQLite : get/put executes hors de la boucle"""
+    import asyncio
+    from app.cache import SQLitePredictionCache
+
+    on_loop = []
+
+    class RecordingCache(SQLitePredictionCache):
+        def _connect(self):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return super()._connect()
+
+    cache = RecordingCache(str(tmp_path / "cache.sqlite"), maxsize=10)
+    on_loop.clear()  # connexion initiale (constructeur)
+    with patch('app.main.model') as mock_model, patch('app.main.prediction_cache', cache):
+        mock_model.predict_proba.side_effect = _mock_proba
+        for _ in range(2):
+            response = client.post("/predict", json=TEST_CUSTOMER, headers=HEADERS)
+            assert response.status_code == 200
+            assert response.json()["churn_probability"] == 0.8
+        assert mock_model.predict_proba.call_count == 1
+
+    assert cache.stats()["hits"] == 1 and len(cache) == 1
+    assert on_loop and not any(on_loop)
+
+def test_predict_cache_hit_and_invalidation():
+    """Test du cache : 2e appel servi par le cache, vide au changement de modele"""
+    with patch('app.main.model') as mock_model:
+        app_main.prediction_cache.clear()
+        mock_model.predict_proba.side_effect = _mock_proba
+
+        for _ in range(2):
+            response = client.post("/predict", json=TEST_CUSTOMER, headers=HEADERS)
+            assert response.status_code == 200
+        assert mock_model.predict_proba.call_count == 1
+
+        stats = client.get("/cache/stats", headers=HEADERS).json()
+        assert stats["hits"] >= 1
+        assert stats["size"] == 1
+
+        app_main.set_model(mock_model, "v2")
+        assert len(app_main.prediction_cache) == 0
+        app_main.set_model(None, None)
@@ -0,0 +1,112 @@
+# tests/test_batching.py
+import sys
+import os
+import asyncio
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.batching import MicroBatcher, BatcherOverloaded
+
+
+def test_concurrent_requests_are_coalesced():
+    """Les soumissions concurrentes sont scorees en peu d'appels"""
+    calls = []
+
+    def score(rows):
+        calls.append(len(rows))
+        return [row[0] / 100 for row in rows]
+
+    async def scenario():
+        batcher = MicroBatcher(score, max_batch_size=16, max_wait_ms=20)
+        await batcher.start()
+        try:
+            return await asyncio.gather(*[batcher.submit((i, 0)) for i in range(40)]), batcher.stats()
+        finally:
+            await batcher.stop()
+
+    results, stats = asyncio.run(scenario())
+    assert results == [i / 100 for i in range(40)]
+    assert max(calls) == 16
+    assert len(calls) < 40
+    assert stats["rows"] == 40
+    assert stats["batches"] == len(calls)
+    assert stats["queue_depth"] == 0
+
+
+def test_score_error_is_propagated():
+    """Une erreur de scoring est renvoyee a chaque requete du lot"""
+    def score(rows):
+        raise RuntimeError("boom")
+
+    async def scenario():
+        batcher = MicroBatcher(score, max_wait_ms=1)
+        await batcher.start()
+        try:
+            await batcher.submit((1,))
+        finally:
+            await batcher.stop()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scenario())
+
+
+def test_full_queue_rejects():
+    """Une file pleine leve BatcherOverloaded au lieu de bloquer"""
+    async def scenario():
+        batcher = MicroBatcher(lambda rows: [0.0] * len(rows), max_queue_size=1)
+        await batcher.start()
+        batcher._queue.put_nowait(((0,), asyncio.get_running_loop().create_future(), 0.0))
+        try:
+            await batcher.submit((1,))
+        finally:
+            await batcher.stop()
+
+    with pytest.raises(BatcherOverloaded):
+        asyncio.run(scenario())
+
+
+def test_stop_resolves_pending_requests():
+    """Les requetes en file ou dans le lot en cours sont servies a l'arret"""
+    import threading
+    release = threading.Event()
+
+    def score(rows):
+        release.wait(5)
+        return [row[0] for row in rows]
+
+    async def scenario():
+        batcher = MicroBatcher(score, max_batch_size=2, max_wait_ms=1)
+        await batcher.start()
+        tasks = [asyncio.create_task(batcher.submit((i,))) for i in range(5)]
+        await asyncio.sleep(0.05)  # premier lot en cours de scoring, le reste en file
+        stopping = asyncio.create_task(batcher.stop())
+        await asyncio.sleep(0.05)
+        release.set()
+        await stopping
+        return await asyncio.wait_for(asyncio.gather(*tasks), 5)
+
+    assert asyncio.run(scenario()) == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_stop_propagates_scoring_error_to_pending_requests():
+    import threading
+    release = threading.Event()
+
+    def score(rows):
+        release.wait(5)
+        raise ZeroDivisionError("modele indisponible")
+
+    async def scenario():
+        batcher = MicroBatcher(score, max_batch_size=1, max_wait_ms=1)
+        await batcher.start()
+        tasks = [asyncio.create_task(batcher.submit((i,))) for i in range(3)]
+        await asyncio.sleep(0.05)
+        stopping = asyncio.create_task(batcher.stop())
+        await asyncio.sleep(0.05)
+        release.set()
+        await stopping
+        return await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 5)
+
+    errors = asyncio.run(scenario())
+    assert len(errors) == 3 and all(isinstance(e, ZeroDivisionError) for e in errors)
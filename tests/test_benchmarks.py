@@ -0,0 +1,41 @@
+# tests/test_benchmarks.py
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import compare, latency_metrics, metric
+
+
+def _results(**metrics):
+    return {"metrics": metrics}
+
+
+def test_latency_metrics_are_percentiles_in_requested_unit():
+    results = latency_metrics("predict", [0.001] * 98 + [0.010, 0.020], unit="ms")
+    assert results["predict.p50_ms"]["value"] == 1.0
+    assert results["predict.p99_ms"]["value"] > 10.0
+    assert results["predict.p50_ms"]["better"] == "lower"
+
+
+def test_compare_flags_regressions_in_the_right_direction():
+    baseline = _results(
+        latency=metric(100, "us"),
+        throughput=metric(1000, "rows/s", "higher"),
+        stable=metric(50, "ms"),
+        errors=metric(0, "ratio")
+    )
+    current = _results(
+        latency=metric(130, "us"),
+        throughput=metric(1500, "rows/s", "higher"),
+        stable=metric(52, "ms"),
+        errors=metric(0.02, "ratio"),
+        new_metric=metric(1, "us")
+    )
+    status = {row["metric"]: row["status"] for row in compare(baseline, current, tolerance=0.1)}
+    assert status == {
+        "latency": "regression",
+        "throughput": "improvement",
+        "stable": "ok",
+        "errors": "regression"
+    }
@@ -0,0 +1,107 @@
+# tests/test_cache.py
+import sys
+import os
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.cache import PredictionCache, SQLitePredictionCache, build_cache_from_env
+
+
+def test_lru_eviction_and_stats():
+    """LRU : l'entree la moins recemment lue est evincee"""
+    cache = PredictionCache(maxsize=2, policy="lru")
+    cache.put(("v1", (1,)), "a")
+    cache.put(("v1", (2,)), "b")
+    assert cache.get(("v1", (1,))) == "a"
+    cache.put(("v1", (3,)), "c")
+
+    assert cache.get(("v1", (2,))) is None
+    assert cache.get(("v1", (1,))) == "a"
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["size"] == 2
+
+
+def test_lfu_eviction():
+    """LFU : l'entree la moins souvent lue est evincee"""
+    cache = PredictionCache(maxsize=2, policy="lfu")
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_expiration():
+    """Les entrees expirent apres le TTL"""
+    cache = PredictionCache(maxsize=10, ttl=5)
+    with patch("app.cache.time.monotonic", return_value=100.0):
+        cache.put("k", "v")
+    with patch("app.cache.time.monotonic", return_value=104.0):
+        assert cache.get("k") == "v"
+    with patch("app.cache.time.monotonic", return_value=106.0):
+        assert cache.get("k") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_model_version_is_part_of_key():
+    """Une meme ligne n'est pas partagee entre deux versions de modele"""
+    cache = PredictionCache()
+    cache.put(("v1", (1, 2)), "old")
+    assert cache.get(("v2", (1, 2))) is None
+
+
+def test_disabled_cache():
+    cache = PredictionCache(maxsize=0)
+    cache.put("k", "v")
+    assert cache.get("k") is None
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    """Deux instances (= deux workers) partagent les memes entrees"""
+    path = str(tmp_path / "cache.sqlite")
+    worker_a = SQLitePredictionCache(path, maxsize=100)
+    worker_b = SQLitePredictionCache(path, maxsize=100)
+
+    value = {"churn_probability": 0.8, "prediction": 1, "risk_level": "High"}
+    worker_a.put(("v1", (650, 35.0)), value)
+    assert worker_b.get(("v1", (650.0, 35))) == value
+    assert worker_b.get(("v2", (650, 35))) is None
+    assert worker_b.stats()["hit_ratio"] == 0.5
+
+    worker_b.clear()
+    assert worker_a.get(("v1", (650, 35))) is None
+
+
+def test_sqlite_cache_size_limit(tmp_path):
+    """L'eviction ramene le cache a maxsize"""
+    cache = SQLitePredictionCache(str(tmp_path / "cache.sqlite"), maxsize=10, check_every=5)
+    for i in range(30):
+        cache.put(("v1", (i,)), {"p": i})
+    assert len(cache) <= 10
+    assert cache.get(("v1", (29,))) == {"p": 29}
+    assert cache.stats()["evictions"] >= 20
+
+
+def test_sqlite_cache_ttl(tmp_path):
+    cache = SQLitePredictionCache(str(tmp_path / "cache.sqlite"), ttl=5)
+    with patch("app.cache.time.time", return_value=1000.0):
+        cache.put(("v1", (1,)), 1)
+    with patch("app.cache.time.time", return_value=1006.0):
+        assert cache.get(("v1", (1,))) is None
+
+
+def test_build_cache_from_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("PREDICTION_CACHE_BACKEND", "sqlite")
+    monkeypatch.setenv("PREDICTION_CACHE_PATH", str(tmp_path / "c.sqlite"))
+    monkeypatch.setenv("PREDICTION_CACHE_SIZE", "42")
+    cache = build_cache_from_env()
+    assert isinstance(cache, SQLitePredictionCache)
+    assert cache.maxsize == 42
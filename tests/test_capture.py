@@ -0,0 +1,114 @@
+# tests/test_capture.py
+import sys
+import os
+import numpy as np
+import pytest
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from app.capture import RECORD_DTYPE, TrafficCapture
+from app.drift_detect import CaptureDriftMonitor
+from app.main import app
+
+client = TestClient(app)
+HEADERS = {"X-API-Key": os.getenv("API_KEY")}
+
+ROW = (650, 35, 5, 50000.0, 2, 1, 1, 75000.0, 0, 1)
+REFERENCE = os.path.join(os.path.dirname(__file__), "..", "data", "bank_churn.csv")
+
+
+def test_records_are_flushed_in_batches(tmp_path):
+    capture = TrafficCapture(str(tmp_path))
+    for i in range(10):
+        capture.record(ROW, i / 10)
+    assert capture.stats()["queue_depth"] == 10
+    assert capture.flush() == 10
+
+    frame = capture.read()
+    assert len(frame) == 10
+    assert frame["Balance"].tolist() == [50000.0] * 10
+    assert frame["churn_probability"].iloc[-1] == pytest.approx(0.9)
+
+
+def test_disk_usage_is_bounded_by_rotation(tmp_path):
+    capture = TrafficCapture(str(tmp_path), max_segment_bytes=100 * RECORD_DTYPE.itemsize, max_segments=3)
+    for _ in range(5):
+        capture.record_many([ROW] * 120, [0.5] * 120)
+        capture.flush()
+    stats = capture.stats()
+    assert stats["segments"] == 3
+    assert stats["disk_bytes"] <= stats["max_disk_bytes"]
+    assert len(capture.read()) == 300
+
+
+def test_rotation_keeps_other_live_workers_current_segment(tmp_path):
+    """Seuls les segments de ce processus ou de workers morts sont supprimes"""
+    import subprocess
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    live = os.getppid()
+    item = RECORD_DTYPE.itemsize
+    for name in (f"capture-{1:020d}-{dead.pid}.bin", f"capture-{2:020d}-{live}.bin"):
+        (tmp_path / name).write_bytes(b"\0" * item)
+
+    capture = TrafficCapture(str(tmp_path), max_segment_bytes=10 * item, max_segments=3)
+    for _ in range(4):
+        capture.record_many([ROW] * 10, [0.5] * 10)
+        capture.flush()
+
+    names = [os.path.basename(p) for p in capture.segments()]
+    assert f"capture-{2:020d}-{live}.bin" in names
+    assert f"capture-{1:020d}-{dead.pid}.bin" not in names
+    assert len(names) == 3 and capture._segment in capture.segments()
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    capture = TrafficCapture(str(tmp_path), max_queue=5)
+    capture.record_many([ROW] * 8, [0.5] * 8)
+    assert capture.captured == 5
+    assert capture.dropped == 3
+
+
+def test_drift_monitor_follows_capture_segments(tmp_path):
+    """Comptes incrementaux par segment ; un segment supprime sort de la fenetre"""
+    capture = TrafficCapture(str(tmp_path), max_segment_bytes=50 * RECORD_DTYPE.itemsize, max_segments=2)
+    monitor = CaptureDriftMonitor(REFERENCE, capture)
+    capture.record_many([ROW] * 50, [0.5] * 50)
+    assert monitor.refresh() == 50
+    assert monitor.refresh() == 0
+    assert monitor.histogram.rows == 50
+
+    capture.record_many([ROW] * 100, [0.5] * 100)
+    assert monitor.refresh() == 100
+    # 3 segments ecrits, max 2 conserves
+    assert monitor.histogram.rows == 100
+    assert monitor.results()["Age"]["drift_detected"]
+
+
+def test_predict_feeds_drift_check(tmp_path):
+    capture = TrafficCapture(str(tmp_path))
+    mock_model = MagicMock()
+    mock_model.predict_proba.side_effect = lambda X: np.tile([0.7, 0.3], (len(X), 1))
+    payload = dict(zip(
+        ["CreditScore", "Age", "Tenure", "Balance", "NumOfProducts", "HasCrCard",
+         "IsActiveMember", "EstimatedSalary", "Geography_Germany", "Geography_Spain"],
+        ROW
+    ))
+    with patch('app.main.model', mock_model), patch('app.main.traffic_capture', capture):
+        for _ in range(3):
+            assert client.post("/predict", json=payload, headers=HEADERS).status_code == 200
+        assert capture.captured == 3
+
+        response = client.post("/drift/check?threshold=0.05", headers=HEADERS)
+        assert response.status_code == 200
+        assert response.json()["source"] == "capture"
+        assert client.post("/drift/check?source=file", headers=HEADERS).json()["source"] == "file"
+        assert client.get("/capture/stats", headers=HEADERS).json()["written"] == 3
+
+
+def test_capture_source_requires_capture():
+    with patch('app.main.traffic_capture', None):
+        response = client.post("/drift/check?source=capture", headers=HEADERS)
+    assert response.status_code == 409
@@ -0,0 +1,85 @@
+# tests/test_drift_data_gen.py
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.drift_windows import WindowedDrift
+from drift_data_gen import SCENARIOS, DriftScenario, apply_scenario, generate_scenario, parse_args
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+REFERENCE = os.path.join(ROOT, "data", "bank_churn.csv")
+DAY = 86400.0
+
+
+def test_intensity_profiles():
+    progress = np.linspace(0, 1, 9, endpoint=False)
+    elapsed = progress * DAY
+    assert DriftScenario(profile="sudden", onset=0.5).intensity(progress, elapsed).tolist() == [0] * 5 + [1] * 4
+    gradual = DriftScenario(profile="gradual", onset=0.25).intensity(progress, elapsed)
+    assert gradual[:3].tolist() == [0, 0, 0] and np.all(np.diff(gradual) >= 0) and gradual[-1] > 0.8
+    recurring = DriftScenario(profile="recurring", period=DAY / 2).intensity(progress, elapsed)
+    assert recurring.tolist() == [0, 0, 0, 1, 1, 0, 0, 1, 1]
+
+
+def test_proportion_shift_reaches_target():
+    reference = pd.read_csv(REFERENCE)
+    columns = list(reference.columns)
+    values = reference.to_numpy(dtype=np.float64)
+    mean, std = values.mean(axis=0), values.std(axis=0)
+    scenario = DriftScenario(proportions={"Geography_Germany": 0.8, "HasCrCard": 0.2})
+    rng = np.random.default_rng(0)
+
+    shifted = apply_scenario(values.copy(), columns, np.ones(len(values)), scenario, mean, std, rng)
+    assert abs(shifted[:, columns.index("Geography_Germany")].mean() - 0.8) < 0.02
+    assert abs(shifted[:, columns.index("HasCrCard")].mean() - 0.2) < 0.02
+    untouched = apply_scenario(values.copy(), columns, np.zeros(len(values)), scenario, mean, std, rng)
+    assert np.array_equal(untouched, values)
+
+
+def test_sudden_stream_is_caught_by_windowed_drift(tmp_path):
+    output = str(tmp_path / "stream.csv")
+    summary = generate_scenario(
+        SCENARIOS["sudden"], 120_000, output, REFERENCE, duration=DAY, start=0.0, chunk_rows=25_000
+    )
+    assert summary["rows"] == 120_000 and abs(summary["mean_intensity"] - 0.5) < 1e-3
+
+    windows = WindowedDrift(REFERENCE, bucket_seconds=600, retention_seconds=2 * DAY)
+    for chunk in pd.read_csv(output, chunksize=30_000):
+        assert chunk["timestamp"].is_monotonic_increasing
+        windows.update(chunk["timestamp"].to_numpy(), {c: chunk[c].to_numpy() for c in windows.columns})
+
+    before = windows.window(DAY / 4, now=DAY / 2 - 1)["features"]
+    after = windows.window(DAY / 4, now=DAY)["features"]
+    for col in ("Age", "Balance", "Geography_Germany"):
+        assert not before[col]["psi_alert"]
+        assert after[col]["drift_detected"]
+    assert not after["Tenure"]["drift_detected"]
+
+
+def test_covariance_scenario_changes_correlation_not_marginals(tmp_path):
+    output = str(tmp_path / "covariance.parquet")
+    generate_scenario(SCENARIOS["covariance"], 40_000, output, REFERENCE, duration=DAY, start=0.0, chunk_rows=15_000)
+    df = pd.read_parquet(output)
+    early, late = df[df.drift_intensity == 0], df[df.drift_intensity == 1]
+
+    assert abs(early["Balance"].corr(early["EstimatedSalary"])) < 0.05
+    assert late["Balance"].corr(late["EstimatedSalary"]) > 0.7
+    assert late["Age"].corr(late["CreditScore"]) < -0.5
+    assert abs(late["EstimatedSalary"].std() / early["EstimatedSalary"].std() - 1) < 0.05
+
+
+def test_durations_are_parsed_without_importing_app():
+    """Meme syntaxe que app.drift_windows, mais le script reste autonome (etape data du Dockerfile)"""
+    from app.drift_windows import parse_duration
+    import subprocess
+
+    args = parse_args(["--scenario", "recurring", "--duration", "6h", "--period", "1.5d"])
+    assert (args.duration, args.period) == (parse_duration("6h"), parse_duration("1.5d"))
+    assert parse_args([]).duration == 7 * DAY
+
+    code = ("import sys, drift_data_gen; drift_data_gen.parse_args(['--scenario', 'sudden', '--duration', '2h']);"
+            "sys.exit(any(m == 'app' or m.startswith('app.') for m in sys.modules))")
+    assert subprocess.run([sys.executable, "-c", code], cwd=ROOT).returncode == 0
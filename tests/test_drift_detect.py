@@ -0,0 +1,138 @@
+# tests/test_drift_detect.py
+import sys
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.drift_detect import DriftMonitor, detect_drift, dkw_bound, exact_drift_file, sample_columns
+from app.reference_sketch import build_sketch, save_sketch
+
+
+def _frame(n, seed, shift=0.0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "CreditScore": rng.normal(650 + shift, 90, n),
+        "Age": rng.integers(18, 80, n),
+        "HasCrCard": rng.integers(0, 2, n),
+        "Exited": rng.integers(0, 2, n)
+    })
+
+
+@pytest.fixture
+def files(tmp_path):
+    ref, prod = tmp_path / "ref.csv", tmp_path / "prod.csv"
+    _frame(3000, 0).to_csv(ref, index=False)
+    _frame(1500, 1, shift=40).to_csv(prod, index=False)
+    return str(ref), str(prod)
+
+
+def test_binned_matches_exact(files, tmp_path):
+    """Memes decisions que ks_2samp ; statistique exacte sur les features discretes"""
+    ref, prod = files
+    exact = detect_drift(ref, prod, output_dir=str(tmp_path), method="exact")
+    binned = detect_drift(ref, prod, output_dir=str(tmp_path), method="binned")
+    assert set(binned) == set(exact) == {"CreditScore", "Age", "HasCrCard"}
+    for col in exact:
+        assert binned[col]["drift_detected"] == exact[col]["drift_detected"]
+        assert binned[col]["statistic"] == pytest.approx(exact[col]["statistic"], abs=0.005)
+    assert binned["Age"]["statistic"] == pytest.approx(exact["Age"]["statistic"], abs=1e-12)
+    assert binned["CreditScore"]["drift_detected"]
+
+
+def test_monitor_reads_only_appended_rows(files):
+    ref, prod = files
+    monitor = DriftMonitor(ref, prod)
+    assert monitor.refresh() == 1500
+    assert monitor.refresh() == 0
+
+    # Ligne incomplete (ecriture en cours) : ignoree jusqu'a son '\n'
+    extra = _frame(10, 2).to_csv(index=False, header=False)
+    with open(prod, "a") as f:
+        f.write(extra[:-5])
+    assert monitor.refresh() == 9
+    with open(prod, "a") as f:
+        f.write(extra[-5:])
+    assert monitor.refresh() == 1
+    assert monitor.histogram.rows == 1510
+
+
+def test_monitor_resets_on_truncated_file(files):
+    ref, prod = files
+    monitor = DriftMonitor(ref, prod)
+    monitor.refresh()
+    _frame(100, 3).to_csv(prod, index=False)
+    assert monitor.refresh() == 100
+    assert monitor.histogram.rows == 100
+
+
+def test_unknown_method_is_rejected(files, tmp_path):
+    with pytest.raises(ValueError):
+        detect_drift(*files, output_dir=str(tmp_path), method="chi2")
+
+
+def test_sampled_statistic_within_dkw_bound(files, tmp_path):
+    ref, prod = files
+    _frame(20000, 5, shift=40).to_csv(prod, index=False)
+    full = exact_drift_file(ref, prod)
+    sampled = exact_drift_file(ref, prod, sample_size=2000, seed=1)
+    for col, result in sampled.items():
+        assert result["sample_size"] == 2000
+        assert result["rows"] == 20000
+        assert result["statistic_error_bound"] == pytest.approx(dkw_bound(2000))
+        assert abs(result["statistic"] - full[col]["statistic"]) <= result["statistic_error_bound"]
+
+
+def test_stratified_sample_keeps_proportions(files):
+    _, prod = files
+    frame, rows = sample_columns(prod, ["Age"], sample_size=300, stratify_by="HasCrCard", chunksize=200)
+    full = pd.read_csv(prod)
+    assert rows == len(full)
+    assert len(frame) == pytest.approx(300, abs=1)
+    assert frame["HasCrCard"].mean() == pytest.approx(full["HasCrCard"].mean(), abs=0.01)
+    assert list(frame.columns) == ["Age", "HasCrCard"]
+
+
+def test_parallel_matches_sequential(files):
+    ref, prod = files
+    assert exact_drift_file(ref, prod, workers=2) == exact_drift_file(ref, prod, workers=1)
+
+
+def test_sketch_reference_matches_csv(files, tmp_path):
+    """Esquisse a la place du CSV : memes decisions, statistiques exactes sur les features discretes"""
+    ref, prod = files
+    sketch = save_sketch(build_sketch(pd.read_csv(ref), model_version="v1"), str(tmp_path / "sketch.json"))
+    for method in ("binned", "exact"):
+        from_csv = detect_drift(ref, prod, method=method)
+        from_sketch = detect_drift(sketch, prod, method=method)
+        assert set(from_sketch) == set(from_csv)
+        for col in from_csv:
+            assert from_sketch[col]["drift_detected"] == from_csv[col]["drift_detected"]
+            assert from_sketch[col]["statistic"] == pytest.approx(from_csv[col]["statistic"], abs=0.005)
+        assert from_sketch["Age"]["statistic"] == pytest.approx(from_csv["Age"]["statistic"], abs=1e-12)
+
+
+def test_sketch_size_does_not_grow_with_rows():
+    small = build_sketch(_frame(2000, 0), max_bins=32)
+    large = build_sketch(_frame(50000, 0), max_bins=32)
+    assert "Exited" not in large["features"]
+    assert large["features"]["CreditScore"]["kind"] == "continuous"
+    assert len(large["features"]["CreditScore"]["edges"]) <= 33
+    assert sum(large["features"]["CreditScore"]["counts"]) == large["rows"] == 50000
+    assert len(str(large)) < 2 * len(str(small))
+
+
+def test_exact_pool_is_reused_and_shut_down():
+    import app.drift_detect as drift_detect
+
+    pool = drift_detect._get_pool(2)
+    assert drift_detect._get_pool(2) is pool
+    resized = drift_detect._get_pool(3)
+    assert resized is not pool and drift_detect._pool_workers == 3
+
+    drift_detect.shutdown_pool()
+    assert drift_detect._pool is None
+    with pytest.raises(RuntimeError):
+        resized.submit(abs, -1)
@@ -0,0 +1,100 @@
+# tests/test_drift_jobs.py
+import sys
+import os
+import math
+import time
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from app.drift_jobs import DriftJobManager, JobLimitReached
+from app.main import app
+
+client = TestClient(app)
+HEADERS = {"X-API-Key": os.getenv("API_KEY")}
+
+
+def _wait(get, job_id, timeout=60):
+    deadline = time.time() + timeout
+    job = get(job_id)
+    while job["status"] in ("queued", "running") and time.time() < deadline:
+        time.sleep(0.1)
+        job = get(job_id)
+    return job
+
+
+@pytest.fixture
+def manager():
+    manager = DriftJobManager(max_workers=1, max_active=2)
+    yield manager
+    manager.shutdown()
+
+
+def test_identical_submissions_share_a_job(manager):
+    first, deduplicated = manager.submit(("a",), time.sleep, 0.5)
+    assert not deduplicated
+    second, deduplicated = manager.submit(("a",), time.sleep, 0.5)
+    assert deduplicated
+    assert second["job_id"] == first["job_id"]
+
+    assert _wait(manager.get, first["job_id"])["status"] == "succeeded"
+    # Job termine : une nouvelle soumission cree un nouveau job
+    third, deduplicated = manager.submit(("a",), time.sleep, 0)
+    assert not deduplicated
+    assert third["job_id"] != first["job_id"]
+
+
+def test_active_jobs_are_capped(manager):
+    manager.submit(("a",), time.sleep, 0.5)
+    manager.submit(("b",), time.sleep, 0.5)
+    with pytest.raises(JobLimitReached):
+        manager.submit(("c",), time.sleep, 0.5)
+    assert manager.stats()["rejected"] == 1
+
+
+def test_failed_job_reports_error(manager):
+    job, _ = manager.submit(("sqrt",), math.sqrt, -1)
+    job = _wait(manager.get, job["job_id"])
+    assert job["status"] == "failed"
+    assert job["error"].startswith("ValueError")
+
+
+def test_crashed_worker_fails_job_and_pool_is_rebuilt(manager):
+    crashed, _ = manager.submit(("crash",), os._exit, 1)
+    crashed = _wait(manager.get, crashed["job_id"])
+    assert crashed["status"] == "failed"
+    assert crashed["error"].startswith("BrokenProcessPool")
+
+    job, _ = manager.submit(("sqrt",), math.sqrt, 4)
+    job = _wait(manager.get, job["job_id"])
+    assert job["status"] == "succeeded" and job["result"] == 2.0
+    assert manager.stats()["pool_restarts"] == 1
+
+
+def test_unrecoverable_pool_marks_job_failed(manager, monkeypatch):
+    from concurrent.futures.process import BrokenProcessPool
+
+    class BrokenPool:
+        def submit(self, *args, **kwargs):
+            raise BrokenProcessPool("pool casse")
+
+        def shutdown(self, **kwargs):
+            pass
+
+    monkeypatch.setattr(manager, "_pool", BrokenPool)
+    job, _ = manager.submit(("sqrt",), math.sqrt, 4)
+    job = _wait(manager.get, job["job_id"])
+    assert job["status"] == "failed" and "pool casse" in job["error"]
+    assert manager.stats()["active"] == 0
+
+
+def test_async_drift_check_endpoint():
+    response = client.post("/drift/check?threshold=0.5&source=file&async_job=true", headers=HEADERS)
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    job = _wait(lambda jid: client.get(f"/drift/jobs/{jid}", headers=HEADERS).json(), job_id)
+    assert job["status"] == "succeeded", job
+    assert job["result"]["features_analyzed"] == len(job["result"]["features"])
+    assert client.get("/drift/jobs/inconnu", headers=HEADERS).status_code == 404
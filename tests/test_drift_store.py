@@ -0,0 +1,86 @@
+# tests/test_drift_store.py
+import sys
+import os
+import json
+import pytest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from app.drift_store import DAY, DriftReportStore
+from app.main import app
+
+client = TestClient(app)
+HEADERS = {"X-API-Key": os.getenv("API_KEY")}
+
+NOW = 1_760_000_000.0
+
+
+def _results(statistic, drifted):
+    return {
+        "Age": {"statistic": statistic, "p_value": 0.01 if drifted else 0.5, "drift_detected": drifted},
+        "Balance": {"statistic": 0.01, "p_value": 0.9, "drift_detected": False}
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DriftReportStore(str(tmp_path / "drift.sqlite"), retention_days=30, compact_after_days=7,
+                            compact_every=float("inf"))
+
+
+def test_history_by_feature_time_and_version(store):
+    for i in range(10):
+        store.record(_results(0.01 * i, i >= 5), model_version="v1" if i < 8 else "v2",
+                     created_at=NOW - (10 - i) * 3600)
+
+    history = store.history("Age", NOW - 5.5 * 3600, NOW)
+    assert [round(p["statistic"], 2) for p in history] == [0.09, 0.08, 0.07, 0.06, 0.05]
+    assert all(p["drift_detected"] for p in history)
+    assert len(store.history("Age", model_version="v2")) == 2
+
+    report = store.report(history[0]["report_id"])
+    assert report["features_drifted"] == 1
+    assert set(report["features"]) == {"Age", "Balance"}
+
+
+def test_compaction_rolls_old_results_into_days(store):
+    for i in range(4):
+        store.record(_results(0.1 * (i + 1), i % 2 == 0), model_version="v1",
+                     created_at=NOW - 10 * DAY + i * 60)
+    store.record(_results(0.5, True), model_version="v1", created_at=NOW - 40 * DAY)
+    store.record(_results(0.2, True), model_version="v1", created_at=NOW)
+
+    store.compact(now=NOW)
+    assert len(store.history("Age")) == 1
+    daily = store.daily("Age", NOW - 20 * DAY, NOW)
+    assert len(daily) == 1
+    assert daily[0]["reports"] == 4
+    assert daily[0]["drifted"] == 2
+    assert daily[0]["mean_statistic"] == pytest.approx(0.25)
+    # Rapport hors retention supprime
+    assert store.stats()["reports"] == 5
+    assert store.daily("Age", 0, NOW - 35 * DAY) == []
+
+
+def test_json_reports_are_imported_once(store, tmp_path):
+    with open(tmp_path / "drift_20260104_171816.json", "w") as f:
+        json.dump(_results(0.3, True), f)
+    assert store.import_json_reports(str(tmp_path)) == 1
+    assert store.import_json_reports(str(tmp_path)) == 0
+    assert store.history("Age")[0]["created_at"].startswith("2026-01-04")
+
+
+def test_drift_endpoints_query_store(store):
+    with patch('app.main.drift_store', store):
+        report_id = client.post("/drift/check?threshold=0.5&source=file", headers=HEADERS).json()["report_id"]
+
+        history = client.get("/drift/history?feature=Age", headers=HEADERS).json()
+        assert history["points"][0]["report_id"] == report_id
+        assert client.get("/drift/history?feature=Age&resolution=daily", headers=HEADERS).json()["points"] == []
+
+        reports = client.get("/drift/reports?limit=5", headers=HEADERS).json()
+        assert reports["reports"][0]["id"] == report_id
+        assert "Age" in client.get(f"/drift/reports/{report_id}", headers=HEADERS).json()["features"]
+        assert client.get("/drift/reports/999999", headers=HEADERS).status_code == 404
@@ -0,0 +1,106 @@
+# tests/test_drift_windows.py
+import sys
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import ks_2samp
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from app.capture import TrafficCapture
+from app.drift_windows import WindowedDrift, parse_duration
+from app.main import app
+
+client = TestClient(app)
+HEADERS = {"X-API-Key": os.getenv("API_KEY")}
+
+NOW = 1_700_000_100.0  # aligne sur les tranches de 60 s et 300 s
+
+
+@pytest.fixture
+def reference(tmp_path):
+    rng = np.random.default_rng(0)
+    path = tmp_path / "ref.csv"
+    pd.DataFrame({
+        "Age": rng.integers(18, 80, 4000),
+        "Balance": rng.normal(60000, 20000, 4000),
+        "Exited": rng.integers(0, 2, 4000)
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def _observations(n, seed, age_shift=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "Age": rng.integers(18, 80, n) + age_shift,
+        "Balance": rng.normal(60000, 20000, n)
+    }
+
+
+def test_windows_merge_buckets(reference):
+    """La derniere heure ne voit que le trafic recent (decale) ; la semaine voit tout"""
+    windows = WindowedDrift(reference, bucket_seconds=300)
+    old = _observations(3000, 1)
+    windows.update(np.full(3000, NOW - 3 * 86400), old)
+    recent = _observations(1000, 2, age_shift=15)
+    windows.update(NOW - np.linspace(0, 1800, 1000), recent)
+
+    hour = windows.window(3600, NOW)
+    week = windows.window(7 * 86400, NOW)
+    assert hour["rows"] == 1000
+    assert week["rows"] == 4000
+    assert hour["features"]["Age"]["drift_detected"]
+    assert hour["features"]["Age"]["psi"] > 0.2
+    assert not hour["features"]["Balance"]["psi_alert"]
+
+    # KS binne = ks_2samp pour une feature discrete
+    ref_age = pd.read_csv(reference)["Age"]
+    assert hour["features"]["Age"]["statistic"] == pytest.approx(ks_2samp(ref_age, recent["Age"]).statistic)
+
+
+def test_timeline_shows_sudden_shift(reference):
+    windows = WindowedDrift(reference, bucket_seconds=60)
+    for minute in range(120):
+        shift = 20 if minute >= 90 else 0
+        ts = NOW - (119 - minute) * 60 + np.linspace(0, 59, 400)
+        windows.update(ts, _observations(400, minute, age_shift=shift))
+
+    points = windows.timeline(window_seconds=600, step_seconds=300, points=24, now=NOW + 59)
+    assert len(points) == 24
+    psi_age = [p["psi"]["Age"] for p in points]
+    assert max(psi_age[:12]) < 0.1 < psi_age[-1]
+    assert points[-1]["rows"] == 4000
+
+
+def test_old_buckets_are_expired(reference):
+    windows = WindowedDrift(reference, bucket_seconds=60, retention_seconds=3600)
+    windows.update(np.array([NOW - 7200]), {"Age": np.array([30]), "Balance": np.array([1.0])})
+    windows.update(np.array([NOW]), {"Age": np.array([30]), "Balance": np.array([1.0])})
+    assert windows.stats()["buckets"] == 1
+
+
+def test_parse_duration():
+    assert parse_duration("90") == 90
+    assert parse_duration("5m") == 300
+    assert parse_duration("7d") == 7 * 86400
+    with pytest.raises(ValueError):
+        parse_duration("une heure")
+
+
+def test_windows_endpoint_reads_capture(tmp_path):
+    capture = TrafficCapture(str(tmp_path))
+    capture.record_many([(650, 35, 5, 50000.0, 2, 1, 1, 75000.0, 0, 1)] * 20, [0.3] * 20)
+    with patch('app.main.traffic_capture', capture), patch('app.main.drift_windows', None):
+        response = client.get("/drift/windows?windows=1h,1d", headers=HEADERS)
+        assert response.status_code == 200
+        assert response.json()["windows"]["1h"]["rows"] == 20
+
+        timeline = client.get("/drift/timeline?window=1h&step=5m&points=4", headers=HEADERS).json()
+        assert len(timeline["points"]) == 4
+        assert client.get("/drift/timeline?window=bad", headers=HEADERS).status_code == 422
+
+    with patch('app.main.traffic_capture', None):
+        assert client.get("/drift/windows", headers=HEADERS).status_code == 409
@@ -0,0 +1,78 @@
+# tests/test_forest_engine.py
+import sys
+import os
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.forest_engine import CompiledForest, check_parity, compile_model, load_compiled, save_compiled
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(42)
+    X = np.column_stack([
+        rng.integers(300, 850, 2000),
+        rng.integers(18, 80, 2000),
+        rng.uniform(0, 200000, 2000),
+        rng.integers(0, 2, 2000)
+    ]).astype(np.float64)
+    y = ((X[:, 1] > 50) ^ (X[:, 3] == 1) ^ (rng.random(2000) < 0.2)).astype(int)
+    return X, y
+
+
+@pytest.fixture(scope="module")
+def forest(data):
+    X, y = data
+    return RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0).fit(X, y)
+
+
+def test_exact_parity_with_sklearn(data, forest):
+    """Probabilites identiques a scikit-learn, ligne seule et lot"""
+    X, _ = data
+    compiled = CompiledForest.from_sklearn(forest)
+    assert np.array_equal(compiled.predict_proba(X), forest.predict_proba(X))
+    assert np.array_equal(compiled.predict_proba(X[:1]), forest.predict_proba(X[:1]))
+    assert np.array_equal(compiled.predict(X), forest.predict(X))
+    assert check_parity(forest, compiled) == 0.0
+
+
+def test_unlimited_depth_forest(data):
+    """Arbres sans max_depth (profondeurs heterogenes)"""
+    X, y = data
+    model = RandomForestClassifier(n_estimators=5, random_state=1).fit(X, y)
+    assert np.array_equal(compile_model(model).predict_proba(X), model.predict_proba(X))
+
+
+def test_unsupported_model_is_rejected(data):
+    X, y = data
+    with pytest.raises(TypeError):
+        CompiledForest.from_sklearn(LogisticRegression().fit(X, y))
+
+
+def test_prepare_model_falls_back_to_sklearn(data):
+    """Un modele non compilable est servi par scikit-learn"""
+    from app.main import prepare_model
+    X, y = data
+    model = LogisticRegression().fit(X, y)
+    served, engine = prepare_model(model, "compiled")
+    assert served is model
+    assert engine == "sklearn"
+
+
+def test_mmap_artifact_roundtrip(data, forest, tmp_path):
+    """L'artefact .npy s'ouvre en memmap avec les memes probabilites"""
+    X, _ = data
+    path = save_compiled(compile_model(forest), str(tmp_path / "model_mmap"), {"source_version": "abc"})
+    compiled, meta = load_compiled(path)
+    assert isinstance(compiled.children, np.memmap)
+    assert not compiled.threshold.flags.writeable
+    assert meta["source_version"] == "abc"
+    assert np.array_equal(compiled.predict_proba(X), forest.predict_proba(X))
+
+    # Reecriture atomique par-dessus un artefact existant
+    save_compiled(compile_model(forest), path)
+    assert sorted(os.listdir(tmp_path)) == ["model_mmap"]
@@ -0,0 +1,63 @@
+# tests/test_generate_data.py
+import sys
+import os
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from generate_data import COLUMNS, correlation_matrix, generate, main, parse_args
+
+REFERENCE = os.path.join(os.path.dirname(__file__), "..", "data", "bank_churn.csv")
+
+
+def test_output_does_not_depend_on_workers(tmp_path):
+    """Un flux SeedSequence par bloc : meme jeu avec 1 ou 2 processus"""
+    generate(5000, str(tmp_path / "one.csv"), workers=1, chunk_rows=1200)
+    generate(5000, str(tmp_path / "two.csv"), workers=2, chunk_rows=1200)
+
+    one = pd.read_csv(tmp_path / "one.csv")
+    assert list(one.columns) == COLUMNS + ["Exited"]
+    assert len(one) == 5000
+    assert (tmp_path / "one.csv").read_bytes() == (tmp_path / "two.csv").read_bytes()
+
+
+def test_partitioned_parquet_with_manifest(tmp_path):
+    output = tmp_path / "dataset"
+    manifest = generate(2500, str(output), fmt="parquet", workers=2, chunk_rows=1000, seed=7)
+
+    on_disk = json.loads((output / "_manifest.json").read_text())
+    assert on_disk["files"] == ["part-00000.parquet", "part-00001.parquet", "part-00002.parquet"]
+    assert on_disk["rows"] == manifest["rows"] == 2500
+    df = pd.read_parquet(output)
+    assert len(df) == 2500 and df["Age"].between(18, 79).all()
+
+    # Un repertoire existant qui n'est pas un jeu genere n'est jamais ecrase
+    other = tmp_path / "other"
+    other.mkdir()
+    with pytest.raises(FileExistsError):
+        generate(10, str(other))
+
+
+def test_churn_rate_is_calibrated_and_correlations_applied(tmp_path):
+    generate(60000, str(tmp_path / "d.csv"), chunk_rows=20000, churn_rate=0.1, correlation=1.0)
+    df = pd.read_csv(tmp_path / "d.csv")
+
+    assert abs(df["Exited"].mean() - 0.1) < 0.01
+    assert df["Age"].corr(df["Tenure"]) > 0.25
+    assert df["Balance"].corr(df["NumOfProducts"]) < -0.2
+    # Le churn reste lie aux facteurs de risque
+    assert df.loc[df.IsActiveMember == 0, "Exited"].mean() > df.loc[df.IsActiveMember == 1, "Exited"].mean()
+    assert np.linalg.eigvalsh(correlation_matrix(1.0)).min() > 0
+
+
+def test_no_argument_run_reproduces_reference_dataset(tmp_path, monkeypatch):
+    """Sans argument : generateur d'origine, memes lignes que data/bank_churn.csv"""
+    assert parse_args([]).legacy and not parse_args(["--rows", "10000"]).legacy
+    monkeypatch.chdir(tmp_path)
+    main([])
+    with open(REFERENCE, "rb") as f:
+        # Fichier versionne en CRLF : comparaison aux fins de ligne pres
+        assert (tmp_path / "data" / "bank_churn.csv").read_bytes() == f.read().replace(b"\r\n", b"\n")
@@ -0,0 +1,82 @@
+# tests/test_metrics.py
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from app.metrics import MetricsRegistry, archive_worker, read_snapshots, write_snapshot
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latence", ("stage",), buckets=(0.1, 1.0))
+    series = latency.labels("score")
+    for value in (0.05, 0.1, 0.5, 3.0):
+        series.observe(value)
+    text = registry.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{stage="score",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{stage="score",le="1"} 3' in text
+    assert 'latency_seconds_bucket{stage="score",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{stage="score"} 4' in text
+    assert 'latency_seconds_sum{stage="score"} 3.65' in text
+
+
+def test_per_thread_shards_are_summed():
+    """Enregistrement sans verrou : chaque thread a son fragment, la lecture les additionne"""
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requetes", ("route",))
+    series = requests.labels("/predict")
+
+    def work():
+        for _ in range(10000):
+            series.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert series.value() == 40000
+    assert 'requests_total{route="/predict"} 40000' in registry.render()
+
+
+def test_worker_snapshots_are_merged_and_archived(tmp_path):
+    """Gunicorn : compteurs additionnes entre workers, conserves apres leur arret"""
+    directory = str(tmp_path)
+    workers = []
+    for pid in (101, 102):
+        registry = MetricsRegistry()
+        registry.counter("requests_total", "Requetes").inc(5)
+        registry.callback("gauge", "queue_depth", "File", lambda: 7)
+        write_snapshot(registry, directory, pid=pid)
+        workers.append(registry)
+
+    archive_worker(directory, 101)
+    assert not os.path.exists(os.path.join(directory, "metrics-101.json"))
+
+    local = MetricsRegistry()
+    local.counter("requests_total", "Requetes").inc(1)
+    local.callback("gauge", "queue_depth", "File", lambda: 2)
+    text = local.render(read_snapshots(directory))
+    assert "requests_total 11" in text
+    # Jauges : celles du worker qui repond uniquement
+    assert "queue_depth 2" in text
+
+
+def test_metrics_endpoint_reports_routes_and_stages():
+    import app.main as app_main
+
+    client = TestClient(app_main.app)
+    headers = {"X-API-Key": os.getenv("API_KEY")}
+    client.get("/drift/jobs/unknown", headers=headers)
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    # Gabarit de route, pas le chemin (cardinalite bornee)
+    assert 'route="/drift/jobs/{job_id}",status="404"' in text
+    assert 'bank_churn_predict_stage_seconds_count{endpoint="predict",stage="score"}' in text
+    assert "bank_churn_prediction_cache_requests_total" in text
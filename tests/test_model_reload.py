@@ -0,0 +1,130 @@
+# tests/test_model_reload.py
+import sys
+import os
+import time
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from sklearn.ensemble import RandomForestClassifier
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+import app.main as app_main
+from app.forest_engine import compile_model, save_compiled
+from app.model_registry import ModelWatcher, artifact_version, file_signature
+from app.reference_sketch import build_sketch, save_sketch
+
+client = TestClient(app_main.app)
+HEADERS = {"X-API-Key": os.getenv("API_KEY")}
+
+
+def _train(seed):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 1, (200, 10))
+    y = (X[:, seed % 10] > 0.5).astype(int)
+    return RandomForestClassifier(n_estimators=5, random_state=seed).fit(X, y)
+
+
+@pytest.fixture
+def model_file(tmp_path):
+    path = tmp_path / "churn_model.pkl"
+    joblib.dump(_train(0), path)
+    with patch('app.main.MODEL_PATH', str(path)):
+        yield path
+    app_main.set_model(None, None)
+
+
+def test_admin_reload_swaps_model_and_clears_cache(model_file):
+    """/admin/reload charge, prechauffe et echange le modele"""
+    app_main.prediction_cache.put(("old", (1,)), {"p": 1})
+
+    response = client.post("/admin/reload?source=file", headers=HEADERS)
+    assert response.status_code == 200
+    first_version = response.json()["model_version"]
+    assert len(app_main.prediction_cache) == 0
+
+    health = client.get("/health").json()
+    assert health["model_version"] == first_version
+    assert health["model_loaded_at"] is not None
+    assert health["model_load_seconds"] >= 0
+
+    joblib.dump(_train(1), model_file)
+    second_version = client.post("/admin/reload", headers=HEADERS).json()["model_version"]
+    assert second_version != first_version
+
+
+def test_failed_reload_keeps_current_model(model_file):
+    app_main.reload_model("file")
+    current = app_main.model
+    model_file.write_bytes(b"pas un pickle")
+
+    response = client.post("/admin/reload", headers=HEADERS)
+    assert response.status_code == 500
+    assert app_main.model is current
+
+
+def test_watcher_reloads_on_file_change(model_file):
+    """Le watcher detecte un nouveau fichier et declenche le rechargement"""
+    reloads = []
+    watcher = ModelWatcher(lambda: file_signature(str(model_file)), lambda: reloads.append(1), interval=60)
+    watcher.prime(file_signature(str(model_file)))
+    assert watcher.check() is False
+
+    time.sleep(0.01)
+    joblib.dump(_train(2), model_file)
+    os.utime(model_file, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+    assert watcher.check() is True
+    assert watcher.check() is False
+    assert reloads == [1]
+
+
+def test_compiled_engine_serves_mmap_artifact(model_file, tmp_path):
+    """Moteur compile : les arbres sont lus dans l'artefact memory-mappe"""
+    mmap_path = str(tmp_path / "churn_model_mmap")
+    save_compiled(compile_model(joblib.load(model_file)), mmap_path,
+                  {"source_version": artifact_version(model_file)})
+    with patch('app.main.INFERENCE_ENGINE', "compiled"), patch('app.main.MODEL_MMAP_PATH', mmap_path):
+        info = app_main.reload_model("file")
+        assert info["model_mmap"] is True
+        assert info["engine"] == "compiled"
+        assert isinstance(app_main.model.children, np.memmap)
+
+        # Pickle plus recent que l'artefact : l'artefact perime est ignore
+        joblib.dump(_train(3), model_file)
+        info = app_main.reload_model("file")
+        assert info["model_mmap"] is False
+        assert info["model_version"] == artifact_version(model_file)
+
+
+def test_preloaded_model_is_inherited_and_worker_signals_ready(model_file, tmp_path):
+    """Mode pre-fork : le worker reutilise le modele du maitre et cree son fichier de disponibilite"""
+    ready_dir = tmp_path / "ready"
+    with patch('app.main.READINESS_DIR', str(ready_dir)), patch('app.main.model_preloaded', False):
+        app_main.preload_model()
+        preloaded = app_main.model
+        assert app_main.model_preloaded is True
+
+        with TestClient(app_main.app) as worker_client:
+            assert app_main.model is preloaded
+            ready = ready_dir / f"worker-{os.getpid()}.ready"
+            assert ready.exists()
+            assert worker_client.get("/health").json()["worker_pid"] == os.getpid()
+        assert not ready.exists()
+
+
+def test_drift_reference_follows_served_model(model_file, tmp_path):
+    """Le drift utilise l'esquisse du modele servi, jamais celle d'un autre modele"""
+    sketch_path = str(tmp_path / "reference_sketch.json")
+    frame = pd.DataFrame({"Age": np.arange(100), "Exited": np.zeros(100)})
+    save_sketch(build_sketch(frame, model_version=artifact_version(model_file)), sketch_path)
+    with patch('app.main.REFERENCE_SKETCH_PATH', sketch_path):
+        assert app_main.reload_model("file")["drift_reference"] == sketch_path
+        assert app_main.drift_reference_file() == sketch_path
+
+        # Nouveau modele sans nouvelle esquisse : repli sur le CSV
+        joblib.dump(_train(4), model_file)
+        assert app_main.reload_model("file")["drift_reference"] is None
+        assert app_main.drift_reference_file() == app_main.DRIFT_REFERENCE_FILE
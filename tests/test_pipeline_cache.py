@@ -0,0 +1,71 @@
+# tests/test_pipeline_cache.py
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline_cache import StageCache, file_digest
+
+
+def _counting(results):
+    def stage(x):
+        results.append(x)
+        return x * 2
+    return stage
+
+
+def test_unchanged_stage_is_read_back(tmp_path):
+    calls = []
+    stage = _counting(calls)
+    first = StageCache(str(tmp_path)).run("double", stage, 21, params={"p": 1})
+    second = StageCache(str(tmp_path)).run("double", stage, 21, params={"p": 1})
+
+    assert (first.hit, second.hit) == (False, True)
+    assert second.value == 42 and first.key == second.key
+    assert calls == [21]
+
+
+def test_params_upstream_and_code_change_the_key(tmp_path):
+    cache = StageCache(str(tmp_path))
+    calls = []
+    stage = _counting(calls)
+    base = cache.run("double", stage, 1, params={"p": 1})
+
+    assert not cache.run("double", stage, 1, params={"p": 2}).hit
+    upstream = cache.run("source", lambda: 0, params={"data": "a"})
+    assert not cache.run("double", stage, 1, params={"p": 1}, upstream=[upstream]).hit
+
+    def other_stage(x):
+        return x * 3
+    assert cache.run("double", other_stage, 1, params={"p": 1}).key != base.key
+    assert cache.run("double", stage, 1, params={"p": 1}, code=[other_stage]).key != base.key
+
+
+def test_data_change_invalidates_only_through_the_file_digest(tmp_path):
+    data = tmp_path / "data.csv"
+    data.write_text("a,b\n1,2\n")
+    cache = StageCache(str(tmp_path / "cache"))
+    load = lambda path: open(path).read()
+
+    first = cache.run("load", load, str(data), params={"data": file_digest(str(data))})
+    data.write_text("a,b\n1,3\n")
+    second = cache.run("load", load, str(data), params={"data": file_digest(str(data))})
+    assert not second.hit and second.value.endswith("1,3\n") and first.key != second.key
+
+
+def test_rejected_or_disabled_entries_are_recomputed(tmp_path):
+    calls = []
+    stage = _counting(calls)
+    StageCache(str(tmp_path)).run("double", stage, 5)
+
+    rejected = StageCache(str(tmp_path)).run("double", stage, 5, validate=lambda value: False)
+    disabled = StageCache(str(tmp_path), enabled=False).run("double", stage, 5)
+    assert not rejected.hit and not disabled.hit
+    assert calls == [5, 5, 5]
+
+
+def test_environment_is_part_of_the_key(tmp_path):
+    stage = _counting([])
+    old = StageCache(str(tmp_path), environment={"sklearn": "1.3.2"}).run("double", stage, 1)
+    new = StageCache(str(tmp_path), environment={"sklearn": "1.4.0"}).run("double", stage, 1)
+    assert old.key != new.key and not new.hit
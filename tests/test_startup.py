@@ -0,0 +1,66 @@
+# tests/test_startup.py
+import sys
+import os
+import json
+import subprocess
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.startup import StartupProfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def test_import_app_main_skips_heavy_dependencies():
+    """Le chemin /predict n'importe ni pandas, ni scipy, ni matplotlib"""
+    code = (
+        "import json, sys\n"
+        "import app.main\n"
+        "heavy = ('pandas', 'scipy', 'matplotlib', 'seaborn', 'sklearn', 'opencensus')\n"
+        "print(json.dumps(sorted(m for m in heavy if m in sys.modules)))\n"
+    )
+    env = {**os.environ, "API_KEY": "test"}
+    env.pop("APPLICATIONINSIGHTS_CONNECTION_STRING", None)
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env,
+        capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+
+def test_profile_records_imports_phases_and_lazy_imports():
+    profile = StartupProfile()
+    profile.import_modules(["json", "colorsys"])
+    assert "json" not in profile.imports  # deja charge, pas de duree
+    with profile.phase("model_load"):
+        pass
+    assert profile.lazy_import("wave") is sys.modules["wave"]
+    assert "wave" in profile.lazy_imports
+
+    profile.ready()
+    profile.record("model_warmup", 1.0)  # apres le demarrage : ignore
+    report = profile.report()
+    assert set(report["phases"]) == {"model_load"}
+    assert report["ready_seconds"] >= 0
+    assert report["import_seconds"] == round(sum(report["imports"].values()), 4)
+
+
+def test_health_reports_startup_profile(tmp_path):
+    import joblib
+    import numpy as np
+    from unittest.mock import patch
+    from fastapi.testclient import TestClient
+    from sklearn.ensemble import RandomForestClassifier
+    import app.main as app_main
+
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 1, (100, 10))
+    path = tmp_path / "churn_model.pkl"
+    joblib.dump(RandomForestClassifier(n_estimators=3, random_state=0).fit(X, X[:, 0] > 0.5), path)
+    with patch('app.main.MODEL_PATH', str(path)), TestClient(app_main.app) as client:
+        startup = client.get("/health").json()["startup"]
+    app_main.set_model(None, None)
+
+    assert startup["ready_seconds"] is not None
+    assert {"imports", "import_seconds", "phases", "lazy_imports", "preloaded"} <= set(startup)
@@ -0,0 +1,60 @@
+# tests/test_streaming.py
+import sys
+import os
+import json
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.scoring import FEATURE_NAMES
+from app.streaming import StreamScorer, score_stream, detect_format
+
+
+class ConstantModel:
+    """Modele factice : probabilite constante"""
+    def predict_proba(self, X):
+        return np.column_stack([np.full(len(X), 0.9), np.full(len(X), 0.1)])
+
+
+ROW = "650,35,5,50000.0,2,1,1,75000.0,0,1"
+
+
+def _collect(blocks, **kwargs):
+    out = b"".join(score_stream(blocks, ConstantModel(), **kwargs))
+    return [json.loads(l) for l in out.decode().splitlines()]
+
+
+def test_csv_split_across_blocks():
+    """Les lignes coupees entre deux blocs sont reconstituees"""
+    data = (",".join(FEATURE_NAMES) + "\n" + "\n".join([ROW] * 10)).encode()
+    blocks = [data[i:i + 7] for i in range(0, len(data), 7)]
+    lines = _collect(blocks, fmt="csv", chunk_rows=3)
+    assert lines[-1]["summary"]["scored"] == 10
+    assert [l["index"] for l in lines[:-1]] == list(range(10))
+
+
+def test_missing_header_column_reported_in_trailer():
+    """Un en-tete incomplet termine le flux avec l'erreur dans le resume"""
+    lines = _collect([b"CreditScore,Age\n1,2\n"], fmt="csv")
+    assert len(lines) == 1
+    assert "Colonnes manquantes" in lines[0]["summary"]["error"]
+
+
+def test_oversized_line_is_rejected_with_bounded_buffer():
+    """Une ligne trop longue est rejetee sans etre gardee en memoire"""
+    scorer = StreamScorer(ConstantModel(), fmt="ndjson", max_line_bytes=100)
+    scorer.feed(b"x" * 80)
+    scorer.feed(b"x" * 80)
+    assert len(scorer._pending) == 0
+    out = scorer.feed(b"x" * 80 + b'\n' + json.dumps(dict(zip(FEATURE_NAMES, ROW.split(",")))).encode() + b"\n")
+    out += scorer.finish()
+    lines = [json.loads(l) for l in out.decode().splitlines()]
+    assert lines[0]["errors"][0]["type"] == "line_too_long"
+    assert lines[1]["churn_probability"] == 0.1
+
+
+def test_detect_format():
+    assert detect_format("text/csv; charset=utf-8") == "csv"
+    assert detect_format("application/x-ndjson") == "ndjson"
+    assert detect_format("multipart/form-data; boundary=x") is None
+    assert detect_format(None, "clients.csv") == "csv"
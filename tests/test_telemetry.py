@@ -0,0 +1,117 @@
+# tests/test_telemetry.py
+import sys
+import os
+import json
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import logging
+
+from app.telemetry import JsonLinesExporter, LoggingExporter, MemoryExporter, TelemetryPipeline
+
+
+class _FailingExporter:
+    def export(self, events):
+        raise ConnectionError("collecteur indisponible")
+
+
+def test_events_are_exported_in_batches():
+    exporter = MemoryExporter()
+    pipeline = TelemetryPipeline(exporter, batch_size=4, flush_interval=60)
+    for i in range(10):
+        assert pipeline.emit("prediction", {"probability": i / 10})
+    assert exporter.events == []
+
+    assert pipeline.flush() == 10
+    assert [len(batch) for batch in exporter.batches] == [4, 4, 2]
+    event = exporter.events[0]
+    assert event["event_type"] == "prediction"
+    assert event["probability"] == 0.0
+    assert event["sample_rate"] == 1.0
+    assert pipeline.stats()["exported"] == 10
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _logger(name):
+    handler = _ListHandler()
+    logger = logging.getLogger(name)
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger, handler.records
+
+
+def test_logging_exporter_emits_one_record_per_batch():
+    logger, records = _logger("test-telemetry-batch")
+    events = [{"event_type": "prediction", "probability": i / 10} for i in range(3)]
+    events.append({"event_type": "drift_detection", "drifted": 1})
+    LoggingExporter(logger).export(events)
+
+    assert len(records) == 1
+    dimensions = records[0].custom_dimensions
+    assert records[0].getMessage() == "telemetry_batch"
+    assert dimensions["event_count"] == 4
+    assert json.loads(dimensions["event_types"]) == {"prediction": 3, "drift_detection": 1}
+    assert json.loads(dimensions["events"]) == events
+
+
+def test_logging_exporter_per_event_is_opt_in():
+    logger, records = _logger("test-telemetry-events")
+    events = [{"event_type": "prediction", "probability": 0.5}] * 3
+    LoggingExporter(logger, per_event=True).export(events)
+    assert [r.getMessage() for r in records] == ["prediction"] * 3
+    assert records[0].custom_dimensions == events[0]
+
+
+def test_full_queue_drops_and_counts_without_blocking():
+    pipeline = TelemetryPipeline(MemoryExporter(), max_queue=3)
+    started = time.perf_counter()
+    accepted = [pipeline.emit("prediction", {}) for _ in range(10)]
+    assert time.perf_counter() - started < 0.05
+    assert accepted.count(True) == 3
+    stats = pipeline.stats()
+    assert stats["dropped"] == 7
+    assert stats["queue_depth"] == 3
+
+
+def test_sampling_applies_per_event_type():
+    exporter = MemoryExporter()
+    pipeline = TelemetryPipeline(exporter, sample_rates={"prediction": 0.1})
+    for _ in range(2000):
+        pipeline.emit("prediction", {})
+    pipeline.emit("drift_detection", {"features_drifted": 2})
+    pipeline.flush()
+
+    predictions = [e for e in exporter.events if e["event_type"] == "prediction"]
+    assert 100 < len(predictions) < 300
+    assert all(e["sample_rate"] == 0.1 for e in predictions)
+    assert pipeline.stats()["sampled_out"] == 2000 - len(predictions)
+    # Les types sans taux dedie ne sont pas echantillonnes
+    assert [e for e in exporter.events if e["event_type"] == "drift_detection"]
+
+
+def test_background_thread_flushes_and_survives_export_errors(tmp_path):
+    failing = TelemetryPipeline(_FailingExporter(), flush_interval=0.01)
+    failing.start()
+    failing.emit("prediction", {})
+    failing.stop()
+    assert failing.stats()["export_errors"] == 1
+
+    path = tmp_path / "events.jsonl"
+    pipeline = TelemetryPipeline(JsonLinesExporter(str(path)), flush_interval=0.01)
+    pipeline.start()
+    pipeline.emit("batch_prediction", {"n_rows": 3})
+    deadline = time.time() + 5
+    while not path.exists() and time.time() < deadline:
+        time.sleep(0.01)
+    pipeline.stop()
+    assert json.loads(path.read_text().splitlines()[0])["n_rows"] == 3
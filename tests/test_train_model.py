@@ -0,0 +1,62 @@
+# tests/test_train_model.py
+import sys
+import os
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from train_model import (
+    SEARCH_SPACE, best_trial, grid_candidates, halving_budgets, random_candidates, search, search_candidates
+)
+
+SPACE = {"max_depth": [2, 4, 8], "min_samples_leaf": [1, 5, 20]}
+
+
+def _data(seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 1, (400, 4))
+    y = (X[:, 0] + 0.3 * rng.normal(size=400) > 0.5).astype(int)
+    return X[:300], y[:300], X[300:], y[300:]
+
+
+def test_candidates_and_budgets():
+    assert len(grid_candidates(SPACE)) == 9
+    sampled = random_candidates(SPACE, 4, seed=1)
+    assert len(sampled) == 4 and len({tuple(c.items()) for c in sampled}) == 4
+    assert len(random_candidates(SPACE, 50)) == 9
+    assert halving_budgets(10, 90, 3) == [10, 30, 90]
+    assert halving_budgets(100, 50, 3) == [50]
+
+
+def test_halving_candidates_are_unique_without_n_estimators():
+    """n_estimators est la ressource du halving : il ne fait pas partie des candidats"""
+    candidates = search_candidates("halving", SEARCH_SPACE, 27, seed=42)
+    assert len(candidates) == 27
+    assert all("n_estimators" not in c for c in candidates)
+    assert len({tuple(sorted(c.items(), key=str)) for c in candidates}) == 27
+    # grid / random gardent n_estimators comme hyperparametre
+    assert all("n_estimators" in c for c in search_candidates("random", SEARCH_SPACE, 27, seed=42))
+    assert len(search_candidates("grid", SEARCH_SPACE, 27)) == len(grid_candidates(SEARCH_SPACE))
+
+
+def test_successive_halving_prunes_and_keeps_best():
+    """9 candidats, eta=3 : 9 -> 3 -> 1 essai sur le dernier palier"""
+    trials = search(grid_candidates(SPACE), [5, 15, 45], eta=3, workers=2, data=_data())
+
+    statuses = [t["status"] for t in trials]
+    assert statuses.count("completed") == 1 and statuses.count("pruned") == 8
+    best = best_trial(trials)
+    assert best["budgets"] == [5, 15, 45]
+    assert best["params"]["n_estimators"] == 45
+    # Un essai arrete au premier palier a un moins bon score que ceux qui continuent
+    first_rung = [t for t in trials if len(t["scores"]) == 1]
+    second_rung = [t for t in trials if len(t["scores"]) >= 2]
+    assert len(first_rung) == 6 and len(second_rung) == 3
+    assert max(t["scores"][0] for t in first_rung) <= min(t["scores"][0] for t in second_rung)
+
+
+def test_single_rung_search_evaluates_every_candidate():
+    candidates = [{**c, "n_estimators": 5} for c in grid_candidates(SPACE)]
+    trials = search(candidates, [None], eta=3, workers=1, data=_data())
+    assert all(t["status"] == "completed" and len(t["scores"]) == 1 for t in trials)
+    assert best_trial(trials)["scores"][0] == max(t["scores"][0] for t in trials)
@@ -0,0 +1,67 @@
+# tests/test_train_out_of_core.py
+import sys
+import os
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, f1_score, log_loss, roc_auc_score
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.scoring import FEATURE_NAMES
+from train_out_of_core import StreamingMetrics, iter_split, train
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATA = os.path.join(ROOT, "data", "bank_churn.csv")
+
+
+def _rows(path, part, chunksize):
+    blocks = list(iter_split(path, part, 0.2, chunksize))
+    return np.vstack([X for X, _ in blocks])
+
+
+def test_hash_split_is_independent_of_chunking_and_order(tmp_path):
+    small = _rows(DATA, "test", 137)
+    large = _rows(DATA, "test", 5000)
+    assert np.array_equal(small, large)
+
+    # Fichier melange (lignes brutes) : memes lignes de test, dans un autre ordre
+    with open(DATA) as f:
+        header, *lines = f.readlines()
+    np.random.default_rng(0).shuffle(lines)
+    shuffled = tmp_path / "shuffled.csv"
+    shuffled.write_text(header + "".join(lines))
+    key = lambda X: sorted(map(tuple, X))
+    assert key(_rows(str(shuffled), "test", 1000)) == key(large)
+
+    n_test, n_train = len(large), len(_rows(DATA, "train", 5000))
+    assert n_test + n_train == len(pd.read_csv(DATA))
+    assert abs(n_test / (n_test + n_train) - 0.2) < 0.02
+
+
+def test_streaming_metrics_match_in_memory_metrics():
+    rng = np.random.default_rng(0)
+    y = rng.integers(0, 2, 5000)
+    proba = np.clip(0.3 * y + rng.uniform(0, 0.7, 5000), 0, 1)
+
+    metrics = StreamingMetrics()
+    for start in range(0, 5000, 700):
+        metrics.update(y[start:start + 700], proba[start:start + 700])
+    result = metrics.result()
+
+    assert result["n"] == 5000
+    assert result["accuracy"] == accuracy_score(y, proba >= 0.5)
+    assert abs(result["f1_score"] - f1_score(y, proba >= 0.5)) < 1e-12
+    assert abs(result["log_loss"] - log_loss(y, proba)) < 1e-9
+    assert abs(result["roc_auc"] - roc_auc_score(y, proba)) < 1e-3
+
+
+def test_train_streams_chunks_and_scores_test_split():
+    model, report = train(DATA, chunksize=1000, epochs=2, log=lambda *_: None)
+
+    test = report["test"]
+    assert test["n"] == len(_rows(DATA, "test", 5000))
+    assert test["roc_auc"] > 0.6
+    assert [row["epoch"] for row in report["history"]] == [1, 2]
+    # Servable par l'API : matrice (n, 10) dans l'ordre de FEATURE_NAMES
+    X = pd.read_csv(DATA, nrows=5)[FEATURE_NAMES].to_numpy()
+    assert model.predict_proba(X).shape == (5, 2)
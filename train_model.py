@@ -1,12 +1,23 @@
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
 import pandas as pd
 import numpy as np
+import sklearn
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import (
-    accuracy_score, 
-    precision_score, 
+    accuracy_score,
+    precision_score,
     recall_score,
-    f1_score, 
+    f1_score,
     roc_auc_score,
     confusion_matrix
 )
@@ -15,119 +26,478 @@ import mlflow
 import mlflow.sklearn
 import matplotlib.pyplot as plt
 import seaborn as sns
+from app.forest_engine import compile_model, save_compiled
+from app.model_registry import artifact_version, mmap_path_for, sketch_path_for
+from app.reference_sketch import build_sketch, save_sketch
+from pipeline_cache import CACHE_DIR, StageCache, file_digest
 
-# Configuration MLflow
-mlflow.set_tracking_uri("./mlruns")
-mlflow.set_experiment("bank-churn-prediction")
+DATA_PATH = "data/bank_churn.csv"
+MODEL_PATH = "model/churn_model.pkl"
+REGISTERED_MODEL = "bank-churn-classifier"
 
-print("Chargement des donnees...")
-df = pd.read_csv("data/bank_churn.csv")
+# Parametres du modele sans recherche (entrainement historique)
+DEFAULT_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 10,
+    'min_samples_split': 5,
+    'random_state': 42
+}
 
-print(f"Dataset : {len(df)} lignes, {len(df.columns)} colonnes")
-print(f"Taux de churn : {df['Exited'].mean():.2%}")
+# Espace de recherche par defaut (remplacable par --space fichier.json).
+# En successive halving, n_estimators est la ressource : il est fixe par
+# le palier et retire de l'espace avant de construire les candidats.
+SEARCH_SPACE = {
+    'n_estimators': [100, 200, 400],
+    'max_depth': [6, 10, 14, None],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': ['sqrt', 0.5]
+}
 
-# Separation features/target
-X = df.drop('Exited', axis=1)
-y = df['Exited']
+SEARCHES = ("none", "grid", "random", "halving")
+
+
+# -------------------------------------------------
+# Donnees
+# -------------------------------------------------
+def load_data(path: str = DATA_PATH):
+    print("Chargement des donnees...")
+    df = pd.read_csv(path)
+    print(f"Dataset : {len(df)} lignes, {len(df.columns)} colonnes")
+    print(f"Taux de churn : {df['Exited'].mean():.2%}")
+    return df
+
+
+def split(df: pd.DataFrame):
+    """Separation features/target puis split train/test (80/20)"""
+    X = df.drop('Exited', axis=1)
+    y = df['Exited']
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+    print(f"\nTrain : {len(X_train)} lignes")
+    print(f"Test : {len(X_test)} lignes")
+    return X_train, X_test, y_train, y_test
+
+
+# -------------------------------------------------
+# Essais (executes dans les processus du pool)
+# -------------------------------------------------
+_TRIAL_DATA = {}
+
+
+def _init_trial_data(X_fit, y_fit, X_val, y_val):
+    """Donnees de validation, copiees une fois par processus"""
+    _TRIAL_DATA.update(X_fit=X_fit, y_fit=y_fit, X_val=X_val, y_val=y_val)
+
+
+def run_trial(trial_id: int, params: dict) -> dict:
+    """Entraine une foret (un coeur) et renvoie son ROC AUC de validation"""
+    started = time.perf_counter()
+    model = RandomForestClassifier(**params, n_jobs=1)
+    model.fit(_TRIAL_DATA["X_fit"], _TRIAL_DATA["y_fit"])
+    proba = model.predict_proba(_TRIAL_DATA["X_val"])[:, 1]
+    return {
+        "trial": trial_id,
+        "val_roc_auc": float(roc_auc_score(_TRIAL_DATA["y_val"], proba)),
+        "fit_seconds": time.perf_counter() - started
+    }
+
+
+# -------------------------------------------------
+# Recherche d'hyperparametres
+# -------------------------------------------------
+def grid_candidates(space: dict) -> list:
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+def random_candidates(space: dict, n_trials: int, seed: int = 42) -> list:
+    """Tirages sans remise dans la grille (toute la grille si elle est plus petite)"""
+    grid = grid_candidates(space)
+    rng = np.random.default_rng(seed)
+    chosen = rng.choice(len(grid), size=min(n_trials, len(grid)), replace=False)
+    return [grid[i] for i in chosen]
+
+
+def search_candidates(mode: str, space: dict, n_trials: int, seed: int = 42) -> list:
+    """Candidats de la recherche `mode` (sans n_estimators en halving : deux
+    candidats ne differant que par lui seraient des doublons)"""
+    if mode == "halving":
+        space = {k: v for k, v in space.items() if k != "n_estimators"}
+    if mode == "grid":
+        return grid_candidates(space)
+    return random_candidates(space, n_trials, seed)
+
+
+def halving_budgets(min_estimators: int, max_estimators: int, eta: int) -> list:
+    """Paliers de n_estimators : max, max/eta, max/eta^2, ... >= min"""
+    budgets = []
+    budget = max_estimators
+    while budget >= min_estimators:
+        budgets.insert(0, budget)
+        budget //= eta
+    return budgets or [max_estimators]
 
-# Split train/test (80/20)
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y
-)
 
-print(f"\nTrain : {len(X_train)} lignes")
-print(f"Test : {len(X_test)} lignes")
-
-# Entrainement avec MLflow tracking
-print("\nEntrainement du modele...")
-with mlflow.start_run(run_name="random-forest-v1"):
-    
-    # Parametres du modele
-    params = {
-        'n_estimators': 100,
-        'max_depth': 10,
-        'min_samples_split': 5,
-        'random_state': 42
+def search(candidates: list, budgets: list, eta: int, workers: int, data: tuple, seed: int = 42) -> list:
+    """Evalue les candidats en parallele, palier par palier.
+
+    Un seul palier (grid / random) : chaque candidat est evalue une fois
+    avec ses propres parametres. Plusieurs paliers (successive halving,
+    ressource n_estimators) : apres chaque palier, seul le meilleur
+    1/eta des essais continue ; les autres sont arretes ("pruned").
+    Renvoie un dict par essai (parametres, scores par palier, statut).
+    """
+    trials = [
+        {"trial": i, "params": dict(params), "scores": [], "budgets": [], "fit_seconds": 0.0, "status": "running"}
+        for i, params in enumerate(candidates)
+    ]
+    alive = trials
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_trial_data, initargs=data) as pool:
+        for rung, budget in enumerate(budgets):
+            params = []
+            for trial in alive:
+                p = {**trial["params"], "random_state": seed}
+                if len(budgets) > 1:
+                    p["n_estimators"] = budget
+                params.append(p)
+            results = list(pool.map(run_trial, [t["trial"] for t in alive], params))
+            for trial, p, result in zip(alive, params, results):
+                trial["params"] = {k: v for k, v in p.items() if k != "random_state"}
+                trial["scores"].append(result["val_roc_auc"])
+                trial["budgets"].append(p.get("n_estimators", 100))
+                trial["fit_seconds"] += result["fit_seconds"]
+            print(f"Palier {rung + 1}/{len(budgets)} : {len(alive)} essais, "
+                  f"meilleur ROC AUC {max(r['val_roc_auc'] for r in results):.4f}")
+            if rung == len(budgets) - 1:
+                break
+            alive = sorted(alive, key=lambda t: t["scores"][-1], reverse=True)
+            for trial in alive[max(1, len(alive) // eta):]:
+                trial["status"] = "pruned"
+            alive = alive[:max(1, len(alive) // eta)]
+    for trial in alive:
+        trial["status"] = "completed"
+    return trials
+
+
+def best_trial(trials: list) -> dict:
+    completed = [t for t in trials if t["status"] == "completed"]
+    return max(completed, key=lambda t: t["scores"][-1])
+
+
+def log_trials(trials: list):
+    """Un run MLflow imbrique par essai, sous le run de recherche courant"""
+    for trial in trials:
+        with mlflow.start_run(run_name=f"trial-{trial['trial']:03d}", nested=True):
+            mlflow.log_params(trial["params"])
+            for budget, score in zip(trial["budgets"], trial["scores"]):
+                mlflow.log_metric("val_roc_auc", score, step=budget)
+            mlflow.log_metric("fit_seconds", trial["fit_seconds"])
+            mlflow.set_tags({"status": trial["status"], "budget": trial["budgets"][-1]})
+
+
+# -------------------------------------------------
+# Etapes du modele retenu
+# -------------------------------------------------
+def run_search(X_train, y_train, args, space: dict) -> dict:
+    """Recherche parallele sur une validation prise dans le train.
+
+    Seul le mode halving elague : en grid / random, chaque candidat est
+    entraine completement.
+    """
+    candidates = search_candidates(args.search, space, args.n_trials, args.seed)
+    if args.search == "halving":
+        budgets = halving_budgets(args.min_estimators, args.max_estimators, args.eta)
+    else:
+        budgets = [None]
+
+    # Validation prise sur le train : le jeu de test reste reserve au modele final
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=args.validation_size, random_state=args.seed, stratify=y_train
+    )
+    data = (X_fit.to_numpy(), y_fit.to_numpy(), X_val.to_numpy(), y_val.to_numpy())
+
+    print(f"\nRecherche {args.search} : {len(candidates)} candidats, {args.workers} processus"
+          + (f", paliers n_estimators {budgets}" if args.search == "halving" else ""))
+    started = time.perf_counter()
+    trials = search(candidates, budgets, args.eta, args.workers, data, args.seed)
+    search_seconds = time.perf_counter() - started
+    best = best_trial(trials)
+    print(f"Recherche terminee en {search_seconds:.1f}s ; meilleur essai {best['trial']} "
+          f"(ROC AUC validation {best['scores'][-1]:.4f}) : {best['params']}")
+    return {
+        "search": args.search,
+        "space": space,
+        "params": {
+            "search": args.search,
+            "candidates": len(candidates),
+            "workers": args.workers,
+            "validation_size": args.validation_size,
+            **({"eta": args.eta, "budgets": budgets} if args.search == "halving" else {})
+        },
+        "trials": trials,
+        "search_seconds": search_seconds
     }
-    
-    # Entrainement
-    model = RandomForestClassifier(**params)
+
+
+def fit_model(X_train, y_train, params: dict, workers: int = 1):
+    """Foret finale sur tout le train (resultat identique quel que soit `workers`)"""
+    model = RandomForestClassifier(**params, n_jobs=workers)
     model.fit(X_train, y_train)
-    
-    # Predictions
+    # Prediction sequentielle : ordre de sommation des arbres deterministe
+    # (parite exacte avec la foret compilee) et pas de threads dans l'API
+    model.set_params(n_jobs=1)
+    return model
+
+
+def evaluate(model, X_test, y_test) -> dict:
     y_pred = model.predict(X_test)
     y_proba = model.predict_proba(X_test)[:, 1]
-    
-    # Calcul des metriques
-    accuracy = accuracy_score(y_test, y_pred)
-    precision = precision_score(y_test, y_pred)
-    recall = recall_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred)
-    auc = roc_auc_score(y_test, y_proba)
-    
-    # Log des parametres et metriques dans MLflow
-    mlflow.log_params(params)
-    mlflow.log_metrics({
-        "accuracy": accuracy,
-        "precision": precision,
-        "recall": recall,
-        "f1_score": f1,
-        "roc_auc": auc
-    })
-    
-    # Creation et sauvegarde de la matrice de confusion
-    cm = confusion_matrix(y_test, y_pred)
+    return {
+        "accuracy": accuracy_score(y_test, y_pred),
+        "precision": precision_score(y_test, y_pred),
+        "recall": recall_score(y_test, y_pred),
+        "f1_score": f1_score(y_test, y_pred),
+        "roc_auc": roc_auc_score(y_test, y_proba)
+    }
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format='png')
+    plt.close()
+    return buffer.getvalue()
+
+
+def render_figures(model, X_test, y_test) -> dict:
+    """PNG de la matrice de confusion et des importances {fichier: octets}"""
+    figures = {}
+
+    # Matrice de confusion
+    cm = confusion_matrix(y_test, model.predict(X_test))
     plt.figure(figsize=(8, 6))
     sns.heatmap(cm, annot=True, fmt='d', cmap='Blues')
     plt.title('Matrice de Confusion')
     plt.ylabel('Vraie Classe')
     plt.xlabel('Classe Predite')
-    plt.savefig('confusion_matrix.png')
-    mlflow.log_artifact('confusion_matrix.png')
-    plt.close()
-    
+    figures['confusion_matrix.png'] = _png()
+
     # Feature importance
     feature_importance = pd.DataFrame({
-        'feature': X.columns,
+        'feature': X_test.columns,
         'importance': model.feature_importances_
     }).sort_values('importance', ascending=False)
-    
+
     plt.figure(figsize=(10, 6))
     plt.barh(feature_importance['feature'], feature_importance['importance'])
     plt.xlabel('Importance')
     plt.title('Feature Importance')
     plt.tight_layout()
-    plt.savefig('feature_importance.png')
-    mlflow.log_artifact('feature_importance.png')
-    plt.close()
-    
+    figures['feature_importance.png'] = _png()
+    return figures
+
+
+def write_figures(figures: dict):
+    for name, png in figures.items():
+        with open(name, 'wb') as f:
+            f.write(png)
+
+
+def save_model(model, df: pd.DataFrame, model_path: str = MODEL_PATH):
+    """Registre MLflow, pickle local, artefact mmap et esquisse de reference"""
     # Enregistrement du modele dans MLflow
     mlflow.sklearn.log_model(
         model,
         "model",
-        registered_model_name="bank-churn-classifier"
+        registered_model_name=REGISTERED_MODEL
     )
-    
+
     # Sauvegarde locale du modele
-    joblib.dump(model, "model/churn_model.pkl")
-    
-    # Tags
-    mlflow.set_tags({
-        "environment": "development",
-        "model_type": "RandomForest",
-        "task": "binary_classification"
+    joblib.dump(model, model_path)
+
+    # Artefact memory-mappable (tableaux .npy non compresses), partage par
+    # tous les workers de l'API via le cache de pages
+    mmap_dir = save_compiled(
+        compile_model(model),
+        mmap_path_for(model_path),
+        {"source_version": artifact_version(model_path)}
+    )
+    mlflow.log_artifacts(mmap_dir, "model_mmap")
+
+    # Esquisse de la distribution d'entrainement (histogrammes, quantiles) :
+    # reference du drift pour ce modele, sans embarquer le CSV dans l'image
+    sketch_path = save_sketch(
+        build_sketch(df, model_version=artifact_version(model_path)),
+        sketch_path_for(model_path)
+    )
+    mlflow.log_artifact(sketch_path, "reference_sketch")
+    return mmap_dir, sketch_path
+
+
+def log_search(searched: dict):
+    """Parametres, essais imbriques et synthese de la recherche (run courant)"""
+    trials = searched["trials"]
+    best = best_trial(trials)
+    mlflow.log_params(searched["params"])
+    mlflow.log_dict(searched["space"], "search_space.json")
+    log_trials(trials)
+    mlflow.log_metrics({
+        "best_val_roc_auc": best["scores"][-1],
+        "search_seconds": searched["search_seconds"],
+        "trials_pruned": sum(t["status"] == "pruned" for t in trials)
     })
-    
+    mlflow.set_tag("best_trial", best["trial"])
+
+
+def register(model, params: dict, metrics: dict, figures: dict, df, searched: Optional[dict] = None,
+             model_path: str = MODEL_PATH) -> dict:
+    """Run MLflow (essais imbriques en mode recherche), registre et artefacts locaux"""
+    run_name = "random-forest-v1" if searched is None else f"search-{searched['search']}"
+    with mlflow.start_run(run_name=run_name) as run:
+        if searched is not None:
+            log_search(searched)
+        mlflow.log_params(params)
+        mlflow.log_metrics(metrics)
+        for name in figures:
+            mlflow.log_artifact(name)
+        mmap_dir, sketch_path = save_model(model, df, model_path)
+
+        # Tags
+        mlflow.set_tags({
+            "environment": "development",
+            "model_type": "RandomForest",
+            "task": "binary_classification"
+        })
+    return {
+        "run_id": run.info.run_id,
+        "model_version": artifact_version(model_path),
+        "model_path": model_path,
+        "mmap_dir": mmap_dir,
+        "sketch_path": sketch_path
+    }
+
+
+def is_registered(registered: dict) -> bool:
+    """Les artefacts locaux du run en cache sont toujours en place"""
+    path = registered["model_path"]
+    return (
+        os.path.exists(path)
+        and artifact_version(path) == registered["model_version"]
+        and os.path.exists(registered["sketch_path"])
+        and os.path.isdir(registered["mmap_dir"])
+    )
+
+
+def print_results(metrics: dict, registered: dict, cached: bool):
     # Affichage des resultats
     print("\n" + "="*50)
     print("RESULTATS DE L'ENTRAINEMENT")
     print("="*50)
-    print(f"Accuracy  : {accuracy:.4f}")
-    print(f"Precision : {precision:.4f}")
-    print(f"Recall    : {recall:.4f}")
-    print(f"F1 Score  : {f1:.4f}")
-    print(f"ROC AUC   : {auc:.4f}")
+    print(f"Accuracy  : {metrics['accuracy']:.4f}")
+    print(f"Precision : {metrics['precision']:.4f}")
+    print(f"Recall    : {metrics['recall']:.4f}")
+    print(f"F1 Score  : {metrics['f1_score']:.4f}")
+    print(f"ROC AUC   : {metrics['roc_auc']:.4f}")
     print("="*50)
-    
-    print(f"\nModele sauvegarde dans : model/churn_model.pkl")
-    print(f"MLflow UI : mlflow ui --port 5000")
\ No newline at end of file
+
+    if cached:
+        print(f"\nDonnees, code et parametres inchanges : run MLflow {registered['run_id']} reutilise")
+    print(f"\nModele sauvegarde dans : {registered['model_path']}")
+    print(f"Artefact memory-mappable : {registered['mmap_dir']}")
+    print(f"Esquisse de reference : {registered['sketch_path']}")
+    print(f"MLflow UI : mlflow ui --port 5000")
+
+
+# -------------------------------------------------
+# Pipeline
+# -------------------------------------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Entrainement du modele de churn")
+    parser.add_argument("--search", choices=SEARCHES, default="none",
+                        help="none : parametres par defaut ; grid / random / halving : recherche parallele "
+                             "(seul halving elague les essais, grid / random les entrainent tous completement)")
+    parser.add_argument("--space", help="Espace de recherche JSON {parametre: [valeurs]}")
+    parser.add_argument("--n-trials", type=int, default=27, help="Candidats tires (random, halving)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processus du pool")
+    parser.add_argument("--eta", type=int, default=3, help="Halving : 1/eta des essais continue a chaque palier")
+    parser.add_argument("--min-estimators", type=int, default=25, help="Halving : plus petit palier")
+    parser.add_argument("--max-estimators", type=int, default=400, help="Halving : dernier palier")
+    parser.add_argument("--validation-size", type=float, default=0.2, help="Part du train servant a comparer les essais")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Cache des etapes (adresse par contenu)")
+    parser.add_argument("--no-cache", action="store_true", help="Recalculer toutes les etapes")
+    args = parser.parse_args(argv)
+    if args.eta < 2:
+        parser.error("--eta doit etre >= 2")
+    args.workers = max(1, args.workers)
+    return args
+
+
+def search_key(args, space: dict) -> dict:
+    """Ce dont depend le resultat de la recherche (pas --workers)"""
+    key = {"search": args.search, "space": space, "validation_size": args.validation_size, "seed": args.seed}
+    if args.search != "grid":
+        key["n_trials"] = args.n_trials
+    if args.search == "halving":
+        key.update(eta=args.eta, min_estimators=args.min_estimators, max_estimators=args.max_estimators)
+    return key
+
+
+def main(argv=None, model_path: str = MODEL_PATH):
+    """Etapes load, split, [search], fit, evaluate, plot, register.
+
+    Chaque etape est relue du cache tant que les donnees, son code, ses
+    parametres et les etapes precedentes sont inchanges.
+    """
+    args = parse_args(argv)
+    cache = StageCache(args.cache_dir, enabled=not args.no_cache, environment={
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__
+    })
+
+    loaded = cache.run("load", load_data, args.data, params={"data": file_digest(args.data)})
+    parts = cache.run("split", split, loaded.value, upstream=[loaded])
+    X_train, X_test, y_train, y_test = parts.value
+
+    searched = None
+    params = DEFAULT_PARAMS
+    if args.search != "none":
+        space = SEARCH_SPACE
+        if args.space:
+            with open(args.space) as f:
+                space = json.load(f)
+        searched = cache.run(
+            "search", run_search, X_train, y_train, args, space,
+            params=search_key(args, space), upstream=[parts],
+            code=[search, run_trial, search_candidates, grid_candidates, random_candidates, halving_budgets, best_trial]
+        )
+        params = {**best_trial(searched.value["trials"])["params"], "random_state": args.seed}
+
+    fitted = cache.run("fit", fit_model, X_train, y_train, params, args.workers, params={"model": params}, upstream=[parts])
+    evaluated = cache.run("evaluate", evaluate, fitted.value, X_test, y_test, upstream=[fitted, parts])
+    plotted = cache.run("plot", render_figures, fitted.value, X_test, y_test, upstream=[fitted, parts], code=[_png])
+    write_figures(plotted.value)
+
+    # Configuration MLflow
+    mlflow.set_tracking_uri("./mlruns")
+    mlflow.set_experiment("bank-churn-prediction")
+
+    registered = cache.run(
+        "register", register,
+        fitted.value, params, evaluated.value, plotted.value, loaded.value,
+        searched.value if searched else None, model_path,
+        params={"model_path": model_path, "registered_model": REGISTERED_MODEL, "tracking_uri": mlflow.get_tracking_uri()},
+        upstream=[stage for stage in (loaded, searched, fitted, evaluated, plotted) if stage is not None],
+        code=[save_model, log_search, log_trials],
+        validate=is_registered
+    )
+    print_results(evaluated.value, registered.value, registered.hit)
+    return evaluated.value
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,264 @@
+"""Entrainement hors memoire : lecture par blocs, split par hachage, SGD incremental.
+
+Le CSV n'est jamais charge en entier : chaque passe relit le fichier par
+blocs de `--chunksize` lignes. L'appartenance d'une ligne au test est
+decidee par le hachage de ses features (deterministe, independant de la
+taille des blocs et de l'ordre du fichier, sans index materialise).
+
+- passe 1 : moyennes / variances (StandardScaler.partial_fit) et effectifs
+  par classe sur le train ;
+- passes 2..n : `--epochs` epoques de SGDClassifier(log_loss).partial_fit,
+  blocs melanges en interne, avec validation progressive (chaque bloc est
+  score avant d'etre appris) ;
+- derniere passe : metriques du test calculees en flux (matrice de
+  confusion, log loss, ROC AUC par histogrammes des scores).
+
+La memoire de pointe depend de `--chunksize`, pas de la taille du fichier.
+Le modele ecrit est un Pipeline(scaler, sgd) servable par l'API
+(MODEL_PATH, moteur sklearn).
+
+    python train_out_of_core.py --data data/historique.csv --chunksize 200000
+"""
+import argparse
+import resource
+import time
+from typing import Iterator, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from app.scoring import FEATURE_NAMES
+
+TARGET = "Exited"
+DATA_PATH = "data/bank_churn.csv"
+OUTPUT_PATH = "model/churn_model_sgd.pkl"
+CLASSES = np.array([0, 1])
+
+# Resolution du split : test_size est arrondi a 1/HASH_BUCKETS
+HASH_BUCKETS = 10_000
+
+
+# -------------------------------------------------
+# Lecture par blocs et split par hachage
+# -------------------------------------------------
+def test_mask(chunk: pd.DataFrame, test_size: float) -> np.ndarray:
+    """True pour les lignes du test : hachage des features, pas de leur position"""
+    hashes = pd.util.hash_pandas_object(chunk[FEATURE_NAMES], index=False).to_numpy()
+    return (hashes % HASH_BUCKETS) < round(test_size * HASH_BUCKETS)
+
+
+def iter_split(path: str, part: str, test_size: float, chunksize: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """(X, y) bloc par bloc pour `part` ("train" ou "test")"""
+    reader = pd.read_csv(
+        path,
+        usecols=FEATURE_NAMES + [TARGET],
+        dtype={**{name: np.float64 for name in FEATURE_NAMES}, TARGET: np.int64},
+        chunksize=chunksize
+    )
+    for chunk in reader:
+        mask = test_mask(chunk, test_size)
+        if part == "train":
+            mask = ~mask
+        if not mask.any():
+            continue
+        rows = chunk[mask]
+        yield rows[FEATURE_NAMES].to_numpy(), rows[TARGET].to_numpy()
+
+
+# -------------------------------------------------
+# Metriques en flux
+# -------------------------------------------------
+class StreamingMetrics:
+    """Metriques de classification binaire accumulees bloc par bloc.
+
+    Memoire constante : quatre compteurs, une somme de log loss et deux
+    histogrammes de scores (`bins` classes sur [0, 1]) pour le ROC AUC,
+    exact a la resolution des classes pres.
+    """
+
+    def __init__(self, threshold: float = 0.5, bins: int = 1000):
+        self.threshold = threshold
+        self.bins = bins
+        self.tp = self.fp = self.tn = self.fn = 0
+        self.log_loss_sum = 0.0
+        self.positive_hist = np.zeros(bins, dtype=np.int64)
+        self.negative_hist = np.zeros(bins, dtype=np.int64)
+
+    @property
+    def n(self) -> int:
+        return self.tp + self.fp + self.tn + self.fn
+
+    def update(self, y: np.ndarray, proba: np.ndarray):
+        y = np.asarray(y).astype(bool)
+        proba = np.asarray(proba, dtype=np.float64)
+        predicted = proba >= self.threshold
+        self.tp += int(np.sum(predicted & y))
+        self.fp += int(np.sum(predicted & ~y))
+        self.tn += int(np.sum(~predicted & ~y))
+        self.fn += int(np.sum(~predicted & y))
+        clipped = np.clip(proba, 1e-15, 1 - 1e-15)
+        self.log_loss_sum -= float(np.sum(np.where(y, np.log(clipped), np.log1p(-clipped))))
+        index = np.minimum((proba * self.bins).astype(np.int64), self.bins - 1)
+        self.positive_hist += np.bincount(index[y], minlength=self.bins)
+        self.negative_hist += np.bincount(index[~y], minlength=self.bins)
+
+    def roc_auc(self) -> float:
+        positives, negatives = self.positive_hist.sum(), self.negative_hist.sum()
+        if not positives or not negatives:
+            return float("nan")
+        # Paires (positif, negatif) bien ordonnees ; ex aequo dans une classe : 1/2
+        negatives_below = np.cumsum(self.negative_hist) - self.negative_hist
+        pairs = np.sum(self.positive_hist * (negatives_below + 0.5 * self.negative_hist))
+        return float(pairs / (positives * negatives))
+
+    def result(self) -> dict:
+        precision = self.tp / (self.tp + self.fp) if self.tp + self.fp else 0.0
+        recall = self.tp / (self.tp + self.fn) if self.tp + self.fn else 0.0
+        return {
+            "n": self.n,
+            "accuracy": (self.tp + self.tn) / self.n if self.n else float("nan"),
+            "precision": precision,
+            "recall": recall,
+            "f1_score": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            "roc_auc": self.roc_auc(),
+            "log_loss": self.log_loss_sum / self.n if self.n else float("nan")
+        }
+
+
+# -------------------------------------------------
+# Entrainement
+# -------------------------------------------------
+def fit_scaler(path: str, test_size: float, chunksize: int):
+    """Passe 1 : StandardScaler et effectifs par classe du train"""
+    scaler = StandardScaler()
+    counts = np.zeros(len(CLASSES), dtype=np.int64)
+    for X, y in iter_split(path, "train", test_size, chunksize):
+        scaler.partial_fit(X)
+        counts += np.bincount(y, minlength=len(CLASSES))
+    if counts.min() == 0:
+        raise ValueError(f"Le train doit contenir les deux classes (effectifs {counts.tolist()})")
+    return scaler, counts
+
+
+def train(
+    path: str = DATA_PATH,
+    chunksize: int = 100_000,
+    test_size: float = 0.2,
+    epochs: int = 5,
+    alpha: float = 1e-4,
+    class_weight: str = "balanced",
+    seed: int = 42,
+    log=print
+):
+    """Renvoie (Pipeline(scaler, sgd), rapport : metriques du test, par epoque, memoire)"""
+    started = time.perf_counter()
+    scaler, counts = fit_scaler(path, test_size, chunksize)
+    weights = None
+    if class_weight == "balanced":
+        # Equivalent de class_weight="balanced", non supporte par partial_fit
+        weights = {int(c): counts.sum() / (len(CLASSES) * counts[i]) for i, c in enumerate(CLASSES)}
+    log(f"Train : {counts.sum()} lignes (churn {counts[1] / counts.sum():.2%})")
+
+    clf = SGDClassifier(loss="log_loss", alpha=alpha, class_weight=weights, random_state=seed)
+    rng = np.random.default_rng(seed)
+    history = []
+    for epoch in range(1, epochs + 1):
+        progressive = StreamingMetrics()
+        for X, y in iter_split(path, "train", test_size, chunksize):
+            order = rng.permutation(len(y))
+            X, y = scaler.transform(X[order]), y[order]
+            if hasattr(clf, "coef_"):
+                progressive.update(y, clf.predict_proba(X)[:, 1])
+            clf.partial_fit(X, y, classes=CLASSES)
+        if progressive.n:
+            history.append({"epoch": epoch, **progressive.result()})
+            log(f"Epoque {epoch}/{epochs} : log loss progressive {history[-1]['log_loss']:.4f}, "
+                f"ROC AUC {history[-1]['roc_auc']:.4f}")
+
+    model = Pipeline([("scaler", scaler), ("sgd", clf)])
+    test = StreamingMetrics()
+    for X, y in iter_split(path, "test", test_size, chunksize):
+        test.update(y, model.predict_proba(X)[:, 1])
+    return model, {
+        "test": test.result(),
+        "history": history,
+        "train_rows": int(counts.sum()),
+        "train_seconds": time.perf_counter() - started,
+        # ru_maxrss : Ko sous Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Entrainement hors memoire (SGD incremental)")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--output", default=OUTPUT_PATH, help="Pickle du Pipeline(scaler, sgd)")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Lignes lues par bloc (borne la memoire)")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--alpha", type=float, default=1e-4, help="Regularisation L2 du SGD")
+    parser.add_argument("--class-weight", choices=("balanced", "none"), default="balanced")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--register", action="store_true", help="Enregistrer le modele dans le registre MLflow")
+    args = parser.parse_args(argv)
+    if not 0 < args.test_size < 1:
+        parser.error("--test-size doit etre dans ]0, 1[")
+    return args
+
+
+def main(argv=None):
+    import mlflow
+    import mlflow.sklearn
+
+    args = parse_args(argv)
+    mlflow.set_tracking_uri("./mlruns")
+    mlflow.set_experiment("bank-churn-prediction")
+
+    with mlflow.start_run(run_name="sgd-out-of-core"):
+        model, report = train(
+            args.data, args.chunksize, args.test_size, args.epochs,
+            args.alpha, args.class_weight, args.seed
+        )
+        mlflow.log_params({
+            "chunksize": args.chunksize,
+            "test_size": args.test_size,
+            "epochs": args.epochs,
+            "alpha": args.alpha,
+            "class_weight": args.class_weight
+        })
+        for row in report["history"]:
+            mlflow.log_metrics(
+                {"progressive_log_loss": row["log_loss"], "progressive_roc_auc": row["roc_auc"]},
+                step=row["epoch"]
+            )
+        test = report["test"]
+        mlflow.log_metrics({
+            **{k: v for k, v in test.items() if k != "n"},
+            "train_rows": report["train_rows"],
+            "test_rows": test["n"],
+            "train_seconds": report["train_seconds"],
+            "peak_rss_mb": report["peak_rss_mb"]
+        })
+        mlflow.set_tags({"model_type": "SGDClassifier", "training": "out-of-core"})
+        joblib.dump(model, args.output)
+        mlflow.sklearn.log_model(
+            model, "model",
+            registered_model_name="bank-churn-classifier" if args.register else None
+        )
+
+    print("\n" + "="*50)
+    print("RESULTATS (test, calcules en flux)")
+    print("="*50)
+    for name in ("accuracy", "precision", "recall", "f1_score", "roc_auc", "log_loss"):
+        print(f"{name:<10}: {test[name]:.4f}")
+    print("="*50)
+    print(f"Test : {test['n']} lignes ; memoire de pointe {report['peak_rss_mb']:.0f} Mo")
+    print(f"Modele sauvegarde dans : {args.output}")
+
+
+if __name__ == "__main__":
+    main()